@@ -0,0 +1,230 @@
+"""
+Cold-start benchmark for the bundled Python MCP servers.
+
+Starts every Python server configured in crewai_mcp.json (falls back to the
+template) fully offline, N times each, and measures per run:
+
+    spawn       Popen() of the server process
+    import      module imports until the server answered `initialize`
+                (sum of top-level `python -X importtime` entries)
+    initialize  `initialize` request, sent right after spawn, until its
+                response: interpreter start, imports and server setup
+    tools/list  `tools/list` round trip
+    first call  first tool call (see offline.SERVER_PROFILES)
+    ready       spawn start until `initialize` returned
+
+USAGE:
+    python TEST/benchmarks/cold_start.py                     # all servers, 5 runs each
+    python TEST/benchmarks/cold_start.py -n 10 --server comfyui
+    python TEST/benchmarks/cold_start.py --json before.json
+    python TEST/benchmarks/cold_start.py --baseline before.json --tolerance 0.2
+
+With --baseline the run exits with status 1 when a median is more than
+`tolerance` slower than in the baseline, so it can guard server.py changes.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from mcp_stdio_client import MCPClientError, StdioMCPClient, is_error_result, result_text
+from offline import BENCH_DIR, OfflineEnvironment, ServerTarget, default_config_path, discover_targets
+
+PHASES = ["spawn", "import", "initialize", "tools_list", "first_call", "ready"]
+PHASE_LABELS = {"tools_list": "tools/list", "first_call": "first call"}
+
+
+def _parse_importtime(line: str) -> Optional[int]:
+    """Cumulative microseconds of a top-level `-X importtime` entry, None for anything else."""
+    if not line.startswith("import time:"):
+        return None
+    parts = line.split("|")
+    if len(parts) != 3 or not parts[2].startswith(" ") or parts[2].startswith("  "):
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None  # header line
+
+
+def run_once(target: ServerTarget, env: OfflineEnvironment, timeout: float) -> Dict[str, Any]:
+    imports = []
+    stderr_tail = deque(maxlen=5)
+
+    def on_stderr(timestamp: float, line: str):
+        cumulative = _parse_importtime(line)
+        if cumulative is not None:
+            imports.append((timestamp, cumulative))
+        elif line.strip() and not line.startswith("import time:"):
+            stderr_tail.append(line.strip())
+
+    args = (["-X", "importtime"] if target.is_python else []) + target.args
+    client = StdioMCPClient(target.command, args, env=env.env_for(target), cwd=env.workdir, on_stderr=on_stderr)
+    tool, arguments = env.call_for(target)
+    run: Dict[str, Any] = {phase: None for phase in PHASES}
+    run.update({"ok": False, "error": None})
+
+    start = time.perf_counter()
+    try:
+        run["spawn"] = client.spawn()
+        sent = time.perf_counter()
+        client.initialize(timeout=timeout)
+        initialized = time.perf_counter()
+        run["initialize"] = initialized - sent
+        run["ready"] = initialized - start
+
+        t = time.perf_counter()
+        tools = client.list_tools(timeout=timeout)
+        run["tools_list"] = time.perf_counter() - t
+        run["tools"] = len(tools)
+
+        call_start = time.perf_counter()
+        result = client.call_tool(tool, arguments, timeout=timeout)
+        run["first_call"] = time.perf_counter() - call_start
+        if is_error_result(result):
+            run["error"] = f"{tool}: {result_text(result)[:200]}"
+        else:
+            run["ok"] = True
+        if target.is_python:
+            # Lines are read on another thread; everything imported at startup
+            # has long been consumed by the time the first call starts
+            run["import"] = sum(us for ts, us in imports if ts <= call_start) / 1e6
+    except MCPClientError as e:
+        run["error"] = str(e)
+    finally:
+        client.close()
+    if run["error"] and not run["ok"] and run["first_call"] is None and stderr_tail:
+        run["error"] += f" | stderr: {stderr_tail[-1][:200]}"
+    return run
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {"runs": len(runs), "ok": sum(1 for r in runs if r["ok"])}
+    for phase in PHASES:
+        values = [r[phase] for r in runs if r[phase] is not None]
+        if values:
+            summary[phase] = {
+                "median": statistics.median(values),
+                "min": min(values),
+                "max": max(values),
+                "mean": statistics.fmean(values),
+            }
+        else:
+            summary[phase] = None
+    errors = sorted({r["error"] for r in runs if r["error"]})
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def markdown_table(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """Median per phase in milliseconds, with the change against `baseline` if given."""
+    header = ["server", "ok"] + [PHASE_LABELS.get(p, p) + " ms" for p in PHASES]
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for name, server in report["servers"].items():
+        row = [name, f"{server['ok']}/{server['runs']}"]
+        for phase in PHASES:
+            stats = server.get(phase)
+            cell = _ms(stats["median"] if stats else None)
+            old = ((baseline or {}).get("servers", {}).get(name) or {}).get(phase)
+            if stats and old and old["median"]:
+                cell += f" ({(stats['median'] / old['median'] - 1) * 100:+.0f}%)"
+            row.append(cell)
+        lines.append("| " + " | ".join(row) + " |")
+    if report.get("skipped"):
+        lines.append("\nSkipped: " + ", ".join(f"{name} ({reason})" for name, reason in report["skipped"].items()))
+    for name, server in report["servers"].items():
+        for error in server.get("errors", []):
+            lines.append(f"\n{name} error: {error}")
+    return "\n".join(lines)
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    found = []
+    for name, server in report["servers"].items():
+        old_server = baseline.get("servers", {}).get(name)
+        if not old_server:
+            continue
+        for phase in PHASES:
+            new, old = server.get(phase), old_server.get(phase)
+            # Sub-millisecond phases are all noise
+            if new and old and old["median"] >= 0.001 and new["median"] > old["median"] * (1 + tolerance):
+                found.append(f"{name} {PHASE_LABELS.get(phase, phase)}: "
+                             f"{_ms(old['median'])} -> {_ms(new['median'])} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the bundled Python MCP servers")
+    parser.add_argument("-n", "--repetitions", type=int, default=5, help="Cold starts per server")
+    parser.add_argument("--config", default=default_config_path(), help="MCP config (default: crewai_mcp.json)")
+    parser.add_argument("--server", action="append", help="Only these servers (repeatable)")
+    parser.add_argument("--audio", help="Audio file for yt-whisper (default: generated tone)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per request timeout in seconds")
+    parser.add_argument("--json", help="Write the full report here (default: TEST/benchmarks/results/)")
+    parser.add_argument("--markdown", help="Also write the table to this file")
+    parser.add_argument("--baseline", help="Earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    targets, skipped = discover_targets(args.config, args.server)
+    report = {
+        "benchmark": "cold_start",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": os.path.abspath(args.config),
+        "repetitions": args.repetitions,
+        "platform": {"python": sys.version.split()[0], "system": platform.platform()},
+        "servers": {},
+        "skipped": skipped,
+        "notes": {t.name: t.note for t in targets if t.note},
+    }
+
+    with OfflineEnvironment(audio=args.audio) as env:
+        for target in targets:
+            print(f"Benchmarking {target.name} ({args.repetitions} cold starts)...")
+            runs = []
+            for i in range(args.repetitions):
+                run = run_once(target, env, args.timeout)
+                status = "ok" if run["ok"] else f"FAILED: {run['error']}"
+                print(f"  run {i + 1}: ready {_ms(run['ready'])} ms, first call {_ms(run['first_call'])} ms, {status}")
+                runs.append(run)
+            report["servers"][target.name] = {**summarize(runs), "samples": runs}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    table = markdown_table(report, baseline)
+    print()
+    print(table)
+
+    json_path = args.json or os.path.join(BENCH_DIR, "results", f"cold_start-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {json_path}")
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+
+    if baseline is not None:
+        found = regressions(report, baseline, args.tolerance)
+        if found:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+"""
+Sustained load generator for MCP servers.
+
+Drives one server with a weighted mix of tool calls, either closed loop
+(--concurrency N: N callers issuing back to back) or open loop (--rate R:
+R calls per second regardless of how fast the server answers), and reports
+throughput, latency percentiles, error rates and server RSS/CPU over time.
+
+Targets:
+    --server NAME   a bundled Python server from crewai_mcp.json, started
+                    offline (see offline.py) over stdio, or over
+                    streamable-http/sse with --transport
+    --url URL       an already running HTTP server (--pid for RSS sampling)
+
+In open loop mode latency is measured from when a call was due, not when a
+free caller picked it up, so a saturated server shows up as growing latency
+instead of silently lowering the offered rate.
+
+USAGE:
+    python TEST/benchmarks/load.py --server comfyui --concurrency 8 --duration 30
+    python TEST/benchmarks/load.py --server comfyui --transport streamable-http --clients 4 --rate 20
+    python TEST/benchmarks/load.py --url http://127.0.0.1:8000/mcp --mix mix.json --concurrency 16
+
+A mix file is a JSON list of calls, picked at random by weight:
+    [{"tool": "get_stock_history", "arguments": {"ticker": "AAPL"}, "weight": 3},
+     {"tool": "get_stock_info", "arguments": {"ticker": "MSFT"}}]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from mcp_http_client import http_client
+from mcp_stdio_client import MCPClient, MCPClientError, StdioMCPClient, is_error_result, result_text
+from offline import (BENCH_DIR, OfflineEnvironment, ServerTarget, default_config_path, discover_targets, free_port,
+                     wait_for_port)
+
+PERCENTILES = (50, 90, 95, 99)
+OUTCOMES = ("ok", "tool_error", "timeout", "transport_error")
+HTTP_PATHS = {"streamable-http": "/mcp", "sse": "/sse"}
+
+
+@dataclass
+class CallSpec:
+    tool: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    weight: float = 1.0
+
+
+@dataclass
+class Sample:
+    """One finished call. Times are seconds since the run started."""
+    due: float
+    start: float
+    end: float
+    tool: str
+    outcome: str
+    error: Optional[str] = None
+
+    @property
+    def latency(self) -> float:
+        return self.end - self.due
+
+    @property
+    def service(self) -> float:
+        return self.end - self.start
+
+
+def load_mix(path: str) -> List[CallSpec]:
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return [CallSpec(e["tool"], dict(e.get("arguments", {})), float(e.get("weight", 1.0))) for e in entries]
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(p / 100.0 * len(values))) - 1))
+    return values[index]
+
+
+def call_once(client: MCPClient, spec: CallSpec, timeout: float) -> Tuple[str, Optional[str]]:
+    """Outcome of one call and, for failures, a short reason."""
+    try:
+        result = client.call_tool(spec.tool, spec.arguments, timeout=timeout)
+    except MCPClientError as e:
+        return ("timeout" if "timed out" in str(e) else "transport_error"), str(e)[:200]
+    if is_error_result(result):
+        return "tool_error", result_text(result)[:200]
+    return "ok", None
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.samples: List[Sample] = []
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add(self, sample: Sample):
+        with self._lock:
+            self.samples.append(sample)
+
+    def since(self, index: int) -> List[Sample]:
+        with self._lock:
+            return self.samples[index:]
+
+
+class ResourceSampler:
+    """
+    Samples RSS and CPU of the server processes (children included) every
+    `interval` seconds, and prints a progress line per sample.
+    """
+
+    def __init__(self, pids: List[int], recorder: Recorder, interval: float = 1.0, quiet: bool = False):
+        self.pids = pids
+        self.recorder = recorder
+        self.interval = interval
+        self.quiet = quiet
+        self.timeline: List[Dict[str, Any]] = []
+        self._processes: Dict[int, psutil.Process] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="load-sampler", daemon=True)
+
+    def start(self):
+        self._usage()  # prime cpu_percent
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._tick()
+
+    def _usage(self) -> Tuple[Optional[int], Optional[float]]:
+        if not self.pids:
+            return None, None
+        rss, cpu = 0, 0.0
+        for pid in self.pids:
+            try:
+                root = psutil.Process(pid)
+                tree = [root] + root.children(recursive=True)
+            except psutil.Error:
+                continue
+            for proc in tree:
+                # Reuse Process objects so cpu_percent() measures since the last sample
+                proc = self._processes.setdefault(proc.pid, proc)
+                try:
+                    rss += proc.memory_info().rss
+                    cpu += proc.cpu_percent(None)
+                except psutil.Error:
+                    continue
+        return rss, cpu
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._tick()
+
+    def _tick(self):
+        previous = self.timeline[-1]["t"] if self.timeline else 0.0
+        seen = sum(row["completed"] for row in self.timeline)
+        now = self.recorder.now()
+        done = [s for s in self.recorder.since(seen) if s.end <= now]
+        rss, cpu = self._usage()
+        latencies = sorted(s.latency for s in done)
+        row = {
+            "t": round(now, 3),
+            "completed": len(done),
+            "throughput": round(len(done) / max(now - previous, 1e-9), 2),
+            "errors": sum(1 for s in done if s.outcome != "ok"),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "rss_bytes": rss,
+            "cpu_percent": None if cpu is None else round(cpu, 1),
+        }
+        self.timeline.append(row)
+        if not self.quiet:
+            rss_text = "-" if rss is None else f"{rss / 2**20:.0f} MB"
+            print(f"  t={now:6.1f}s  {row['throughput']:7.1f} calls/s  p95 {_ms(row['p95'])} ms  "
+                  f"errors {row['errors']}  rss {rss_text}  cpu {row['cpu_percent'] if cpu is not None else '-'}%")
+
+
+def run_closed_loop(clients: List[MCPClient], mix: List[CallSpec], recorder: Recorder, concurrency: int,
+                    duration: Optional[float], max_calls: Optional[int], timeout: float, seed: int):
+    """`concurrency` callers, each issuing its next call as soon as the last one returned."""
+    deadline = duration if duration is not None else float("inf")
+    issued = [0]
+    lock = threading.Lock()
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        client = clients[index % len(clients)]
+        weights = [spec.weight for spec in mix]
+        while True:
+            with lock:
+                if recorder.now() >= deadline or (max_calls is not None and issued[0] >= max_calls):
+                    return
+                issued[0] += 1
+            spec = rng.choices(mix, weights)[0]
+            start = recorder.now()
+            outcome, error = call_once(client, spec, timeout)
+            recorder.add(Sample(start, start, recorder.now(), spec.tool, outcome, error))
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"load-{i}", daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open_loop(clients: List[MCPClient], mix: List[CallSpec], recorder: Recorder, rate: float,
+                  duration: Optional[float], max_calls: Optional[int], timeout: float, seed: int,
+                  poisson: bool = False, max_in_flight: int = 256):
+    """Issues `rate` calls per second on schedule, up to `max_in_flight` at a time."""
+    rng = random.Random(seed)
+    weights = [spec.weight for spec in mix]
+    deadline = duration if duration is not None else float("inf")
+
+    def task(index: int, due: float, spec: CallSpec):
+        start = recorder.now()
+        outcome, error = call_once(clients[index % len(clients)], spec, timeout)
+        recorder.add(Sample(due, start, recorder.now(), spec.tool, outcome, error))
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="load") as pool:
+        due, index = 0.0, 0
+        while due < deadline and (max_calls is None or index < max_calls):
+            delay = due - recorder.now()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, index, due, rng.choices(mix, weights)[0])
+            index += 1
+            due += rng.expovariate(rate) if poisson else 1.0 / rate
+
+
+def _latency_stats(samples: List[Sample], attr: str) -> Dict[str, Optional[float]]:
+    values = sorted(getattr(s, attr) for s in samples)
+    stats = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    stats["mean"] = sum(values) / len(values) if values else None
+    stats["max"] = values[-1] if values else None
+    return stats
+
+
+def _group_stats(samples: List[Sample], window: float) -> Dict[str, Any]:
+    counts = {outcome: sum(1 for s in samples if s.outcome == outcome) for outcome in OUTCOMES}
+    errors = len(samples) - counts["ok"]
+    examples: Dict[str, List[str]] = {}
+    for s in samples:
+        if s.error and len(examples.setdefault(s.outcome, [])) < 3 and s.error not in examples[s.outcome]:
+            examples[s.outcome].append(s.error)
+    return {
+        "calls": len(samples),
+        **counts,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput": counts["ok"] / window if window > 0 else 0.0,
+        "latency": _latency_stats(samples, "latency"),
+        "service_time": _latency_stats(samples, "service"),
+        "error_examples": examples,
+    }
+
+
+def summarize(samples: List[Sample], warmup: float, end: float) -> Dict[str, Any]:
+    """Overall and per tool stats of the calls issued after `warmup` seconds."""
+    measured = [s for s in samples if s.due >= warmup]
+    window = max(0.0, end - warmup)
+    summary = _group_stats(measured, window)
+    summary["window_seconds"] = window
+    summary["tools"] = {tool: _group_stats([s for s in measured if s.tool == tool], window)
+                        for tool in sorted({s.tool for s in measured})}
+    return summary
+
+
+def resource_summary(timeline: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    rss = [row["rss_bytes"] for row in timeline if row["rss_bytes"] is not None]
+    if not rss:
+        return None
+    return {"rss_start_bytes": rss[0], "rss_peak_bytes": max(rss), "rss_end_bytes": rss[-1],
+            "rss_growth_bytes": rss[-1] - rss[0]}
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def markdown_report(report: Dict[str, Any]) -> str:
+    summary = report["summary"]
+    header = ["tool", "calls", "ok", "errors", "error rate", "calls/s"] + [f"p{p} ms" for p in PERCENTILES] + ["max ms"]
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    rows = [(tool, stats) for tool, stats in summary["tools"].items()]
+    if len(rows) != 1:
+        rows.append(("**all**", summary))
+    for tool, stats in rows:
+        row = [tool, str(stats["calls"]), str(stats["ok"]), str(stats["calls"] - stats["ok"]),
+               f"{stats['error_rate']:.1%}", f"{stats['throughput']:.1f}"]
+        row += [_ms(stats["latency"][f"p{p}"]) for p in PERCENTILES] + [_ms(stats["latency"]["max"])]
+        lines.append("| " + " | ".join(row) + " |")
+
+    resources = report.get("resources")
+    if resources:
+        lines.append(f"\nServer RSS: {resources['rss_start_bytes'] / 2**20:.1f} MB at start, "
+                     f"{resources['rss_peak_bytes'] / 2**20:.1f} MB peak, "
+                     f"{resources['rss_end_bytes'] / 2**20:.1f} MB at end")
+    for outcome, examples in summary["error_examples"].items():
+        for example in examples:
+            lines.append(f"\n{outcome}: {example}")
+    return "\n".join(lines)
+
+
+def _spawn_http_server(target: ServerTarget, env: OfflineEnvironment, transport: str,
+                       timeout: float) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    log_path = os.path.join(env.workdir, f"{target.name}.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            [target.command] + target.args + ["--transport", transport, "--host", "127.0.0.1", "--port", str(port)],
+            stdout=log, stderr=subprocess.STDOUT, env=env.env_for(target), cwd=env.workdir,
+        )
+    try:
+        wait_for_port(port, timeout)
+    except TimeoutError:
+        process.kill()
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            tail = f.read()[-1000:]
+        raise MCPClientError(f"{target.name} did not start listening on port {port}:\n{tail}")
+    return process, f"http://127.0.0.1:{port}{HTTP_PATHS[transport]}"
+
+
+def open_clients(args, env: OfflineEnvironment,
+                 stack: ExitStack) -> Tuple[str, Optional[ServerTarget], str, List[MCPClient], List[int]]:
+    """
+    Starts or connects to the target.
+    Returns (name, bundled server or None for --url, transport, clients, server pids).
+    """
+    if args.url:
+        clients = [stack.enter_context(http_client(args.url, args.transport, pid=args.pid))
+                   for _ in range(args.clients)]
+        return args.server or args.url, None, clients[0].transport, clients, [args.pid] if args.pid else []
+
+    targets, skipped = discover_targets(args.config, [args.server])
+    if not targets:
+        sys.exit(f"Cannot load {args.server}: {skipped.get(args.server, 'not a bundled Python MCP server')}")
+    target = targets[0]
+    if target.note:
+        print(f"Note: {target.note}")
+
+    transport = args.transport or "stdio"
+    if transport == "stdio":
+        # One process per client, like crews that each start their own stdio server
+        clients = []
+        for _ in range(args.clients):
+            client = stack.enter_context(StdioMCPClient(target.command, target.args, env=env.env_for(target),
+                                                        cwd=env.workdir))
+            clients.append(client)
+        return target.name, target, transport, clients, [c.pid for c in clients]
+
+    process, url = _spawn_http_server(target, env, transport, args.timeout)
+    stack.callback(process.wait, 10)
+    stack.callback(process.terminate)
+    clients = [stack.enter_context(http_client(url, transport, pid=process.pid)) for _ in range(args.clients)]
+    return target.name, target, transport, clients, [process.pid]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sustained load generator for MCP servers")
+    target = parser.add_argument_group("target")
+    target.add_argument("--server", help="Bundled server from the MCP config (started offline)")
+    target.add_argument("--config", default=default_config_path(), help="MCP config (default: crewai_mcp.json)")
+    target.add_argument("--transport", choices=["stdio", "streamable-http", "sse"],
+                        help="How to talk to --server (default: stdio); for --url, default from its path")
+    target.add_argument("--url", help="Already running HTTP MCP server instead of --server")
+    target.add_argument("--pid", type=int, help="Process id of the --url server, for RSS sampling")
+    target.add_argument("--audio", help="Audio file for yt-whisper (default: generated tone)")
+    target.add_argument("--comfyui-config",
+                        help="Mock ComfyUI simulator config, JSON file or inline (render times, failures, image sizes)")
+
+    load = parser.add_argument_group("load")
+    mode = load.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=4, help="Closed loop: parallel callers (default: 4)")
+    mode.add_argument("--rate", type=float, help="Open loop: calls per second")
+    load.add_argument("--poisson", action="store_true", help="Open loop: exponential inter-arrival times")
+    load.add_argument("--max-in-flight", type=int, default=256, help="Open loop: cap on concurrent calls")
+    load.add_argument("--clients", type=int, default=1,
+                      help="MCP sessions to spread calls over (stdio: one server process each)")
+    load.add_argument("--mix", help="JSON list of {tool, arguments, weight} (default: the server's profile call)")
+    load.add_argument("--duration", type=float, help="Seconds to run (default: 30 unless --calls is given)")
+    load.add_argument("--calls", type=int, help="Stop after this many calls")
+    load.add_argument("--warmup", type=float, default=0.0, help="Seconds excluded from the summary")
+    load.add_argument("--timeout", type=float, default=120.0, help="Per call timeout in seconds")
+    load.add_argument("--seed", type=int, default=0)
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--interval", type=float, default=1.0, help="Seconds between RSS/throughput samples")
+    output.add_argument("--json", help="Write the full report here (default: TEST/benchmarks/results/)")
+    output.add_argument("--markdown", help="Also write the summary table to this file")
+    output.add_argument("--max-error-rate", type=float, help="Exit with status 1 above this error rate (0.01 = 1%%)")
+    output.add_argument("--quiet", action="store_true", help="No progress lines")
+    args = parser.parse_args()
+
+    if not args.server and not args.url:
+        parser.error("one of --server or --url is required")
+    if args.url and args.transport == "stdio":
+        parser.error("--url needs an HTTP transport")
+    if args.duration is None and args.calls is None:
+        args.duration = 30.0
+
+    with OfflineEnvironment(audio=args.audio, comfyui_config=args.comfyui_config) as env, ExitStack() as stack:
+        try:
+            name, server, transport, clients, pids = open_clients(args, env, stack)
+            for client in clients:
+                client.initialize(timeout=args.timeout)
+            available = {tool["name"] for tool in clients[0].list_tools(timeout=args.timeout)}
+        except MCPClientError as e:
+            sys.exit(f"Could not connect: {e}")
+
+        if args.mix:
+            mix = load_mix(args.mix)
+        elif server is not None:
+            mix = [CallSpec(*env.call_for(server))]
+        else:
+            parser.error("--mix is required with --url")
+        missing = sorted({spec.tool for spec in mix} - available)
+        if missing:
+            sys.exit(f"{name} has no tool(s) {', '.join(missing)}; available: {', '.join(sorted(available))}")
+
+        mode = f"rate {args.rate:g}/s" if args.rate else f"concurrency {args.concurrency}"
+        limit = " and ".join(x for x in (args.duration and f"{args.duration:g}s", args.calls and f"{args.calls} calls")
+                             if x)
+        print(f"Loading {name} over {transport} ({len(clients)} session(s)), {mode}, for {limit}...")
+
+        recorder = Recorder()
+        sampler = ResourceSampler(pids, recorder, args.interval, args.quiet)
+        sampler.start()
+        if args.rate:
+            run_open_loop(clients, mix, recorder, args.rate, args.duration, args.calls, args.timeout, args.seed,
+                          args.poisson, args.max_in_flight)
+        else:
+            run_closed_loop(clients, mix, recorder, args.concurrency, args.duration, args.calls, args.timeout,
+                            args.seed)
+        end = recorder.now()
+        sampler.stop()
+
+    report = {
+        "benchmark": "load",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": name,
+        "transport": transport,
+        "sessions": len(clients),
+        "mode": "open" if args.rate else "closed",
+        "concurrency": None if args.rate else args.concurrency,
+        "rate": args.rate,
+        "duration_seconds": end,
+        "warmup_seconds": args.warmup,
+        "mix": [vars(spec) for spec in mix],
+        "summary": summarize(recorder.samples, args.warmup, end),
+        "resources": resource_summary(sampler.timeline),
+        "timeline": sampler.timeline,
+    }
+
+    table = markdown_report(report)
+    print()
+    print(table)
+
+    json_path = args.json or os.path.join(BENCH_DIR, "results", f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {json_path}")
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+
+    error_rate = report["summary"]["error_rate"]
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        print(f"\nError rate {error_rate:.1%} is above {args.max_error_rate:.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urljoin
+
+import httpx
+from httpx_sse import EventSource, connect_sse
+
+from mcp_stdio_client import LATEST_PROTOCOL_VERSION, MCPClient, MCPClientError
+
+
+class StreamableHTTPMCPClient(MCPClient):
+    """
+    MCP client for servers running with `--transport streamable-http`.
+
+    Every request is its own POST whose response (plain JSON or a short SSE
+    stream) carries the reply, so concurrent requests use concurrent
+    connections from the keep-alive pool.
+    """
+
+    transport = "streamable-http"
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, max_connections: int = 256,
+                 pid: Optional[int] = None):
+        """
+        pid: Server process id for RSS sampling, if known.
+        """
+        super().__init__()
+        self.url = url
+        self._pid = pid
+        self._session_id: Optional[str] = None
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http = httpx.Client(headers=headers, limits=limits, timeout=httpx.Timeout(30.0, read=None))
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._pid
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json",
+                   "MCP-Protocol-Version": LATEST_PROTOCOL_VERSION}
+        if self._session_id:
+            headers["Mcp-Session-Id"] = self._session_id
+        return headers
+
+    def _send(self, message: Dict[str, Any]):
+        try:
+            with self._http.stream("POST", self.url, content=json.dumps(message), headers=self._headers()) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    raise MCPClientError(f"HTTP {response.status_code}: {response.text[:200]}")
+                self._session_id = response.headers.get("mcp-session-id", self._session_id)
+                content_type = response.headers.get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    for event in EventSource(response).iter_sse():
+                        if event.event == "message" and event.data:
+                            self._dispatch(json.loads(event.data))
+                elif content_type.startswith("application/json"):
+                    if not response.read():
+                        return  # 202 Accepted for notifications and responses
+                    replies = response.json()
+                    for reply in replies if isinstance(replies, list) else [replies]:
+                        self._dispatch(reply)
+        except httpx.HTTPError as e:
+            raise MCPClientError(f"{type(e).__name__}: {e}")
+
+    def close(self):
+        if self._session_id:
+            try:
+                self._http.delete(self.url, headers=self._headers())
+            except httpx.HTTPError:
+                pass
+        self._http.close()
+
+
+class SSEMCPClient(MCPClient):
+    """
+    MCP client for servers running with `--transport sse`: replies arrive on
+    one long-lived event stream, requests are POSTed to the endpoint the
+    server announces on it.
+    """
+
+    transport = "sse"
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, max_connections: int = 256,
+                 pid: Optional[int] = None, connect_timeout: float = 30.0):
+        super().__init__()
+        self.url = url
+        self._pid = pid
+        self._endpoint: Optional[str] = None
+        self._connected = threading.Event()
+        self._closed = False
+        self._error: Optional[str] = None
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http = httpx.Client(headers=headers, limits=limits, timeout=httpx.Timeout(30.0, read=None))
+        threading.Thread(target=self._read_events, name="mcp-client-sse", daemon=True).start()
+        if not self._connected.wait(connect_timeout) or self._endpoint is None:
+            self._http.close()
+            raise MCPClientError(self._error or f"no endpoint event from {url} after {connect_timeout}s")
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._pid
+
+    def _read_events(self):
+        try:
+            with connect_sse(self._http, "GET", self.url) as source:
+                source.response.raise_for_status()
+                for event in source.iter_sse():
+                    if event.event == "endpoint":
+                        self._endpoint = urljoin(self.url, event.data)
+                        self._connected.set()
+                    elif event.event == "message" and event.data:
+                        self._dispatch(json.loads(event.data))
+        except Exception as e:
+            self._error = f"{type(e).__name__}: {e}"
+        finally:
+            self._connected.set()
+            if not self._closed:
+                self._fail_pending(f"event stream closed ({self._error or 'by server'})")
+
+    def _send(self, message: Dict[str, Any]):
+        try:
+            response = self._http.post(self._endpoint, content=json.dumps(message),
+                                       headers={"Content-Type": "application/json"})
+        except httpx.HTTPError as e:
+            raise MCPClientError(f"{type(e).__name__}: {e}")
+        if response.status_code >= 400:
+            raise MCPClientError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    def close(self):
+        self._closed = True
+        self._http.close()
+
+
+def http_client(url: str, transport: Optional[str] = None, **kwargs) -> MCPClient:
+    """Client for `url`; the transport defaults to SSE for URLs ending in /sse."""
+    transport = transport or ("sse" if url.rstrip("/").endswith("/sse") else "streamable-http")
+    if transport == "sse":
+        return SSEMCPClient(url, **kwargs)
+    if transport == "streamable-http":
+        return StreamableHTTPMCPClient(url, **kwargs)
+    raise ValueError(f"Unsupported transport '{transport}'")
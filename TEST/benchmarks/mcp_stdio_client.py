@@ -0,0 +1,224 @@
+import itertools
+import json
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from mcp.types import LATEST_PROTOCOL_VERSION
+except ImportError:
+    LATEST_PROTOCOL_VERSION = "2025-06-18"
+
+
+class MCPClientError(RuntimeError):
+    """JSON-RPC error returned by the server, or the server going away."""
+
+
+class MCPClient:
+    """
+    Transport-independent half of a minimal synchronous MCP client: request
+    ids, matching responses to waiting callers and the MCP methods the
+    benchmarks use. Subclasses deliver messages with `_send` and hand every
+    message they receive to `_dispatch`. Requests may be issued from several
+    threads at once.
+    """
+
+    def __init__(self):
+        self.server_info: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Server process id, when the client knows it."""
+        return None
+
+    def _send(self, message: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _dispatch(self, message: Dict[str, Any]):
+        if "method" in message:
+            self._handle_server_message(message)
+            return
+        with self._lock:
+            future = self._pending.pop(message.get("id"), None)
+        if future is None:
+            return
+        if "error" in message:
+            error = message["error"]
+            future.set_exception(MCPClientError(f"{error.get('code')}: {error.get('message')}"))
+        else:
+            future.set_result(message.get("result", {}))
+
+    def _fail_pending(self, reason: str):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(MCPClientError(reason))
+
+    def _handle_server_message(self, message: Dict[str, Any]):
+        if "id" not in message:
+            return  # notification (logging, progress)
+        if message["method"] == "ping":
+            self._send({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+        else:
+            self._send({"jsonrpc": "2.0", "id": message["id"],
+                        "error": {"code": -32601, "message": f"Method not supported: {message['method']}"}})
+
+    def request(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 120.0) -> Dict[str, Any]:
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            self._send(message)
+            return future.result(timeout)
+        except TimeoutError:
+            raise MCPClientError(f"{method} timed out after {timeout}s")
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        self._send(message)
+
+    def initialize(self, timeout: float = 120.0) -> Dict[str, Any]:
+        result = self.request("initialize", {
+            "protocolVersion": LATEST_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "crewai-mcp-lab-bench", "version": "1.0"},
+        }, timeout=timeout)
+        self.server_info = result.get("serverInfo", {})
+        self.notify("notifications/initialized")
+        return result
+
+    def list_tools(self, timeout: float = 60.0) -> List[Dict[str, Any]]:
+        return self.request("tools/list", {}, timeout=timeout).get("tools", [])
+
+    def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, timeout: float = 300.0) -> Dict[str, Any]:
+        return self.request("tools/call", {"name": name, "arguments": arguments or {}}, timeout=timeout)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class StdioMCPClient(MCPClient):
+    """
+    MCP client speaking newline-delimited JSON-RPC to a server child process.
+
+    Written against the wire protocol rather than the `mcp` client library so
+    that benchmarks control exactly when the process is spawned, can time each
+    request individually and know the server's pid (for RSS sampling).
+    """
+
+    def __init__(self, command: str, args: List[str], env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+                 on_stderr: Optional[Callable[[float, str], None]] = None):
+        """
+        on_stderr: Called with (timestamp, line) for every line the server
+        writes to stderr. Stderr is always drained so the server never blocks on it.
+        """
+        super().__init__()
+        self.command = command
+        self.args = args
+        self.env = env
+        self.cwd = cwd
+        self.on_stderr = on_stderr
+        self.process: Optional[subprocess.Popen] = None
+        self._write_lock = threading.Lock()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def spawn(self) -> float:
+        """Starts the server process. Returns the time spent in Popen, in seconds."""
+        start = time.perf_counter()
+        self.process = subprocess.Popen(
+            [self.command] + self.args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=self.env,
+            cwd=self.cwd,
+        )
+        elapsed = time.perf_counter() - start
+        threading.Thread(target=self._read_stdout, name="mcp-client-stdout", daemon=True).start()
+        threading.Thread(target=self._read_stderr, name="mcp-client-stderr", daemon=True).start()
+        return elapsed
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            self._dispatch(message)
+
+        # Server exited: fail everything still waiting
+        try:
+            code = self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            code = None
+        self._fail_pending(f"server closed stdout (exit code {code})")
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            if self.on_stderr is not None:
+                self.on_stderr(time.perf_counter(), line.decode("utf-8", errors="replace").rstrip())
+
+    def _send(self, message: Dict[str, Any]):
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        with self._write_lock:
+            try:
+                self.process.stdin.write(data)
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                raise MCPClientError(f"server is gone: {e}")
+
+    def close(self, timeout: float = 5.0):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def __enter__(self):
+        self.spawn()
+        return self
+
+
+def result_text(result: Dict[str, Any]) -> str:
+    """Concatenated text content of a tools/call result."""
+    return "".join(item.get("text", "") for item in result.get("content", []) if item.get("type") == "text")
+
+
+def is_error_result(result: Dict[str, Any]) -> bool:
+    """MCP error flag, or one of our servers' in-band "Error ..." replies."""
+    if result.get("isError"):
+        return True
+    head = result_text(result).lstrip()[:20].lower()
+    return head.startswith("error") or head.startswith('{"error"')
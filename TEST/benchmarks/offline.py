@@ -0,0 +1,210 @@
+import math
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, "..", ".."))
+STUB_DIR = os.path.join(BENCH_DIR, "stubs")
+MOCK_COMFYUI = os.path.join(PROJECT_ROOT, "mcp_servers", "comfyui", "TEST", "mock_comfyui.py")
+
+# Add project root to path to import src.mcp_loader
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.mcp_loader import MCPLoader
+
+# How each bundled Python server is exercised offline, keyed by its directory
+# under mcp_servers/. `call` is the representative first tool call.
+SERVER_PROFILES: Dict[str, Dict[str, Any]] = {
+    "comfyui": {
+        "mock_comfyui": True,
+        "call": ("generate_image", {"workflow_name": "default_workflow.json", "prompt": "a lighthouse at dusk"}),
+    },
+    "comfyui-dgspark": {
+        "mock_comfyui": True,
+        "call": ("generate_image", {"workflow_name": "default_workflow.json", "prompt": "a lighthouse at dusk"}),
+    },
+    "yfinance_mcp": {
+        "call": ("get_stock_history", {"ticker": "AAPL", "period": "1mo"}),
+    },
+    "yt-whisper": {
+        "audio": True,
+        "call": ("transcribe_youtube_video", {"youtube_url": "https://www.youtube.com/watch?v=offline-bench",
+                                              "output_name": "bench", "model": "tiny", "use_cuda": False}),
+    },
+}
+
+# Flags that select a network transport; benchmarks always talk stdio
+_TRANSPORT_FLAGS = ("--transport", "--host", "--port")
+
+
+@dataclass
+class ServerTarget:
+    """A configured server the benchmarks know how to run offline."""
+    name: str
+    kind: str
+    command: str
+    args: List[str]
+    env: Dict[str, str] = field(default_factory=dict)
+    note: Optional[str] = None
+
+    @property
+    def profile(self) -> Dict[str, Any]:
+        return SERVER_PROFILES[self.kind]
+
+    @property
+    def is_python(self) -> bool:
+        return os.path.basename(self.command).lower().startswith("python")
+
+
+def _stdio_args(args: List[str]) -> List[str]:
+    stripped, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+            continue
+        if arg in _TRANSPORT_FLAGS:
+            skip = True
+            continue
+        if any(arg.startswith(flag + "=") for flag in _TRANSPORT_FLAGS):
+            continue
+        stripped.append(arg)
+    return stripped
+
+
+def default_config_path() -> str:
+    config = os.path.join(PROJECT_ROOT, "crewai_mcp.json")
+    return config if os.path.exists(config) else os.path.join(PROJECT_ROOT, "crewai_mcp.template.json")
+
+
+def discover_targets(config_path: str, names: Optional[List[str]] = None) -> Tuple[List[ServerTarget], Dict[str, str]]:
+    """
+    Returns the configured servers that are bundled Python servers (disabled
+    ones included), and the reasons the other requested ones were skipped.
+    """
+    loader = MCPLoader(config_path, instrument=False)
+    servers = loader._read_config().get("mcpServers", {})
+    targets, skipped = [], {}
+    for name, config in servers.items():
+        if names and name not in names:
+            continue
+        command, args = loader._resolve_command(config)
+        script = next((a for a in args if isinstance(a, str) and a.endswith(".py")), None)
+        kind = os.path.basename(os.path.dirname(script)) if script else None
+        if not command or kind not in SERVER_PROFILES:
+            if names:
+                skipped[name] = "not a bundled Python MCP server"
+            continue
+        note = None
+        if not os.path.exists(command) and not shutil.which(command):
+            note = f"{config['command']} not found, using {sys.executable}"
+            command = sys.executable
+        targets.append(ServerTarget(name, kind, command, _stdio_args(args), dict(config.get("env", {})), note))
+    for name in names or []:
+        if name not in servers:
+            skipped[name] = "not in config"
+    return targets, skipped
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"nothing listening on port {port} after {timeout}s")
+
+
+def write_test_audio(path: str, seconds: float = 3.0, rate: int = 16000):
+    """A short mono WAV (440 Hz tone) standing in for a downloaded video's audio."""
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate))) for i in range(int(seconds * rate))
+    )
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(frames)
+
+
+class OfflineEnvironment:
+    """
+    Everything the bundled servers need to run without network access:
+    a mock ComfyUI, stubbed yfinance data, a local audio file behind a stub
+    yt-dlp, and a scratch directory for outputs. Use as a context manager.
+    """
+
+    def __init__(self, audio: Optional[str] = None, mock_comfyui: str = MOCK_COMFYUI,
+                 comfyui_config: Optional[str] = None):
+        """
+        audio: Audio file served to yt-whisper instead of a YouTube download.
+        Defaults to a generated 3 second tone.
+        mock_comfyui: Script exposing a Starlette `app` that imitates ComfyUI.
+        comfyui_config: Simulator config for the mock ComfyUI (JSON file or
+        inline JSON: render times, image sizes, failures; see mock_comfyui.py).
+        """
+        self.audio = audio
+        self.mock_comfyui = mock_comfyui
+        self.comfyui_config = comfyui_config
+        self.workdir = None
+        self.comfyui_address = None
+        self._mock_process = None
+
+    def __enter__(self):
+        self.workdir = tempfile.mkdtemp(prefix="mcp-bench-")
+        if self.audio is None:
+            self.audio = os.path.join(self.workdir, "bench.wav")
+            write_test_audio(self.audio)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._mock_process is not None:
+            self._mock_process.terminate()
+            self._mock_process.wait(10)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _ensure_mock_comfyui(self) -> str:
+        if self._mock_process is None:
+            port = free_port()
+            module = os.path.splitext(os.path.basename(self.mock_comfyui))[0]
+            code = (f"import sys, uvicorn; sys.path.insert(0, {os.path.dirname(self.mock_comfyui)!r}); "
+                    f"import {module}; uvicorn.run({module}.app, host='127.0.0.1', port={port}, log_level='warning')")
+            env = {**os.environ, "MOCK_COMFYUI_CONFIG": self.comfyui_config} if self.comfyui_config else None
+            self._mock_process = subprocess.Popen([sys.executable, "-c", code], env=env,
+                                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            wait_for_port(port, 30)
+            self.comfyui_address = f"127.0.0.1:{port}"
+        return self.comfyui_address
+
+    def env_for(self, target: ServerTarget) -> Dict[str, str]:
+        env = {**os.environ, **target.env, "PYTHONUNBUFFERED": "1"}
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (STUB_DIR, env.get("PYTHONPATH")) if p)
+        if target.profile.get("mock_comfyui"):
+            env["COMFYUI_SERVER_ADDRESS"] = self._ensure_mock_comfyui()
+            env["SSH_TUNNEL_REMOTE"] = ""
+        if target.profile.get("audio"):
+            env["MCP_BENCH_AUDIO"] = os.path.abspath(self.audio)
+        return env
+
+    def call_for(self, target: ServerTarget) -> Tuple[str, Dict[str, Any]]:
+        tool, arguments = target.profile["call"]
+        arguments = dict(arguments)
+        if target.profile.get("audio"):
+            arguments["output_path"] = self.workdir
+        return tool, arguments
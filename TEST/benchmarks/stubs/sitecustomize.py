@@ -0,0 +1,40 @@
+"""
+Loaded automatically by Python when this directory is on PYTHONPATH of a
+benchmarked server. Keeps the servers offline without touching their code:
+
+- yfinance is imported for real (so its import cost is measured), but
+  `yfinance.Ticker` is replaced with canned data. If yfinance is not
+  installed the stub module stands in for it.
+- `yt_dlp` in this directory shadows the real package (see yt_dlp/__main__.py).
+"""
+import importlib.abc
+import importlib.util
+import os
+import sys
+
+STUB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class _StubYFinance(importlib.abc.MetaPathFinder):
+
+    def find_spec(self, name, path, target=None):
+        if name != "yfinance":
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            print("bench: yfinance not installed, using stub module", file=sys.stderr)
+            return importlib.util.spec_from_file_location(name, os.path.join(STUB_DIR, "yfinance_stub.py"))
+
+        exec_module = spec.loader.exec_module
+
+        def exec_and_patch(module):
+            exec_module(module)
+            import yfinance_stub
+            module.Ticker = yfinance_stub.Ticker
+
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+
+sys.meta_path.insert(0, _StubYFinance())
@@ -0,0 +1,47 @@
+"""Deterministic stand-in for yfinance.Ticker: no network, same shapes."""
+import math
+from types import SimpleNamespace
+
+
+class Ticker:
+
+    def __init__(self, ticker):
+        self.ticker = ticker.upper()
+        self._base = 50 + sum(ord(c) for c in self.ticker) % 400
+        self.fast_info = SimpleNamespace(last_price=float(self._base), currency="USD")
+
+    @property
+    def info(self):
+        return {
+            "longName": f"{self.ticker} Corporation",
+            "industry": "Software",
+            "sector": "Technology",
+            "longBusinessSummary": f"{self.ticker} makes benchmark fixtures. " * 20,
+            "marketCap": self._base * 10 ** 9,
+            "trailingPE": 25.0,
+            "forwardPE": 22.0,
+            "fiftyTwoWeekHigh": self._base * 1.3,
+            "fiftyTwoWeekLow": self._base * 0.7,
+        }
+
+    @property
+    def news(self):
+        return [
+            {"title": f"{self.ticker} headline {i}", "link": f"https://example.com/{self.ticker}/{i}",
+             "publisher": "Bench Wire", "relatedTickers": [self.ticker]}
+            for i in range(10)
+        ]
+
+    def history(self, period="1mo"):
+        import pandas as pd
+
+        days = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "ytd": 200}.get(period, 1260)
+        dates = pd.bdate_range(end="2025-01-31", periods=days, name="Date")
+        close = [self._base * (1 + 0.1 * math.sin(i / 7.0) + 0.0005 * i) for i in range(days)]
+        return pd.DataFrame({
+            "Open": [c * 0.99 for c in close],
+            "High": [c * 1.01 for c in close],
+            "Low": [c * 0.98 for c in close],
+            "Close": close,
+            "Volume": [1_000_000 + 1000 * i for i in range(days)],
+        }, index=dates)
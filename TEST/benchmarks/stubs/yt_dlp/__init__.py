@@ -0,0 +1 @@
+"""Offline stand-in for yt-dlp used by the benchmarks, see __main__.py."""
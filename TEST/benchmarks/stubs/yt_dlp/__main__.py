@@ -0,0 +1,26 @@
+"""
+`python -m yt_dlp ... -o <template>` stand-in: instead of downloading,
+copies the local audio file named by $MCP_BENCH_AUDIO to the output
+template, keeping that file's extension.
+"""
+import os
+import shutil
+import sys
+
+
+def main(argv):
+    source = os.environ.get("MCP_BENCH_AUDIO")
+    if not source or not os.path.exists(source):
+        print("ERROR: MCP_BENCH_AUDIO does not point to an audio file", flush=True)
+        return 1
+    template = argv[argv.index("-o") + 1]
+    target = template.replace("%(ext)s", os.path.splitext(source)[1].lstrip("."))
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    shutil.copyfile(source, target)
+    print(f"[download] Destination: {target}", flush=True)
+    print("[download] 100% (offline benchmark copy)", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
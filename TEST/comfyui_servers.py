@@ -0,0 +1,25 @@
+"""Shared by the ComfyUI tests: loading the server scripts and the simulator."""
+import importlib.util
+import os
+import sys
+from unittest import mock
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVER_DIRS = [os.path.join(PROJECT_ROOT, "mcp_servers", name) for name in ("comfyui", "comfyui-dgspark")]
+SERVER_MODULES = ("server", "comfy_dgspark_server")
+
+
+def load_server_module(module, server_dir=SERVER_DIRS[0]):
+    """Imports `module` (e.g. "server" or "TEST/mock_comfyui") from one server's directory."""
+    name = f"{os.path.basename(module)}_{os.path.basename(server_dir).replace('-', '_')}"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(server_dir, f"{module}.py"))
+    loaded = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(loaded)
+    return loaded
+
+
+def load_server(server_dir, **env):
+    """Imports the server script of `server_dir` with `env` set, as the server reads its config at import."""
+    module = SERVER_MODULES[SERVER_DIRS.index(server_dir)]
+    with mock.patch.dict(os.environ, env), mock.patch.object(sys, "path", list(sys.path)):
+        return load_server_module(module, server_dir)
@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import backend_pool
+
+
+class FakeBackends:
+    """Canned /queue and /system_stats answers per address; None means unreachable."""
+
+    def __init__(self, **queues):
+        self.queues = {address.replace("_", ":"): length for address, length in queues.items()}
+
+    def fetch_json(self, address, path):
+        length = self.queues[address]
+        if length is None:
+            raise ConnectionRefusedError("connection refused")
+        if path == "/queue":
+            return {"queue_running": [[0, "r", {}, {}, []]] if length else [],
+                    "queue_pending": [[i, f"p{i}", {}, {}, []] for i in range(1, length)]}
+        return {"devices": [{"name": "cuda:0", "vram_total": 24, "vram_free": 20}]}
+
+
+class TestBackendPool(unittest.TestCase):
+
+    def pool(self, fake, **kwargs):
+        pool = backend_pool.BackendPool(list(fake.queues), fake.fetch_json, poll_interval=3600, **kwargs)
+        self.addCleanup(pool.stop)
+        return pool
+
+    def addresses(self, pool):
+        return [backend.address for backend in pool.candidates()]
+
+    def test_shortest_expected_wait_first(self):
+        fake = FakeBackends(local_1=3, remote_2=0)
+        pool = self.pool(fake)
+        self.assertEqual(self.addresses(pool), ["remote:2", "local:1"])
+        self.assertEqual(pool.describe()[0]["devices"][0]["name"], "cuda:0")
+
+        # Prompts we queued count until the next poll sees them
+        for _ in range(4):
+            pool.submitted(pool.get("remote:2"))
+        self.assertEqual(self.addresses(pool), ["local:1", "remote:2"])
+        pool.poll(pool.get("remote:2"))
+        self.assertEqual(pool.get("remote:2").queue_length, 0)
+
+    def test_faster_backend_takes_a_longer_queue(self):
+        fake = FakeBackends(slow_1=1, fast_2=2)
+        pool = self.pool(fake)
+        pool.finished("slow:1", 40)
+        pool.finished("fast:2", 5)
+        pool.finished("fast:2", 10)
+        self.assertEqual(pool.get("fast:2").service_time, 6.5)
+        self.assertEqual(self.addresses(pool), ["fast:2", "slow:1"])
+
+    def test_high_priority_only_waits_for_the_running_prompt(self):
+        fake = FakeBackends(busy_1=4, idle_2=1)
+        pool = self.pool(fake)
+        pool.finished("busy:1", 30)
+        pool.finished("idle:2", 60)
+        self.assertEqual(self.addresses(pool), ["idle:2", "busy:1"])
+        self.assertEqual([b.address for b in pool.candidates(jump_queue=True)], ["busy:1", "idle:2"])
+
+    def test_unhealthy_backends_leave_rotation_until_they_recover(self):
+        fake = FakeBackends(a_1=0, b_2=5)
+        pool = self.pool(fake, unhealthy_after=2)
+        pool.candidates()
+
+        fake.queues["a:1"] = None
+        pool.poll(pool.get("a:1"))
+        self.assertTrue(pool.get("a:1").healthy)
+        pool.poll(pool.get("a:1"))
+        self.assertFalse(pool.get("a:1").healthy)
+        self.assertIn("connection refused", pool.get("a:1").last_error)
+        # Still tried last, in case everything is down
+        self.assertEqual(self.addresses(pool), ["b:2", "a:1"])
+
+        fake.queues["a:1"] = 0
+        pool.poll_all()
+        self.assertEqual(self.addresses(pool), ["a:1", "b:2"])
+
+        pool.report_failure(pool.get("a:1"), ConnectionRefusedError("refused"), fatal=True)
+        self.assertEqual(self.addresses(pool), ["b:2", "a:1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
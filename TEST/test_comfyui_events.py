@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+import threading
+import unittest
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import comfy_events
+
+
+def event(kind, **data):
+    return json.dumps({"type": kind, "data": data})
+
+
+class TestComfyEventStream(unittest.TestCase):
+    """Feeds messages straight into the dispatcher, no ComfyUI needed."""
+
+    def setUp(self):
+        self.history = {}
+        self.stream = comfy_events.ComfyEventStream("127.0.0.1:1", get_history=self.history_for, poll_interval=0.05)
+
+    def history_for(self, prompt_id):
+        return {prompt_id: self.history[prompt_id]} if prompt_id in self.history else {}
+
+    def test_events_reach_their_own_prompt(self):
+        a, b = self.stream.track("a"), self.stream.track("b")
+        self.stream._dispatch(event("execution_start", prompt_id="a"))
+        self.stream._dispatch(event("executing", node="3", prompt_id="a"))
+        self.stream._dispatch(event("progress", value=4, max=20, node="3", prompt_id="a"))
+        self.stream._dispatch(b"preview frame")
+        self.stream._dispatch(event("executed", node="9", output={"images": [{"filename": "a.png"}]}, prompt_id="a"))
+        self.stream._dispatch(event("executing", node=None, prompt_id="a"))
+
+        self.assertEqual(a.wait(1).status, "success")
+        self.assertEqual(a.progress, (4, 20))
+        self.assertEqual(a.preview, b"preview frame")
+        self.assertEqual(a.outputs, {"9": {"images": [{"filename": "a.png"}]}})
+        self.assertEqual(b.status, "queued")
+        self.assertNotIn("a", self.stream._trackers)
+
+    def test_events_before_track_are_replayed(self):
+        # The prompt finished before queue_prompt() returned its id
+        self.stream._dispatch(event("execution_start", prompt_id="fast"))
+        self.stream._dispatch(event("executing", node=None, prompt_id="fast"))
+        tracker = self.stream.track("fast")
+        self.assertTrue(tracker.done.done())
+        self.assertEqual(tracker.status, "success")
+
+    def test_execution_error(self):
+        tracker = self.stream.track("bad")
+        self.stream._dispatch(event("execution_error", prompt_id="bad", node_id="4", node_type="CheckpointLoaderSimple",
+                                    exception_message="model not found\n"))
+        self.assertEqual(tracker.wait(1).status, "error")
+        self.assertEqual(tracker.error_message, "model not found (node CheckpointLoaderSimple)")
+
+    def test_missed_completion_is_recovered_from_history(self):
+        tracker = self.stream.track("lost")
+        threading.Timer(0.1, self.history.__setitem__,
+                        ("lost", {"outputs": {"9": {"images": []}}, "status": {"status_str": "success"}})).start()
+        self.assertIs(self.stream.wait(tracker, timeout=2), tracker)
+        self.assertTrue(tracker.resynced)
+        self.assertEqual(tracker.outputs, {"9": {"images": []}})
+
+    def test_wait_times_out(self):
+        with self.assertRaises(TimeoutError):
+            self.stream.wait(self.stream.track("slow"), timeout=0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
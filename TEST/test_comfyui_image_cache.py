@@ -0,0 +1,115 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import image_cache
+from comfyui_servers import SERVER_DIRS, load_server
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, "cache")
+        self.cache = image_cache.ImageCache(self.cache_dir, size_limit=1000)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def image(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def blobs(self):
+        return sorted(name for _, _, files in os.walk(os.path.join(self.cache_dir, "blobs")) for name in files)
+
+    def test_key_covers_the_whole_workflow(self):
+        workflow = {"3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20}}}
+        key = image_cache.ImageCache.make_key(workflow)
+        self.assertEqual(key, image_cache.ImageCache.make_key({"3": {"inputs": {"steps": 20, "seed": 1},
+                                                                     "class_type": "KSampler"}}))
+        self.assertNotEqual(key, image_cache.ImageCache.make_key({"3": {"class_type": "KSampler",
+                                                                        "inputs": {"seed": 2, "steps": 20}}}))
+
+    def test_hit_returns_read_only_content_addressed_blobs(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.put("a", [(self.image("out.png", b"x" * 100), "ComfyUI_00001_.png")])
+        self.cache.put("b", [(self.image("other.png", b"x" * 100), "ComfyUI_00002_.png")])
+
+        images = self.cache.get("a")
+        self.assertEqual(images[0]["filename"], "ComfyUI_00001_.png")
+        with open(images[0]["path"], "rb") as f:
+            self.assertEqual(f.read(), b"x" * 100)
+        self.assertFalse(os.stat(images[0]["path"]).st_mode & stat.S_IWUSR)
+        # Same bytes under two keys are stored once
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "entries": 2, "bytes": 100})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in "abc":
+            self.cache.put(key, [(self.image(f"{key}.png", key.encode() * 400), f"{key}.png")])
+            if key == "b":
+                self.cache.get("a")  # a is now more recent than b
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("c"))
+        self.assertEqual(len(self.blobs()), 2)
+
+    def test_damaged_blob_is_a_miss_and_shared_across_instances(self):
+        self.cache.put("a", [(self.image("a.png", b"a" * 100), "a.png")])
+        other = image_cache.ImageCache(self.cache_dir, size_limit=1000)
+        try:
+            path = other.get("a")[0]["path"]
+            os.chmod(path, 0o644)
+            with open(path, "ab") as f:
+                f.write(b"changed in place")
+            self.assertIsNone(other.get("a"))
+            self.assertIsNone(self.cache.get("a"))
+            self.assertEqual(self.blobs(), [])
+        finally:
+            other.close()
+
+
+class TestCacheHitsWithSeveralBackends(unittest.TestCase):
+    # Neither backend is COMFYUI_SERVER_ADDRESS, the default address of save_outputs
+    ENV = {"COMFYUI_SERVER_ADDRESS": "127.0.0.1:8188", "COMFYUI_BACKENDS": "10.0.0.5:8188,10.0.0.6:8188"}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_hit_is_saved_without_a_backend(self):
+        for server_dir in SERVER_DIRS:
+            with self.subTest(server=os.path.basename(server_dir)):
+                server = load_server(server_dir, COMFYUI_IMAGE_CACHE=os.path.join(self.directory, "cache"), **self.ENV)
+                self.addCleanup(server.image_cache.close)
+                source = os.path.join(self.directory, "render.png")
+                with open(source, "wb") as f:
+                    f.write(b"png" * 10)
+                server.image_cache.put("key", [(source, "ComfyUI_00001_.png")])
+
+                dest = os.path.join(self.directory, f"{os.path.basename(server_dir)}.png")
+                self.assertEqual(server.cached_generation("key", dest), f"Generated and saved to: {dest}")
+                with open(dest, "rb") as f:
+                    self.assertEqual(f.read(), b"png" * 10)
+                self.assertEqual(server.image_cache.stats()["hits"], 1)
+
+                # A plain writable copy: changing it leaves the cached blob alone
+                with open(dest, "wb") as f:
+                    f.write(b"edited")
+                blob = server.image_cache.get("key")[0]["path"]
+                with open(blob, "rb") as f:
+                    self.assertEqual(f.read(), b"png" * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
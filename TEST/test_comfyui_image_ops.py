@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from PIL import Image
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import image_ops
+from comfyui_servers import SERVER_DIRS, load_server
+
+
+class TestImageOps(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.source = os.path.join(self.directory, "portrait.png")
+        Image.new("RGBA", (800, 600), (200, 30, 30, 0)).save(self.source)
+
+    def test_target_size(self):
+        self.assertEqual(image_ops.target_size((800, 600), width=400), (400, 300))
+        self.assertEqual(image_ops.target_size((800, 600), height=150), (200, 150))
+        self.assertEqual(image_ops.target_size((800, 600), scale=1.5), (1200, 900))
+        self.assertEqual(image_ops.target_size((800, 600), 10, 20), (10, 20))
+        for kwargs in ({}, {"width": 0}, {"scale": 2, "width": 10}):
+            with self.assertRaises(ValueError):
+                image_ops.target_size((800, 600), **kwargs)
+
+    def test_operations_and_destinations(self):
+        dest, size = image_ops.process(self.source, "resize", scale=0.5)
+        self.assertEqual((dest, size), (os.path.join(self.directory, "portrait_resize.png"), (400, 300)))
+
+        thumbs = os.path.join(self.directory, "thumbs")
+        dest, size = image_ops.process(self.source, "thumbnail", thumbs, width=128, height=128)
+        self.assertEqual((dest, size), (os.path.join(thumbs, "portrait_thumbnail.png"), (128, 96)))
+        # A thumbnail never enlarges
+        self.assertEqual(image_ops.process(self.source, "thumbnail", width=2000)[1], (800, 600))
+
+        dest, size = image_ops.process(self.source, "crop", os.path.join(self.directory, "face.webp"), box=[10, 20, 110, 70])
+        with Image.open(dest) as cropped:
+            self.assertEqual((cropped.format, cropped.size), ("WEBP", (100, 50)))
+        with self.assertRaises(ValueError):
+            image_ops.process(self.source, "crop", box=[0, 0, 900, 10])
+
+    def test_convert_flattens_alpha_for_jpeg(self):
+        dest, _ = image_ops.process(self.source, "convert", format="jpg", quality=90)
+        self.assertEqual(dest, os.path.join(self.directory, "portrait_convert.jpg"))
+        with Image.open(dest) as converted:
+            self.assertEqual((converted.format, converted.mode), ("JPEG", "RGB"))
+            # Fully transparent pixels come out white, not the hidden red
+            self.assertGreater(min(converted.getpixel((5, 5))), 240)
+        with self.assertRaises(ValueError):
+            image_ops.process(self.source, "convert", format="heic")
+        # A file path whose extension disagrees with the format would hold the wrong bytes
+        with self.assertRaises(ValueError):
+            image_ops.process(self.source, "convert", os.path.join(self.directory, "out.png"), format="jpg")
+        self.assertEqual(image_ops.destination(self.source, "out.jpeg", "convert", "JPG"), "out.jpeg")
+        self.assertEqual(sorted(os.listdir(self.directory)), ["portrait.png", "portrait_convert.jpg"])
+
+
+    def test_model_operations_refuse_options_they_cannot_apply(self):
+        for server_dir in SERVER_DIRS:
+            with self.subTest(server=os.path.basename(server_dir)):
+                server = load_server(server_dir)
+                upscale = server.ImageOperation(input_path=self.source, operation="upscale")
+                self.assertIsNone(server.model_op_error(upscale))
+                self.assertIsNone(server.model_op_error(upscale.model_copy(update={"format": "PNG"})))
+                for update, error in (({"width": 512, "quality": 80}, "does not take width, quality"),
+                                      ({"format": "jpg"}, "does not take format"),
+                                      ({"output_path": "big.jpg"}, "does not end in .png"),
+                                      ({"input_path": "missing.png"}, "input image not found")):
+                    self.assertIn(error, server.model_op_error(upscale.model_copy(update=update)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import unittest
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import comfy_events, comfy_jobs
+
+
+QUEUE = {
+    "queue_running": [[4, "running", {}, {}, []]],
+    # ComfyUI does not keep pending prompts sorted
+    "queue_pending": [[7, "last", {}, {}, []], [5, "next", {}, {}, []], [6, "middle", {}, {}, []]],
+}
+
+
+def job(prompt_id, workflow="default_workflow.json"):
+    return comfy_jobs.Job(comfy_events.PromptTracker(prompt_id), workflow)
+
+
+class TestJobs(unittest.TestCase):
+
+    def test_queue_position(self):
+        self.assertEqual(comfy_jobs.queue_position(QUEUE, "running"), 0)
+        self.assertEqual(comfy_jobs.queue_position(QUEUE, "next"), 1)
+        self.assertEqual(comfy_jobs.queue_position(QUEUE, "last"), 3)
+        self.assertIsNone(comfy_jobs.queue_position(QUEUE, "gone"))
+
+    def test_describe_follows_the_prompt(self):
+        queued = job("middle")
+        self.assertEqual(queued.describe(QUEUE)["queue_position"], 2)
+        # The queue already has it running before the websocket says so
+        self.assertEqual(job("running").describe(QUEUE)["status"], "running")
+
+        queued.tracker.handle("executing", {"node": "3"})
+        queued.tracker.handle("progress", {"node": "3", "value": 5, "max": 20})
+        info = queued.describe()
+        self.assertEqual((info["status"], info["node"], info["percent"]), ("running", "3", 25))
+
+        queued.tracker.handle("executing", {"node": None})
+        self.assertEqual(queued.status, "saving")
+        queued.future.set_result("Generated and saved to: a.png")
+        info = queued.describe()
+        self.assertEqual((info["status"], info["result"]), ("success", "Generated and saved to: a.png"))
+
+    def test_cancelled_tracker(self):
+        cancelled = job("next")
+        cancelled.tracker.cancel()
+        self.assertTrue(cancelled.tracker.done.done())
+        self.assertEqual(cancelled.tracker.error_message, "cancelled")
+        cancelled.tracker.handle("execution_start", {})
+        self.assertEqual(cancelled.status, "cancelled")
+
+    def test_node_timings_and_timeout_status(self):
+        timed = job("next")
+        self.assertEqual(comfy_jobs.format_state(comfy_jobs.prompt_state(timed.tracker, QUEUE)),
+                         "queued at position 1, 0s elapsed")
+
+        timed.tracker.handle("executing", {"node": "4"})
+        timed.tracker.handle("executing", {"node": "3"})
+        timed.tracker.handle("progress", {"node": "3", "value": 1, "max": 4})
+        state = comfy_jobs.prompt_state(timed.tracker)
+        self.assertEqual(list(state["node_times"]), ["4"])
+        self.assertRegex(comfy_jobs.format_state(state), r"^running node 3 \(25%\), 0s elapsed; nodes took 4: 0\.0s$")
+
+        # Past its deadline the job reports "timeout", even once ComfyUI says interrupted
+        timed.tracker.timed_out = True
+        timed.tracker.handle("execution_interrupted", {})
+        self.assertEqual(list(timed.tracker.node_times), ["4", "3"])
+        self.assertEqual(timed.status, "timeout")
+        self.assertEqual(timed.describe()["status"], "timeout")
+
+    def test_queue_order_by_priority(self):
+        self.assertEqual(comfy_jobs.queue_order(0), {})
+        numbers = {}
+        for sequence, (name, priority) in enumerate([("low", -1), ("high", 1), ("urgent", 2), ("high2", 1)]):
+            fields = comfy_jobs.queue_order(priority, sequence=1.7e9 + sequence)
+            self.assertEqual(fields.get("front", False), priority > 0)
+            numbers[name] = fields["number"]
+        # ComfyUI's own numbers count up from 0 for normal prompts
+        numbers["normal"] = 12
+        self.assertEqual(sorted(numbers, key=numbers.get), ["urgent", "high", "high2", "normal", "low"])
+
+    def test_identical_requests_share_one_prompt(self):
+        inflight = comfy_jobs.InFlight()
+        flight, first = inflight.join("key")
+        self.assertTrue(first)
+        follower, first = inflight.join("key")
+        self.assertIs(follower, flight)
+        self.assertFalse(first)
+
+        tracker = comfy_events.PromptTracker("p1")
+        threading.Timer(0.05, inflight.started, (flight, tracker, "stream")).start()
+        self.assertEqual(follower.wait(), (tracker, "stream"))
+        self.assertEqual(inflight.waiters("p1"), 2)
+
+        self.assertEqual(inflight.leave("p1"), 1)
+        self.assertEqual(inflight.leave("p1"), 0)
+        self.assertEqual(inflight.waiters("p1"), 0)
+        self.assertTrue(inflight.join("key")[1])
+
+    def test_failed_submit_reaches_followers_and_is_not_reused(self):
+        inflight = comfy_jobs.InFlight()
+        flight, _ = inflight.join("key")
+        follower, _ = inflight.join("key")
+        inflight.failed(flight, ConnectionError("ComfyUI is down"))
+        with self.assertRaises(ConnectionError):
+            follower.wait()
+        self.assertTrue(inflight.join("key")[1])
+
+        # A failed render is not shared with later requests either
+        flight, _ = inflight.join("other")
+        tracker = comfy_events.PromptTracker("p2")
+        inflight.started(flight, tracker, "stream")
+        tracker.handle("execution_error", {"exception_message": "out of memory"})
+        self.assertTrue(inflight.join("other")[1])
+
+    def test_wait_all_and_any(self):
+        table = comfy_jobs.JobTable()
+        fast, slow = table.add(job("fast")), table.add(job("slow"))
+        threading.Timer(0.05, fast.future.set_result, ("ok",)).start()
+
+        done, pending = table.wait([fast, slow], timeout=2, return_when="any")
+        self.assertEqual((done, pending), ([fast], [slow]))
+        done, pending = table.wait([fast, slow], timeout=0.1)
+        self.assertEqual((done, pending), ([fast], [slow]))
+
+    def test_unknown_and_dropped_jobs(self):
+        table = comfy_jobs.JobTable(keep=2)
+        first = table.add(job("a"))
+        first.future.set_result("ok")
+        running = table.add(job("b"))
+        for prompt_id in ("c", "d"):
+            table.add(job(prompt_id)).future.set_result("ok")
+        table.add(job("e"))
+
+        # Oldest finished job is dropped; unfinished ones are always kept
+        with self.assertRaises(KeyError):
+            table.get("a")
+        self.assertIs(table.get("b"), running)
+        self.assertEqual(len(table), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import struct
+import sys
+import unittest
+import zlib
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import comfy_preflight
+from comfyui_servers import SERVER_DIRS
+
+
+OBJECT_INFO = {
+    "LoadImage": {"input": {"required": {"image": [["example.png"], {"image_upload": True}]}}},
+    "UpscaleModelLoader": {"input": {"required": {"model_name": [["RealESRGAN_x4plus.pth"], {}]}}},
+    # Newer ComfyUI describes combos this way
+    "ImageUpscaleWithModel": {"input": {"required": {"upscale_model": ["UPSCALE_MODEL"], "image": ["IMAGE"]}}},
+    "SaveImage": {"input": {"required": {"images": ["IMAGE"], "filename_prefix": ["STRING", {}]}}},
+    "ImageScale": {"input": {"required": {"upscale_method": ["COMBO", {"options": ["nearest-exact", "lanczos"]}],
+                                          "width": ["INT", {}], "height": ["INT", {}]}}},
+}
+
+
+def load_workflow(name):
+    with open(os.path.join(SERVER_DIRS[0], "workflow_files", name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TestFindProblems(unittest.TestCase):
+
+    def test_installed_workflow_passes(self):
+        # LoadImage's file list is stale by design: uploads arrive after /object_info was fetched
+        self.assertEqual(comfy_preflight.find_problems(OBJECT_INFO, load_workflow("upscale_workflow.json")), [])
+        self.assertEqual(comfy_preflight.find_problems(OBJECT_INFO, load_workflow("resize_workflow.json")), [])
+
+    def test_missing_nodes_and_models(self):
+        info = dict(OBJECT_INFO, UpscaleModelLoader={"input": {"required": {"model_name": [["4x_other.pth"], {}]}}})
+        problems = comfy_preflight.find_problems(info, load_workflow("upscale_workflow.json"))
+        self.assertEqual(problems, ["'RealESRGAN_x4plus.pth' is not available for UpscaleModelLoader.model_name (node 2)"])
+
+        problems = comfy_preflight.find_problems(OBJECT_INFO, load_workflow("remove_background_workflow.json"))
+        self.assertEqual(problems, ["node type 'RMBG' is not installed (node 1)"])
+
+
+class TestObjectInfoCache(unittest.TestCase):
+
+    def setUp(self):
+        self.answers = [OBJECT_INFO]
+        self.fetches = 0
+
+    def fetch_json(self, address, path):
+        self.fetches += 1
+        answer = self.answers[min(self.fetches, len(self.answers)) - 1]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def test_fetched_once_and_refreshed_before_rejecting(self):
+        cache = comfy_preflight.ObjectInfoCache(self.fetch_json, max_age=0)
+        self.assertEqual(cache.validate("a:1", load_workflow("resize_workflow.json")), [])
+        self.assertEqual(cache.validate("a:1", load_workflow("upscale_workflow.json")), [])
+        self.assertEqual(self.fetches, 1)
+
+        # RMBG was installed after the first fetch
+        self.answers.append(dict(OBJECT_INFO, RMBG={"input": {"required": {}}}))
+        self.assertEqual(cache.validate("a:1", load_workflow("remove_background_workflow.json")), [])
+        self.assertEqual(self.fetches, 2)
+
+    def test_unreachable_backend_is_not_judged_nor_asked_each_time(self):
+        self.answers = [ConnectionRefusedError("refused")]
+        cache = comfy_preflight.ObjectInfoCache(self.fetch_json)
+        self.assertEqual(cache.validate("a:1", load_workflow("remove_background_workflow.json")), [])
+        self.assertIsNone(cache.get("a:1"))
+        self.assertEqual(self.fetches, 1)
+
+
+class TestWarmup(unittest.TestCase):
+
+    def test_minimal_workflow(self):
+        workflow = load_workflow("default_workflow.json")
+        warm = comfy_preflight.warmup_workflow(workflow, output_nodes=["60"])
+        sizes = [(n["inputs"]["width"], n["inputs"]["height"]) for n in warm.values() if "width" in n["inputs"]]
+        self.assertTrue(sizes and all(size == (64, 64) for size in sizes))
+        self.assertEqual(warm["3"]["inputs"]["steps"], 1)
+        self.assertEqual((warm["60"]["class_type"], warm["60"]["inputs"]), ("PreviewImage", {"images": ["8", 0]}))
+        self.assertEqual(workflow["60"]["class_type"], "SaveImage")
+
+        warm = comfy_preflight.warmup_workflow(load_workflow("upscale_workflow.json"), ["4"], "mcp/blank.png", [("1", "image")])
+        self.assertEqual(warm["1"]["inputs"]["image"], "mcp/blank.png")
+
+    def test_blank_png(self):
+        png = comfy_preflight.blank_png(4, 2)
+        self.assertTrue(png.startswith(b"\x89PNG\r\n\x1a\n"))
+        width, height = struct.unpack(">II", png[16:24])
+        self.assertEqual((width, height), (4, 2))
+        idat = png.index(b"IDAT")
+        length = struct.unpack(">I", png[idat - 4:idat])[0]
+        self.assertEqual(zlib.decompress(png[idat + 4:idat + 4 + length]), (b"\x00" + b"\x00" * 12) * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import io
+import json
+import random
+import time
+import unittest
+
+from PIL import Image
+from starlette.testclient import TestClient
+
+from comfyui_servers import load_server_module
+
+mock_comfyui = load_server_module("TEST/mock_comfyui")
+
+
+def workflow(prefix="mcp/test", steps=4, size=(64, 64)):
+    return {
+        "3": {"class_type": "KSampler", "inputs": {"steps": steps, "model": ["4", 0], "latent_image": ["5", 0]}},
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": size[0], "height": size[1], "batch_size": 1}},
+        "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": prefix, "images": ["3", 0]}},
+    }
+
+
+def wait_for(client, prompt_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entry = client.get(f"/history/{prompt_id}").json().get(prompt_id)
+        if entry:
+            return entry
+        time.sleep(0.01)
+    raise AssertionError(f"prompt {prompt_id} did not finish")
+
+
+class TestComfyUISimulator(unittest.TestCase):
+
+    def client(self, **config):
+        source = json.dumps(dict({"seed": 1, "default": {"service_time": 0.05}}, **config))
+        client = TestClient(mock_comfyui.create_app(mock_comfyui.load_config(source)))
+        client.__enter__()
+        self.addCleanup(client.__exit__, None, None, None)
+        return client
+
+    def submit(self, client, **body):
+        response = client.post("/prompt", json=dict({"prompt": workflow()}, **body))
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()["prompt_id"]
+
+    def test_queue_runs_by_number_with_front_first(self):
+        client = self.client(default={"service_time": 0.3})
+        running = self.submit(client, prompt_id="running")
+        for prompt_id, extra in (("late", {"number": 50}), ("next", {}), ("urgent", {"front": True})):
+            self.submit(client, prompt_id=prompt_id, **extra)
+
+        queue = client.get("/queue").json()
+        self.assertEqual([entry[1] for entry in queue["queue_running"]], [running])
+        pending = sorted(queue["queue_pending"], key=lambda entry: entry[0])
+        self.assertEqual([entry[1] for entry in pending], ["urgent", "next", "late"])
+        self.assertEqual(pending[0][3], {"client_id": None})
+        self.assertEqual(pending[0][4], ["9"])
+
+        client.post("/queue", json={"delete": ["next"]})
+        for prompt_id in ("urgent", "late"):
+            wait_for(client, prompt_id)
+        finished = list(client.get("/history").json())
+        self.assertEqual(finished, ["running", "urgent", "late"])
+        stats = client.get("/simulator/stats").json()
+        self.assertEqual((stats["completed"], stats["deleted"], stats["queue_remaining"]), (3, 1, 0))
+
+    def test_websocket_reports_nodes_progress_and_outputs(self):
+        client = self.client()
+        with client.websocket_connect("/ws?clientId=me") as ws:
+            self.assertEqual(ws.receive_json()["data"]["sid"], "me")
+            prompt_id = self.submit(client, client_id="me")
+            messages = []
+            while not messages or messages[-1]["type"] != "execution_success":
+                messages.append(ws.receive_json())
+
+        kinds = [message["type"] for message in messages if message["type"] != "status"]
+        self.assertEqual(kinds[:2], ["execution_start", "execution_cached"])
+        executing = [m["data"]["node"] for m in messages if m["type"] == "executing"]
+        # Loaders before the sampler, the sampler before the save node
+        self.assertEqual(executing, ["4", "5", "3", "9", None])
+        progress = [m["data"]["value"] for m in messages if m["type"] == "progress"]
+        self.assertEqual(progress, [1, 2, 3, 4])
+        executed = next(m["data"] for m in messages if m["type"] == "executed")
+        image = executed["output"]["images"][0]
+        self.assertEqual((image["subfolder"], image["type"]), ("mcp", "output"))
+        self.assertTrue(image["filename"].startswith("test_"))
+        self.assertEqual(wait_for(client, prompt_id)["outputs"]["9"], executed["output"])
+
+    def test_interrupt_stops_the_running_prompt(self):
+        client = self.client(default={"service_time": 5})
+        prompt_id = self.submit(client)
+        while not client.get("/queue").json()["queue_running"]:
+            time.sleep(0.01)
+        client.post("/interrupt", json={"prompt_id": "someone-else"})
+        self.assertTrue(client.get("/queue").json()["queue_running"])
+        client.post("/interrupt")
+        entry = wait_for(client, prompt_id, timeout=2)
+        self.assertEqual(entry["status"]["status_str"], "error")
+        self.assertEqual(entry["status"]["messages"][-1][0], "execution_interrupted")
+
+    def test_injected_failures_and_rejections(self):
+        client = self.client(failure_rate=1.0, workflows=[{"match": "Refused", "reject_rate": 1.0}])
+        entry = wait_for(client, self.submit(client))
+        self.assertEqual(entry["status"]["status_str"], "error")
+        self.assertEqual(entry["status"]["messages"][-1][0], "execution_error")
+
+        refused = client.post("/prompt", json={"prompt": workflow(prefix="Refused")})
+        self.assertEqual(refused.status_code, 400)
+        self.assertIn("error", refused.json())
+        self.assertEqual(client.post("/prompt", json={}).status_code, 400)
+
+    def test_output_sizes_follow_the_profile(self):
+        client = self.client(workflows=[{"match": "mcp/big", "image_size": [320, 200], "noise": True},
+                                        {"match": "own", "image_size": "latent"}])
+        for prefix, size in (("mcp/big", (320, 200)), ("own", (96, 48)), ("plain", (64, 64))):
+            prompt_id = self.submit(client, prompt=workflow(prefix=prefix, size=(96, 48)))
+            image = wait_for(client, prompt_id)["outputs"]["9"]["images"][0]
+            png = client.get("/view", params=image)
+            self.assertEqual(png.status_code, 200)
+            self.assertEqual(Image.open(io.BytesIO(png.content)).size, size)
+        self.assertEqual(client.get("/view", params={"filename": "missing.png"}).status_code, 404)
+
+    def test_service_time_distributions(self):
+        rng = random.Random(0)
+        self.assertEqual(mock_comfyui.sample_time(2, rng), 2.0)
+        self.assertEqual(mock_comfyui.sample_time({"dist": "fixed", "value": 1.5}, rng), 1.5)
+        uniform = [mock_comfyui.sample_time({"dist": "uniform", "low": 1, "high": 2}, rng) for _ in range(200)]
+        self.assertTrue(all(1 <= value <= 2 for value in uniform))
+        lognormal = sorted(mock_comfyui.sample_time({"dist": "lognormal", "median": 3, "sigma": 0.3}, rng)
+                           for _ in range(401))
+        self.assertAlmostEqual(lognormal[200], 3, delta=0.3)
+        normal = [mock_comfyui.sample_time({"dist": "normal", "mean": 0, "stddev": 1, "min": 0.1}, rng)
+                  for _ in range(200)]
+        self.assertEqual(min(normal), 0.1)
+        with self.assertRaises(ValueError):
+            mock_comfyui.sample_time({"dist": "pareto"}, rng)
+
+
+if __name__ == '__main__':
+    unittest.main()
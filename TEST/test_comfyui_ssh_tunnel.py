@@ -0,0 +1,190 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import ssh_tunnel
+from comfyui_servers import SERVER_DIRS, load_server
+
+
+class FakeProcess:
+
+    def __init__(self, returncode=None):
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = -15
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+class FakeSSH:
+    """Records ssh invocations; the forwarded port answers once `answers_after` probes have failed."""
+
+    def __init__(self, master=False, answers_after=0):
+        self.master = master
+        self.answers_after = answers_after
+        self.exit_code = None  # of ssh masters started from now on; None keeps them running
+        self.probes = 0
+        self.commands = []
+        self.processes = []
+
+    def probe(self, address):
+        self.probes += 1
+        return self.probes > self.answers_after
+
+    def run(self, cmd, **kwargs):
+        self.commands.append(cmd[cmd.index("-O") + 1])
+        return subprocess.CompletedProcess(cmd, 0 if self.master else 255)
+
+    def popen(self, cmd, **kwargs):
+        self.commands.append("master")
+        self.processes.append(FakeProcess(self.exit_code))
+        return self.processes[-1]
+
+    def tunnel(self, **kwargs):
+        return ssh_tunnel.SSHTunnel("me@gpu", 8189, "localhost:8188", "/tmp/cm-%C", probe=self.probe,
+                                    popen=self.popen, run=self.run, **kwargs)
+
+
+class TestSSHTunnel(unittest.TestCase):
+
+    def test_ready_as_soon_as_comfyui_answers(self):
+        ssh = FakeSSH(answers_after=3)
+        tunnel = ssh.tunnel()
+        self.assertTrue(tunnel.connect())
+        self.assertEqual(ssh.commands, ["check", "master"])
+        self.assertEqual(ssh.probes, 4)
+        self.assertEqual(tunnel.describe()["mode"], "own master")
+
+        tunnel.disconnect()
+        self.assertEqual(ssh.processes[0].returncode, -15)
+        self.assertEqual(tunnel.master_command()[-3:], ["-L", "8189:localhost:8188", "me@gpu"])
+
+    def test_existing_master_and_external_tunnel_are_reused(self):
+        ssh = FakeSSH(master=True, answers_after=1)
+        tunnel = ssh.tunnel()
+        self.assertTrue(tunnel.connect())
+        self.assertEqual(ssh.commands, ["check", "cancel", "forward"])
+        self.assertEqual(tunnel.mode, "shared master")
+        tunnel.disconnect()
+        self.assertEqual(ssh.commands[-1], "cancel")
+
+        ssh = FakeSSH()
+        tunnel = ssh.tunnel()
+        self.assertTrue(tunnel.connect())
+        self.assertEqual((ssh.commands, tunnel.mode), ([], "external"))
+
+    def test_reconnects_after_failed_checks(self):
+        ssh = FakeSSH()
+        tunnel = ssh.tunnel(unhealthy_after=2)
+        ssh.answers_after = 3  # two failed checks, then the reconnect answers on its second probe
+        tunnel.mode = "own master"
+        tunnel.connected_since = 0
+        self.assertFalse(tunnel.check())
+        self.assertEqual((tunnel.reconnects, ssh.commands), (0, []))
+
+        self.assertTrue(tunnel.check())
+        info = tunnel.describe()
+        self.assertEqual((info["connected"], info["reconnects"], info["failed_checks"]), (True, 1, 0))
+        self.assertLess(info["uptime"], 5)
+        self.assertEqual(ssh.commands, ["check", "master"])
+
+    def test_start_does_not_wait_for_the_tunnel(self):
+        ssh = FakeSSH(answers_after=3)
+        tunnel = ssh.tunnel(check_interval=60)
+        tunnel.start()
+        self.assertFalse(tunnel.wait_ready(0))
+        self.assertTrue(tunnel.wait_ready(5))
+        self.assertEqual(tunnel.mode, "own master")
+        tunnel.stop()
+        self.assertFalse(tunnel.wait_ready(0))
+
+    def test_stop_does_not_wait_out_a_pending_connect(self):
+        ssh = FakeSSH(answers_after=10 ** 6)
+        tunnel = ssh.tunnel(ready_timeout=30)
+        tunnel.start()
+        while not ssh.processes:
+            time.sleep(0.01)
+        started = time.monotonic()
+        tunnel.stop()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(ssh.processes[0].returncode, -15)
+        self.assertEqual(tunnel.describe()["last_error"], "stopped")
+
+    def test_check_ignores_a_probe_overtaken_by_a_connect(self):
+        ssh = FakeSSH()
+        tunnel = ssh.tunnel()
+
+        def probe(address):
+            # connect() finishes on another thread while this probe of the old forward fails
+            tunnel.mode, tunnel.connected_since = "own master", time.time() + 1
+            return False
+
+        tunnel.probe = probe
+        self.assertTrue(tunnel.check())
+        self.assertEqual((tunnel.failures, tunnel.reconnects, ssh.commands), (0, 0, []))
+
+    def test_dead_ssh_is_replaced_without_waiting_for_more_checks(self):
+        ssh = FakeSSH(answers_after=1)
+        tunnel = ssh.tunnel(ready_timeout=0.5)
+        self.assertTrue(tunnel.connect())
+        ssh.processes[0].returncode = 255
+        ssh.answers_after = 10 ** 6
+        # The replacement exits too: reported, not waited on for ready_timeout
+        ssh.exit_code = 255
+        self.assertFalse(tunnel.check())
+        self.assertEqual((tunnel.reconnects, len(ssh.processes)), (1, 2))
+        self.assertEqual(tunnel.describe()["last_error"], "ssh exited with status 255")
+        self.assertFalse(tunnel.describe()["connected"])
+
+
+class ConnectingTunnel:
+    """Stands in for a server's SSHTunnel whose first connect has not finished."""
+    ready_timeout = 30
+
+    def __init__(self, comes_up):
+        self.comes_up = comes_up
+        self.waits = []
+
+    def wait_ready(self, timeout=None):
+        self.waits.append(timeout)
+        return self.comes_up
+
+
+class TestSubmitThroughTheTunnel(unittest.TestCase):
+
+    def submit_unreachable(self, server_dir, tunnel):
+        server = load_server(server_dir)
+        server.tunnel = tunnel
+
+        def connect_events(address):
+            raise ConnectionError(f"Error connecting to ComfyUI WebSocket at {address}")
+
+        server.connect_events = connect_events
+        with self.assertRaises(ConnectionError):
+            server.submit({"1": {"class_type": "SaveImage", "inputs": {}}})
+        return server.backends.backends[0]
+
+    def test_submit_waits_for_the_tunnel_and_does_not_blame_a_connecting_one(self):
+        for server_dir in SERVER_DIRS:
+            with self.subTest(server=os.path.basename(server_dir)):
+                tunnel = ConnectingTunnel(comes_up=False)
+                backend = self.submit_unreachable(server_dir, tunnel)
+                self.assertEqual(tunnel.waits, [30])
+                self.assertTrue(backend.healthy)
+
+                # Up, yet ComfyUI does not answer: that backend is out of rotation
+                self.assertFalse(self.submit_unreachable(server_dir, ConnectingTunnel(comes_up=True)).healthy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import comfy_transfer
+
+
+IMAGE = bytes(range(256)) * 4096  # 1 MiB
+
+
+class ViewHandler(BaseHTTPRequestHandler):
+    """Serves /view like ComfyUI, over keep-alive connections."""
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    uploads = []
+
+    def do_GET(self):
+        ViewHandler.connections.add(self.client_address)
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        if query["filename"][0] != "big.png":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(IMAGE)))
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        ViewHandler.uploads.append(body)
+        name = body.split(b'filename="')[1].split(b'"')[0].decode()
+        answer = ('{"name": "%s", "subfolder": "mcp", "type": "input"}' % name).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOutputTransfer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ViewHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.address = f"127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.directory, "ComfyUI", "output")
+        os.makedirs(os.path.join(self.output_dir, "sub"))
+        ViewHandler.connections.clear()
+        ViewHandler.uploads.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_local_output_is_hardlinked(self):
+        source = os.path.join(self.output_dir, "sub", "ComfyUI_00001_.png")
+        with open(source, "wb") as f:
+            f.write(b"local image")
+        transfer = comfy_transfer.OutputTransfer(self.address, self.output_dir)
+        dest = os.path.join(self.directory, "out.png")
+
+        image = {"filename": "ComfyUI_00001_.png", "subfolder": "sub", "type": "output"}
+        self.assertEqual(transfer.save(image, dest, since=time.time()), "hardlink")
+        self.assertTrue(os.path.samefile(source, dest))
+        self.assertFalse(os.path.exists(dest + ".part"))
+
+    def test_stale_or_outside_files_are_downloaded(self):
+        stale = os.path.join(self.output_dir, "big.png")
+        with open(stale, "wb") as f:
+            f.write(b"left over from an older run")
+        os.utime(stale, (1000, 1000))
+        transfer = comfy_transfer.OutputTransfer(self.address, self.output_dir)
+
+        self.assertIsNone(transfer.local_file({"filename": "big.png", "subfolder": "", "type": "output"}, since=2000))
+        self.assertIsNone(transfer.local_file({"filename": "out.png", "subfolder": "../..", "type": "output"}))
+        dest = os.path.join(self.directory, "big.png")
+        self.assertEqual(transfer.save({"filename": "big.png", "subfolder": "", "type": "output"}, dest, since=2000),
+                         "download")
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), IMAGE)
+
+    def test_parallel_downloads_reuse_connections(self):
+        transfer = comfy_transfer.OutputTransfer(self.address, workers=2, chunk_size=64 * 1024)
+        items = [({"filename": "big.png", "subfolder": "", "type": "output"},
+                  os.path.join(self.directory, f"{i}.png")) for i in range(8)]
+        items.append(({"filename": "missing.png", "subfolder": "", "type": "output"},
+                      os.path.join(self.directory, "missing.png")))
+
+        results = transfer.save_all(items)
+        self.assertEqual([how for how, _ in results[:8]], ["download"] * 8)
+        self.assertIn("HTTP 404", str(results[8][1]))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "missing.png.part")))
+        for _, dest in items[:8]:
+            self.assertEqual(os.path.getsize(dest), len(IMAGE))
+        # Two workers, so at most two sockets (plus one replaced after the 404)
+        self.assertLessEqual(len(ViewHandler.connections), 3)
+        transfer.pool.close()
+
+    def test_input_images_are_sent_once_per_content(self):
+        first, second = os.path.join(self.directory, "a.png"), os.path.join(self.directory, "b.png")
+        for path in (first, second):
+            with open(path, "wb") as f:
+                f.write(b"same image")
+        name = comfy_transfer.input_name(first)
+        self.assertEqual(comfy_transfer.input_name(second), name)
+        self.assertRegex(name, r"^mcp/[0-9a-f]{64}\.png$")
+
+        remote = comfy_transfer.InputUpload(comfy_transfer.ConnectionPool(self.address))
+        self.assertEqual([remote.ensure(path, name) for path in (first, second)], ["upload", "reused"])
+        self.assertEqual(len(ViewHandler.uploads), 1)
+        self.assertIn(b"same image", ViewHandler.uploads[0])
+        remote.forget([name])
+        self.assertEqual(remote.ensure(first, name), "upload")
+
+        input_dir = os.path.join(self.directory, "ComfyUI", "input")
+        os.makedirs(input_dir)
+        local = comfy_transfer.InputUpload(comfy_transfer.ConnectionPool(self.address), input_dir)
+        self.assertEqual(local.ensure(first, name), "hardlink")
+        self.assertTrue(os.path.samefile(os.path.join(input_dir, *name.split("/")), first))
+        self.assertEqual(len(ViewHandler.uploads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
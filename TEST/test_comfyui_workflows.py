@@ -0,0 +1,176 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add mcp_servers to path to import the comfyui_common package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mcp_servers")))
+
+from comfyui_common import workflow_registry as registry
+from comfyui_servers import SERVER_DIRS
+
+
+FLUX_WORKFLOW = {
+    "6": {"class_type": "CLIPTextEncodeFlux", "inputs": {"clip_l": "", "t5xxl": "", "guidance": 3.5, "clip": ["11", 0]}},
+    "11": {"class_type": "DualCLIPLoader", "inputs": {"clip_name1": "t5.safetensors", "clip_name2": "l.safetensors"}},
+    "22": {"class_type": "BasicGuider", "inputs": {"model": ["12", 0], "conditioning": ["26", 0]}},
+    "25": {"class_type": "RandomNoise", "inputs": {"noise_seed": 42}},
+    "26": {"class_type": "FluxGuidance", "inputs": {"guidance": 3.5, "conditioning": ["6", 0]}},
+    "13": {"class_type": "SamplerCustomAdvanced", "inputs": {"noise": ["25", 0], "guider": ["22", 0]}},
+}
+
+
+class TestCompiledWorkflow(unittest.TestCase):
+
+    def test_default_workflow_slots(self):
+        with open(os.path.join(SERVER_DIRS[0], "workflow_files", "default_workflow.json"), encoding="utf-8") as f:
+            compiled = registry.CompiledWorkflow("default_workflow.json", json.load(f))
+        self.assertEqual(compiled.positive_slots, [("6", "text")])
+        self.assertEqual(compiled.negative_slots, [("7", "text")])
+        self.assertEqual(compiled.seed_slots, [("3", "seed")])
+
+    def test_prompt_nodes_follow_sampler_links_not_node_order(self):
+        workflow = {
+            "3": {"class_type": "KSampler", "inputs": {"seed": 1, "positive": ["7", 0], "negative": ["6", 0]}},
+            "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+            "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+        }
+        compiled = registry.CompiledWorkflow("swapped", workflow)
+        rendered = compiled.render("a cat", "blurry", seed=5)
+        self.assertEqual(rendered["7"]["inputs"]["text"], "a cat")
+        self.assertEqual(rendered["6"]["inputs"]["text"], "blurry")
+        self.assertEqual(rendered["3"]["inputs"]["seed"], 5)
+
+    def test_flux_guider_and_noise_seed(self):
+        compiled = registry.CompiledWorkflow("flux", FLUX_WORKFLOW)
+        self.assertEqual(compiled.positive_slots, [("6", "clip_l"), ("6", "t5xxl")])
+        self.assertEqual(compiled.negative_slots, [])
+        self.assertEqual(compiled.seed_slots, [("25", "noise_seed")])
+
+    def test_negative_derived_from_positive_is_not_overwritten(self):
+        workflow = {
+            "3": {"class_type": "KSampler", "inputs": {"seed": 1, "positive": ["6", 0], "negative": ["8", 0]}},
+            "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+            "8": {"class_type": "ConditioningZeroOut", "inputs": {"conditioning": ["6", 0]}},
+        }
+        compiled = registry.CompiledWorkflow("zero", workflow)
+        self.assertEqual(compiled.positive_slots, [("6", "text")])
+        self.assertEqual(compiled.negative_slots, [])
+
+    def test_render_leaves_template_untouched(self):
+        compiled = registry.CompiledWorkflow("flux", FLUX_WORKFLOW)
+        first = compiled.render("a cat", seed=7)
+        second = compiled.render("a dog")
+        self.assertEqual(first["6"]["inputs"]["t5xxl"], "a cat")
+        self.assertEqual(second["6"]["inputs"]["t5xxl"], "a dog")
+        self.assertEqual(second["25"]["inputs"]["noise_seed"], 42)
+        self.assertEqual(compiled.workflow["6"]["inputs"]["t5xxl"], "")
+
+
+class TestGenerationSettings(unittest.TestCase):
+
+    def load(self, name):
+        with open(os.path.join(SERVER_DIRS[0], "workflow_files", name), encoding="utf-8") as f:
+            return registry.CompiledWorkflow(name, json.load(f))
+
+    def test_settings_reach_sampler_and_latent(self):
+        compiled = self.load("image_perfectDeliberate_text_to_image_API.json")
+        self.assertEqual(compiled.defaults(), {"steps": 20, "cfg": 8, "sampler": "euler", "width": 1408,
+                                               "height": 1048, "batch_size": 1})
+        settings = compiled.settings(steps=30, cfg=5.5, sampler="dpmpp_2m", width=832, batch_size=2)
+        rendered = compiled.render("a cat", settings=settings)
+        self.assertEqual({k: rendered["3"]["inputs"][k] for k in ("steps", "cfg", "sampler_name")},
+                         {"steps": 30, "cfg": 5.5, "sampler_name": "dpmpp_2m"})
+        self.assertEqual(rendered["5"]["inputs"], dict(compiled.workflow["5"]["inputs"], width=832, batch_size=2))
+
+    def test_quality_tiers(self):
+        compiled = self.load("image_perfectDeliberate_text_to_image_API.json")
+        self.assertEqual(compiled.settings("draft"), {"steps": 7, "width": 704, "height": 528, "batch_size": 4})
+        self.assertEqual(compiled.settings("final"), {"steps": 20, "width": 1408, "height": 1048, "batch_size": 1})
+        # Explicit settings win over the tier
+        self.assertEqual(compiled.settings("draft", steps=12, batch_size=None)["steps"], 12)
+        # Tiers only touch what a workflow has
+        self.assertEqual(self.load("upscale_workflow.json").settings("draft"), {})
+
+    def test_invalid_settings(self):
+        compiled = self.load("upscale_workflow.json")
+        for kwargs in ({"quality": "best"}, {"steps": 10}):
+            with self.assertRaises(ValueError):
+                compiled.settings(**kwargs)
+        with self.assertRaises(ValueError):
+            self.load("resize_workflow.json").settings(width=0)
+
+
+class TestChain(unittest.TestCase):
+
+    def load(self, name):
+        with open(os.path.join(SERVER_DIRS[0], "workflow_files", name), encoding="utf-8") as f:
+            return registry.CompiledWorkflow(name, json.load(f))
+
+    def test_steps_are_wired_inside_one_prompt(self):
+        steps = [self.load(name) for name in ("default_workflow.json", "upscale_workflow.json",
+                                              "remove_background_workflow.json")]
+        chained = registry.chain([(compiled, compiled.render("a cat", seed=1)) for compiled in steps])
+
+        self.assertEqual(chained["1.6"]["inputs"]["text"], "a cat")
+        # No LoadImage left; each step reads the previous step's decoded image
+        self.assertEqual([n for n in chained.values() if n["class_type"] == "LoadImage"], [])
+        self.assertEqual(chained["2.3"]["inputs"]["image"], ["1.8", 0])
+        self.assertEqual(chained["3.1"]["inputs"]["image"], ["2.3", 0])
+        # Only the final image is saved
+        self.assertEqual([node_id for node_id, n in chained.items() if n["class_type"] == "SaveImage"], ["3.3"])
+        self.assertEqual(steps[1].workflow["3"]["inputs"]["image"], ["1", 0])
+
+    def test_input_images_and_unchainable_steps(self):
+        img2img = self.load("img2img_workflow.json")
+        self.assertEqual(img2img.image_slots, [("10", "image")])
+        rendered = img2img.render("oil painting", images=["mcp/abc.png"])
+        self.assertEqual(rendered["10"]["inputs"]["image"], "mcp/abc.png")
+        with self.assertRaises(ValueError):
+            img2img.render("", images=["a.png", "b.png"])
+
+        generate = self.load("default_workflow.json")
+        with self.assertRaises(ValueError):
+            registry.chain([(img2img, rendered), (generate, generate.render("a cat"))])
+
+
+class TestWorkflowRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = registry.WorkflowRegistry(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, workflow, mtime=None):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(workflow, f)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_compiled_once_and_recompiled_on_change(self):
+        self.write("flux.json", FLUX_WORKFLOW, mtime=1000)
+        compiled = self.registry.get("flux.json")
+        self.assertIs(self.registry.get("flux.json"), compiled)
+
+        changed = dict(FLUX_WORKFLOW, **{"25": {"class_type": "RandomNoise", "inputs": {"noise_seed": 1}}})
+        self.write("flux.json", changed, mtime=2000)
+        recompiled = self.registry.get("flux.json")
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual(recompiled.workflow["25"]["inputs"]["noise_seed"], 1)
+        self.assertEqual(self.registry.names(), ["flux.json"])
+
+    def test_missing_and_invalid_workflows(self):
+        with self.assertRaises(FileNotFoundError):
+            self.registry.get("nope.json")
+        self.write("ui.json", {"nodes": [], "links": []})
+        with self.assertRaises(ValueError):
+            self.registry.get("ui.json")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add project root to path to import src.mcp_loader
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.mcp_loader import MCPLoader
+from src.mcp_schema_cache import ToolSchemaCache
+from src.mcp_sessions import MCPSessionManager
+from src.mcp_tools import LazyServerHandle
+
+
+class LoaderTestCase(unittest.TestCase):
+    """Writes a throwaway crewai_mcp.json and gives each test its own session manager."""
+
+    servers = {}
+
+    def setUp(self):
+        fd, self.config_path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"mcpServers": self.servers}, f)
+        self.manager = MCPSessionManager(reap_interval=3600)
+        self.loader = MCPLoader(self.config_path, session_manager=self.manager)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        os.remove(self.config_path)
+
+
+class TestStartServers(LoaderTestCase):
+
+    servers = {
+        "fast": {"command": "python"},
+        "slow": {"command": "python", "startup_timeout": 5},
+        "broken": {"command": "python"},
+        "off": {"command": "python", "disabled": True},
+    }
+
+    def test_servers_start_concurrently_with_per_server_results(self):
+        def fake_load(server_name, tool_names=None, startup_timeout=None):
+            if server_name == "broken":
+                raise RuntimeError("handshake failed")
+            time.sleep(0.3)
+            return f"handle:{server_name}"
+
+        with patch.object(self.loader, "load_server", side_effect=fake_load):
+            report = self.loader.start_servers()
+
+        self.assertEqual(sorted(report.started), ["fast", "slow"])
+        self.assertEqual(report.failed, {"broken": "handshake failed"})
+        self.assertNotIn("off", report.results)
+        # Bounded by the slowest server, not the sum of both
+        self.assertLess(report.elapsed, 0.55)
+        self.assertEqual(sorted(report.handles), ["handle:fast", "handle:slow"])
+        self.assertIn("broken", report.to_dict()["servers"])
+
+    def test_startup_timeout_is_passed_per_server(self):
+        seen = {}
+
+        def fake_load(server_name, tool_names=None, startup_timeout=None):
+            seen[server_name] = startup_timeout
+            return server_name
+
+        with patch.object(self.loader, "load_server", side_effect=fake_load):
+            self.loader.start_servers(["fast", "slow"])
+            self.assertEqual(seen, {"fast": 30.0, "slow": 5})
+            self.loader.start_servers(["fast", "slow"], startup_timeout=2)
+            self.assertEqual(seen, {"fast": 2, "slow": 2})
+
+    def test_missing_command_fails_fast(self):
+        with open(self.config_path, "w") as f:
+            json.dump({"mcpServers": {"ghost": {"command": "/nonexistent/mcp-server"}}}, f)
+        report = self.loader.start_servers()
+        self.assertEqual(report.started, [])
+        self.assertIn("not found", report.failed["ghost"])
+        self.assertLess(report.results["ghost"].elapsed, 1.0)
+
+    def test_stdio_entry_without_command_is_rejected(self):
+        with open(self.config_path, "w") as f:
+            json.dump({"mcpServers": {"blank": {"args": ["server.py"]}}}, f)
+        with self.assertRaisesRegex(ValueError, "'blank' has no 'command'"):
+            self.loader.load_server("blank")
+
+
+class TestSharedTransports(LoaderTestCase):
+
+    servers = {
+        "yfinance": {
+            "transport": "streamable-http",
+            "url": "http://127.0.0.1:8765/mcp",
+            "headers": {"Authorization": "Bearer x"},
+            "command": "python",
+            "args": ["mcp_servers/yfinance_mcp/server.py", "--transport", "streamable-http", "--port", "8765"],
+        },
+        "remote": {"transportType": "sse", "url": "http://127.0.0.1:1/sse"},
+        "local": {"command": "python", "args": ["server.py"]},
+    }
+
+    def test_http_entries_build_url_params(self):
+        params = self.loader._build_server_params(self.servers["yfinance"])
+        self.assertEqual(params, {"url": "http://127.0.0.1:8765/mcp", "transport": "streamable-http",
+                                  "headers": {"Authorization": "Bearer x"}})
+        self.assertEqual(self.loader._build_server_params(self.servers["remote"])["transport"], "sse")
+
+    def test_transport_is_part_of_the_session_key(self):
+        http = self.servers["yfinance"]
+        stdio = {k: v for k, v in http.items() if k in ("command", "args")}
+        self.assertNotEqual(MCPLoader._session_key("yfinance", http), MCPLoader._session_key("yfinance", stdio))
+
+    def test_unknown_transport_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.loader._build_server_params({"transport": "carrier-pigeon", "url": "http://x"})
+
+    def test_unreachable_server_without_command_fails(self):
+        report = self.loader.start_servers(["remote"], startup_timeout=2)
+        self.assertIn("not listening", report.failed["remote"])
+
+
+SEARCH_SCHEMA = {
+    "name": "search",
+    "description": "Tool Name: search\nTool Arguments: {}\nTool Description: Search the web",
+    "input_schema": {
+        "type": "object",
+        "properties": {"query": {"type": "string"}, "max_results": {"type": "integer", "default": 10}},
+        "required": ["query"],
+    },
+}
+
+
+class TestToolSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ToolSchemaCache(self.cache_dir)
+
+    def test_round_trip(self):
+        key = ToolSchemaCache.fingerprint("uvx", ["duckduckgo-mcp-server"])
+        self.assertIsNone(self.cache.load(key))
+        self.cache.store(key, "ddg", [SEARCH_SCHEMA])
+        self.assertEqual(self.cache.load(key), [SEARCH_SCHEMA])
+
+    def test_key_tracks_config_and_server_file(self):
+        fd, server_file = tempfile.mkstemp(suffix=".py", dir=self.cache_dir)
+        os.close(fd)
+        key = ToolSchemaCache.fingerprint("python", [server_file], {"A": "1"})
+        self.assertNotEqual(key, ToolSchemaCache.fingerprint("python", [server_file], {"A": "2"}))
+        self.assertNotEqual(key, ToolSchemaCache.fingerprint("python3", [server_file], {"A": "1"}))
+
+        os.utime(server_file, (time.time() + 10, time.time() + 10))
+        self.assertNotEqual(key, ToolSchemaCache.fingerprint("python", [server_file], {"A": "1"}))
+
+    def test_stale_entries_are_ignored(self):
+        self.cache.store("k", "ddg", [SEARCH_SCHEMA])
+        self.assertIsNone(ToolSchemaCache(self.cache_dir, max_age=-1).load("k"))
+
+
+class FakeTool:
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def _run(self, **kwargs):
+        self.calls.append(kwargs)
+        return f"{self.name}:{kwargs}"
+
+
+class FakeHandle:
+    def __init__(self):
+        self.tools = {"search": FakeTool("search")}
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class TestLazyServerHandle(unittest.TestCase):
+
+    def test_server_starts_on_first_call_only(self):
+        started = []
+
+        def acquire():
+            started.append(FakeHandle())
+            return started[-1]
+
+        lazy = LazyServerHandle("ddg", [SEARCH_SCHEMA], acquire)
+        tool = lazy.tools["search"]
+        self.assertEqual(tool.description, SEARCH_SCHEMA["description"])
+        self.assertEqual(set(tool.args_schema.model_json_schema()["properties"]), {"query", "max_results"})
+        self.assertFalse(lazy.started)
+
+        tool.run(query="crewai")
+        tool.run(query="mcp")
+        self.assertEqual(len(started), 1)
+        self.assertEqual(len(started[0].tools["search"].calls), 2)
+
+        lazy.stop()
+        self.assertTrue(started[0].released)
+        self.assertFalse(lazy.started)
+
+    def test_tool_filter(self):
+        other = dict(SEARCH_SCHEMA, name="fetch_content")
+        lazy = LazyServerHandle("ddg", [SEARCH_SCHEMA, other], FakeHandle, tool_names=["fetch_content"])
+        self.assertEqual([t.name for t in lazy.tools], ["fetch_content"])
+
+
+if __name__ == '__main__':
+    unittest.main()
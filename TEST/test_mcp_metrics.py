@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from crewai.tools import BaseTool
+
+# Add project root to path to import src.mcp_metrics
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.mcp_metrics import InstrumentedMCPTool, MCPMetrics, TokenCounter
+
+
+class Fetch(BaseTool):
+    name: str = "fetch_content"
+    description: str = "Fetch a page"
+    reply: str = "x" * 400
+
+    def _run(self, url: str = "") -> str:
+        if url == "boom":
+            raise RuntimeError("boom")
+        return self.reply
+
+
+class TestMCPMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MCPMetrics(TokenCounter(encoding=None))
+        self.inner = Fetch()
+        self.tool = InstrumentedMCPTool.wrap(self.inner, "ddg", metrics=self.metrics)
+
+    def test_counts_latency_and_sizes(self):
+        for _ in range(3):
+            self.tool.run(url="https://example.com")
+        stats = self.metrics.to_dict()["servers"]["ddg"]["fetch_content"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(stats["response"]["bytes"], 1200)
+        self.assertEqual(stats["response"]["tokens"], 300)
+        self.assertEqual(stats["response"]["max_tokens"], 100)
+        self.assertGreater(stats["request"]["bytes"], 0)
+        self.assertIsNotNone(stats["latency_seconds"]["p99"])
+
+    def test_raised_and_returned_errors_are_counted(self):
+        with self.assertRaises(Exception):
+            self.tool.run(url="boom")
+        self.inner.reply = "Error: rate limited"
+        self.tool.run(url="https://example.com")
+        stats = self.metrics.to_dict()["servers"]["ddg"]["fetch_content"]
+        self.assertEqual((stats["calls"], stats["errors"]), (2, 2))
+
+    def test_prometheus_export(self):
+        self.tool.run(url="https://example.com")
+        text = self.metrics.to_prometheus()
+        self.assertIn('mcp_tool_calls_total{server="ddg",tool="fetch_content"} 1', text)
+        self.assertIn('mcp_tool_latency_seconds{server="ddg",tool="fetch_content",quantile="0.95"}', text)
+        self.assertIn('mcp_tool_response_tokens_total{server="ddg",tool="fetch_content"} 100', text)
+        self.assertIn("# TYPE mcp_tool_latency_seconds summary", text)
+
+    def test_write_picks_format_from_extension(self):
+        self.tool.run(url="https://example.com")
+        directory = tempfile.mkdtemp()
+        self.metrics.write(os.path.join(directory, "run.json"))
+        self.metrics.write(os.path.join(directory, "run.prom"))
+        with open(os.path.join(directory, "run.json")) as f:
+            self.assertEqual(json.load(f)["servers"]["ddg"]["fetch_content"]["calls"], 1)
+        with open(os.path.join(directory, "run.prom")) as f:
+            self.assertTrue(f.read().startswith("# HELP mcp_tool_calls_total"))
+
+    def test_tokens_are_counted_off_the_call_path(self):
+        released = threading.Event()
+        blocked = []
+        tokens = self.metrics.tokens
+        count = tokens.count
+
+        def slow_count(text):
+            if not released.wait(2):
+                blocked.append(text)
+            return count(text)
+
+        with mock.patch.object(tokens, "count", side_effect=slow_count):
+            self.tool.run(url="https://example.com")
+            # The call returned while its tokens are still being counted
+            self.assertFalse(released.is_set())
+            released.set()
+            stats = self.metrics.to_dict()["servers"]["ddg"]["fetch_content"]
+        self.assertEqual(stats["response"]["tokens"], 100)
+        self.assertEqual(blocked, [])
+
+    def test_encoding_loads_in_the_background(self):
+        loading = threading.Event()
+
+        def get_encoding(name):
+            loading.wait(5)
+            raise OSError("offline")
+
+        with mock.patch("tiktoken.get_encoding", side_effect=get_encoding):
+            counter = TokenCounter()
+            # Estimates until the encoding is there
+            self.assertFalse(counter.exact)
+            self.assertEqual(counter.count("x" * 40), 10)
+            loading.set()
+            self.assertTrue(counter.wait_loaded(5))
+        self.assertFalse(counter.exact)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+from crewai.tools import BaseTool
+from crewai_tools.adapters.tool_collection import ToolCollection
+
+# Add project root to path to import src.mcp_pool
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.mcp_metrics import LatencyTracker
+from src.mcp_pool import ReplicaPool, ReplicaPoolHandle
+
+
+class SlowSearch(BaseTool):
+    name: str = "search"
+    description: str = "Search the web"
+    replica: int = 0
+    delay: float = 0.0
+    calls: int = 0
+
+    def _run(self, query: str = "") -> str:
+        self.calls += 1
+        time.sleep(self.delay)
+        return f"replica {self.replica}: {query}"
+
+
+class FakeHandle:
+    def __init__(self, replica, delay=0.0):
+        self.tools = ToolCollection([SlowSearch(replica=replica, delay=delay)])
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class TestReplicaPool(unittest.TestCase):
+
+    def test_calls_go_to_least_loaded_replica(self):
+        handles = [FakeHandle(i, delay=0.2) for i in range(3)]
+        pool = ReplicaPool("ddg", handles)
+        threads = [threading.Thread(target=pool.call, args=("search", (), {"query": "q"})) for _ in range(3)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual([h.tools["search"].calls for h in handles], [1, 1, 1])
+
+    def test_idle_replicas_take_turns(self):
+        handles = [FakeHandle(i) for i in range(2)]
+        pool = ReplicaPool("ddg", handles)
+        for _ in range(4):
+            pool.call("search", kwargs={"query": "q"})
+        self.assertEqual([r["calls"] for r in pool.stats()["replicas"]], [2, 2])
+
+    def test_slow_call_is_hedged_on_another_replica(self):
+        handles = [FakeHandle(0), FakeHandle(1)]
+        pool = ReplicaPool("ddg", handles, hedge={"min_samples": 5, "min_delay": 0.01})
+        for _ in range(6):
+            pool.call("search", kwargs={"query": "warmup"}, hedged=True)
+        self.assertEqual(pool.stats()["hedges"]["sent"], 0)
+
+        # The next call lands on replica 0, which has become slow
+        handles[0].tools["search"].delay = 1.0
+        pool._next = 0
+        start = time.perf_counter()
+        result = pool.call("search", kwargs={"query": "q"}, hedged=True)
+        self.assertEqual(result, "replica 1: q")
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(pool.stats()["hedges"], {"sent": 1, "won": 1})
+
+    def test_no_hedging_without_history(self):
+        pool = ReplicaPool("ddg", [FakeHandle(0), FakeHandle(1)], hedge={})
+        self.assertIsNone(pool.hedge_delay("search"))
+        self.assertIsNone(ReplicaPool("ddg", [FakeHandle(0)], hedge={}).hedge_delay("search"))
+
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.record(i / 100.0)
+        self.assertAlmostEqual(tracker.percentile(95), 0.95)
+        self.assertAlmostEqual(tracker.percentile(50), 0.50)
+
+
+class TestReplicaPoolHandle(unittest.TestCase):
+
+    def test_one_facade_for_all_replicas(self):
+        handles = [FakeHandle(i) for i in range(2)]
+        handle = ReplicaPoolHandle("ddg", handles, idempotent=["search"], hedge={})
+        tools = handle.tools
+        self.assertEqual([t.name for t in tools], ["search"])
+        self.assertTrue(tools["search"].hedged)
+        self.assertEqual(tools["search"].description, handles[0].tools["search"].description)
+        tools["search"].run(query="a")
+        tools["search"].run(query="b")
+        self.assertEqual([h.tools["search"].calls for h in handles], [1, 1])
+
+        handle.stop()
+        self.assertTrue(all(h.released for h in handles))
+        with self.assertRaises(ValueError):
+            handle.tools
+
+
+if __name__ == '__main__':
+    unittest.main()
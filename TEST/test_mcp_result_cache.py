@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel
+
+# Add project root to path to import src.mcp_result_cache
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.mcp_result_cache import CachedMCPTool, ToolResultCache, normalize_arguments
+
+
+class SearchArgs(BaseModel):
+    query: str
+    max_results: int = 10
+    region: str = None
+
+
+class CountingSearch(BaseTool):
+    name: str = "search"
+    description: str = "Search the web"
+    args_schema: type[BaseModel] = SearchArgs
+    calls: int = 0
+    reply: str = "3 results"
+
+    def _run(self, *args, **kwargs):
+        self.calls += 1
+        return self.reply
+
+
+class TestToolResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ToolResultCache(tempfile.mkdtemp())
+        self.inner = CountingSearch()
+        self.tool = CachedMCPTool.wrap(self.inner, "ddg", cache=self.cache, ttl=60)
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_equivalent_arguments_share_a_key(self):
+        a = normalize_arguments(SearchArgs, {"query": "crewai"})
+        b = normalize_arguments(SearchArgs, {"query": "crewai", "max_results": "10", "region": None})
+        self.assertEqual(a, b)
+        self.assertEqual(ToolResultCache.make_key("ddg", "search", a), ToolResultCache.make_key("ddg", "search", b))
+        self.assertNotEqual(ToolResultCache.make_key("ddg", "search", a), ToolResultCache.make_key("brave", "search", a))
+        # Whitespace can be meaningful to a tool, so it is part of the key
+        self.assertNotEqual(normalize_arguments(SearchArgs, {"query": " crewai "}), a)
+
+    def test_repeated_call_is_served_from_cache(self):
+        self.assertEqual(self.tool.run(query="crewai"), "3 results")
+        self.assertEqual(self.tool.run(query="crewai", max_results=10), "3 results")
+        self.assertEqual(self.inner.calls, 1)
+        self.tool.run(query="mcp")
+        self.assertEqual(self.inner.calls, 2)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_positional_arguments_are_not_cached(self):
+        self.tool._run("crewai")
+        self.tool._run("mcp")
+        self.tool._run("crewai")
+        self.assertEqual(self.inner.calls, 3)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_wrapper_keeps_agent_facing_metadata(self):
+        self.assertEqual(self.tool.name, self.inner.name)
+        self.assertEqual(self.tool.description, self.inner.description)
+        self.assertIs(self.tool.args_schema, SearchArgs)
+
+    def test_errors_are_not_cached(self):
+        self.inner.reply = "Error: rate limited"
+        self.tool.run(query="crewai")
+        self.tool.run(query="crewai")
+        self.assertEqual(self.inner.calls, 2)
+
+    def test_entries_expire(self):
+        short = CachedMCPTool.wrap(self.inner, "ddg", cache=self.cache, ttl=0.05)
+        short.run(query="crewai")
+        time.sleep(0.1)
+        short.run(query="crewai")
+        self.assertEqual(self.inner.calls, 2)
+
+    def test_ttl_config(self):
+        config = {"ttl": 3600, "tools": {"search": 86400, "fetch_content": 0}}
+        self.assertEqual(ToolResultCache.ttl_for(config, "search"), 86400)
+        self.assertEqual(ToolResultCache.ttl_for(config, "other"), 3600)
+        self.assertIsNone(ToolResultCache.ttl_for(config, "fetch_content"))
+        self.assertIsNone(ToolResultCache.ttl_for({"tools": {"search": 60}}, "other"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import unittest
+
+import anyio
+from crewai.tools import BaseTool
+from crewai_tools.adapters.tool_collection import ToolCollection
+
+# Add project root to path to import src.mcp_sessions
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.mcp_sessions import MCPSessionManager
+
+
+class FakeTools(list):
+    def filter_by_names(self, names):
+        return FakeTools([t for t in self if t in names])
+
+
+class FakeAdapter:
+    """Stands in for MCPServerAdapter without spawning anything."""
+    started = 0
+
+    def __init__(self):
+        FakeAdapter.started += 1
+        self.stopped = False
+        self.tools = FakeTools(["search", "fetch_content"])
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestMCPSessionManager(unittest.TestCase):
+
+    def setUp(self):
+        FakeAdapter.started = 0
+        self.manager = MCPSessionManager(idle_ttl=60, reap_interval=3600)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_same_key_shares_one_process(self):
+        h1 = self.manager.acquire("ddg", FakeAdapter)
+        h2 = self.manager.acquire("ddg", FakeAdapter)
+        self.assertEqual(FakeAdapter.started, 1)
+        self.assertIs(h1.session, h2.session)
+        self.assertEqual(h1.session.refcount, 2)
+
+    def test_tool_filter_is_per_handle(self):
+        all_tools = self.manager.acquire("ddg", FakeAdapter)
+        search_only = self.manager.acquire("ddg", FakeAdapter, tool_names=["search"])
+        self.assertEqual(list(all_tools.tools), ["search", "fetch_content"])
+        self.assertEqual(list(search_only.tools), ["search"])
+
+    def test_release_keeps_process_warm_until_ttl(self):
+        handle = self.manager.acquire("ddg", FakeAdapter, idle_ttl=0.05)
+        adapter = handle.session.adapter
+        handle.stop()
+        handle.stop()  # idempotent
+        self.assertEqual(handle.session.refcount, 0)
+        self.assertEqual(self.manager.reap_idle(), [])
+        self.assertFalse(adapter.stopped)
+
+        time.sleep(0.06)
+        self.assertEqual(self.manager.reap_idle(), ["ddg"])
+        self.assertTrue(adapter.stopped)
+
+    def test_referenced_process_is_never_reaped(self):
+        handle = self.manager.acquire("ddg", FakeAdapter, idle_ttl=0)
+        self.assertEqual(self.manager.reap_idle(), [])
+        self.assertTrue(handle.session.running)
+
+    def test_zero_ttl_stops_on_last_release(self):
+        with self.manager.acquire("ddg", FakeAdapter, idle_ttl=0) as tools:
+            self.assertEqual(len(tools), 2)
+        self.assertEqual(self.manager.stats(), [])
+
+    def test_failed_start_is_not_cached(self):
+        def broken():
+            raise RuntimeError("spawn failed")
+
+        with self.assertRaises(RuntimeError):
+            self.manager.acquire("ddg", broken)
+        self.assertEqual(self.manager.stats(), [])
+        self.manager.acquire("ddg", FakeAdapter)
+        self.assertEqual(FakeAdapter.started, 1)
+
+    def test_shutdown_stops_everything(self):
+        handle = self.manager.acquire("ddg", FakeAdapter)
+        adapter = handle.session.adapter
+        self.manager.shutdown()
+        self.assertTrue(adapter.stopped)
+        self.assertEqual(self.manager.stats(), [])
+
+
+class Echo(BaseTool):
+    name: str = "echo"
+    description: str = "Echo text back"
+    adapter: object = None
+
+    def _run(self, text: str = "") -> str:
+        if self.adapter.dead:
+            raise anyio.ClosedResourceError()
+        return f"{self.adapter.pid}:{text}"
+
+
+class FlakyAdapter:
+    """Adapter whose server can be killed; each instance is a new 'process'."""
+    started = 0
+    fail_starts = 0
+
+    def __init__(self):
+        if FlakyAdapter.fail_starts:
+            FlakyAdapter.fail_starts -= 1
+            raise RuntimeError("spawn failed")
+        FlakyAdapter.started += 1
+        self.pid = FlakyAdapter.started
+        self.dead = False
+        self.tools = ToolCollection([Echo(adapter=self)])
+
+    def stop(self):
+        pass
+
+
+def ping(adapter):
+    if adapter.dead:
+        raise anyio.ClosedResourceError()
+
+
+class TestSupervision(unittest.TestCase):
+
+    def setUp(self):
+        FlakyAdapter.started = 0
+        FlakyAdapter.fail_starts = 0
+        self.manager = MCPSessionManager(reap_interval=3600, health_interval=3600)
+        self.handle = self.manager.acquire("echo", FlakyAdapter, supervised=True, health_check=ping,
+                                           restart_backoff=0.05)
+        self.tool = self.handle.tools["echo"]
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_crash_opens_breaker_then_restarts(self):
+        self.assertEqual(self.tool.run(text="a"), "1:a")
+        self.handle.session.adapter.dead = True
+
+        reply = self.tool.run(text="b")
+        self.assertTrue(reply.startswith("Error: tool 'echo' is unavailable"))
+        self.assertEqual(self.handle.session.breaker_state, "open")
+        # Fails fast inside the backoff window without respawning
+        self.assertIn("next restart attempt", self.tool.run(text="c"))
+        self.assertEqual(FlakyAdapter.started, 1)
+
+        time.sleep(0.06)
+        # Same tool object keeps working against the restarted server
+        self.assertEqual(self.tool.run(text="d"), "2:d")
+        self.assertEqual(self.manager.stats()[0]["restarts"], 1)
+        self.assertEqual(self.handle.session.breaker_state, "closed")
+
+    def test_backoff_doubles_per_failed_restart(self):
+        session = self.handle.session
+        session.adapter.dead = True
+        FlakyAdapter.fail_starts = 2
+        self.assertEqual(self.manager.check_health(), ["echo"])
+        first_window = session.retry_at - time.monotonic()
+        time.sleep(0.06)
+        self.assertFalse(session.try_restart())
+        self.assertGreater(session.retry_at - time.monotonic(), first_window)
+        self.assertEqual(session.failures, 2)
+
+    def test_health_check_detects_dead_idle_server(self):
+        self.handle.session.adapter.dead = True
+        self.assertEqual(self.manager.check_health(), ["echo"])
+        self.assertFalse(self.handle.session.running)
+        self.assertFalse(self.handle.available)
+        time.sleep(0.06)
+        self.manager.check_health()
+        deadline = time.monotonic() + 2
+        while not self.handle.session.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.tool.run(text="x"), "2:x")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -413,7 +413,7 @@ class IllustratedBookFlow(Flow[BookState]):
                     print(f"    🔍 Looking for 'generate_image' in {len(self.agents.comfy_tools)} tools:")
                     for tool in self.agents.comfy_tools:
                         print(f"       - Available Tool: {tool.name}")
-                        if "generate_image" in tool.name:
+                        if tool.name.endswith("generate_image"):
                             gen_tool = tool
                             break
                     
@@ -56,11 +56,14 @@ class CharacterManager:
             return
 
         print("🎨 Checking Character Portraits...")
-        img_tool = next((t for t in self.portrait_tools if "generate_image" in t.name), None)
-        if not img_tool:
+        img_tool = next((t for t in self.portrait_tools if t.name.endswith("generate_image")), None)
+        # Batch tool: queues every portrait on ComfyUI at once instead of one round trip each
+        batch_tool = next((t for t in self.portrait_tools if t.name.endswith("generate_images")), None)
+        if not img_tool and not batch_tool:
              print("❌ ComfyUI Image Tool not found!")
              return
 
+        pending = []
         for name, data in self.characters.items():
             char_folder = self.characters_path / name
             portrait_path = char_folder / "portrait.png"
@@ -98,37 +101,49 @@ class CharacterManager:
                 "bad hands, low quality, worst quality"
             )
             
+            # Save Prompt
             try:
-                # Execute Tool
-                # Note: Tool execution in CrewAI/LangChain usually expects a string input or specific dict. 
-                # Since we have the raw tool instance from MCP, we call it directly if it's a StructuredTool, 
-                # or verify how it's wrapped. Assuming standard CrewAI/LangChain Tool invoke.
-                
-                # Check if we can invoke it
-                if hasattr(img_tool, 'run'):
-                     # Some MCP tools might need specific arguments mapping
-                    result = img_tool.run(
-                        workflow_name=self.portrait_workflow,
-                        prompt=prompt,
-                        negative_prompt=negative_prompt,
-                        output_path=str(char_folder / "portrait.png")
-                    )
-                    
-                    # Save Prompt
-                    try:
-                        prompt_path = char_folder / "portrait_prompt.txt"
-                        with open(prompt_path, "w", encoding="utf-8") as f:
-                            f.write(f"POSITIVE:\n{prompt}\n\nNEGATIVE:\n{negative_prompt}")
-                        print(f"  📝 Prompt saved to {prompt_path}")
-                    except Exception as e:
-                        print(f"  ⚠️ Failed to save prompt file: {e}")
+                prompt_path = char_folder / "portrait_prompt.txt"
+                with open(prompt_path, "w", encoding="utf-8") as f:
+                    f.write(f"POSITIVE:\n{prompt}\n\nNEGATIVE:\n{negative_prompt}")
+                print(f"  📝 Prompt saved to {prompt_path}")
+            except Exception as e:
+                print(f"  ⚠️ Failed to save prompt file: {e}")
+
+            pending.append((name, prompt, negative_prompt, portrait_path))
+
+        if not pending:
+            return
 
-                    # Check if result indicates success or if we need to simplify
-                    print(f"  ✨ Portrait Generated: {result}")
+        if batch_tool:
+            try:
+                result = batch_tool.run(images=[
+                    {
+                        "workflow_name": self.portrait_workflow,
+                        "prompt": prompt,
+                        "negative_prompt": negative_prompt,
+                        "output_path": str(portrait_path),
+                    }
+                    for _, prompt, negative_prompt, portrait_path in pending
+                ])
+                print(f"  ✨ Portraits Generated:\n{result}")
+            except Exception as e:
+                print(f"  ❌ Failed to generate portraits: {e}")
+            for name, _, _, portrait_path in pending:
+                if portrait_path.exists():
                     self.characters[name]['portrait_path'] = str(portrait_path)
-                else:
-                    print(f"  ❌ Tool {img_tool.name} has no run method.")
+            return
 
+        for name, prompt, negative_prompt, portrait_path in pending:
+            try:
+                result = img_tool.run(
+                    workflow_name=self.portrait_workflow,
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    output_path=str(portrait_path)
+                )
+                print(f"  ✨ Portrait Generated: {result}")
+                self.characters[name]['portrait_path'] = str(portrait_path)
             except Exception as e:
                 print(f"  ❌ Failed to generate portrait for {name}: {e}")
 
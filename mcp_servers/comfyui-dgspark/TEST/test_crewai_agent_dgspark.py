@@ -31,7 +31,7 @@ def test_architecture():
     if USE_MOCK:
         # We use the ComfyUI Venv for this because it has the required dependencies (websockets, etc)
         comfy_venv_python = os.path.join(PROJECT_ROOT, "mcp_servers", "comfyui", ".venv", "Scripts", "python.exe")
-        mock_script = os.path.join(os.path.dirname(__file__), "mock_comfyui.py")
+        mock_script = os.path.join(PROJECT_ROOT, "mcp_servers", "comfyui", "TEST", "mock_comfyui.py")
         mock_port = "11002"
         
         if not os.path.exists(comfy_venv_python):
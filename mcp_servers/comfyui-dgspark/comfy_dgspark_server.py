@@ -1,76 +1,122 @@
+import anyio
 import argparse
+import functools
 import json
 import os
 import sys
+import random
 import time
 import uuid
-import websocket
 import urllib.request
-import urllib.parse
-import subprocess
 import signal
-import socket
-from mcp.server.fastmcp import FastMCP
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import BaseModel, Field
+
+# Explicitly add current directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+# ...and mcp_servers, for the comfyui_common package both ComfyUI servers share
+servers_dir = os.path.dirname(current_dir)
+if servers_dir not in sys.path:
+    sys.path.insert(0, servers_dir)
+
+from comfyui_common.backend_pool import BackendPool
+from comfyui_common.comfy_events import PromptTracker, event_stream
+from comfyui_common.comfy_preflight import ObjectInfoCache, blank_png, warmup_workflow
+from comfyui_common.comfy_jobs import InFlight, Job, JobTable, format_state, prompt_state, queue_order, queue_position
+from comfyui_common.comfy_transfer import InputUpload, OutputTransfer, input_name, is_loopback
+from comfyui_common.image_cache import DEFAULT_SIZE_LIMIT, ImageCache
+from comfyui_common.image_ops import LOCAL_OPERATIONS, destination, process as process_image
+from comfyui_common.ssh_tunnel import DEFAULT_CONTROL_PATH, SSHTunnel
+from comfyui_common.workflow_registry import WorkflowRegistry, chain
 
 # Configuration
 COMFYUI_SERVER_ADDRESS = os.environ.get("COMFYUI_SERVER_ADDRESS", "127.0.0.1:8188")
+# Comma-separated ComfyUI instances to spread work over; just COMFYUI_SERVER_ADDRESS by default
+COMFYUI_BACKENDS = [a.strip() for a in os.environ.get("COMFYUI_BACKENDS", "").split(",") if a.strip()] or [COMFYUI_SERVER_ADDRESS]
+BACKEND_POLL_INTERVAL = float(os.environ.get("COMFYUI_BACKEND_POLL_INTERVAL", 10))
 SSH_TUNNEL_REMOTE = os.environ.get("SSH_TUNNEL_REMOTE")  # e.g., "user@remote-host"
 SSH_TUNNEL_DEST = os.environ.get("SSH_TUNNEL_DEST", "localhost:8188")
+# ssh ControlMaster socket; point it at your ssh_config ControlPath to reuse your own connection
+SSH_TUNNEL_CONTROL_PATH = os.environ.get("SSH_TUNNEL_CONTROL_PATH", DEFAULT_CONTROL_PATH)
 CLIENT_ID = str(uuid.uuid4())
+WS_CONNECT_TIMEOUT = 10
+# Seconds a generation may take (queue wait included) before it is cancelled; 0 for no limit
+GENERATION_TIMEOUT = float(os.environ.get("COMFYUI_GENERATION_TIMEOUT", 1800))
+# Seconds between status messages while a generation waits
+PROGRESS_INTERVAL = 5
+# Workflows rendered once at startup (tiny and in one step) so their models are loaded
+# when the first real request comes: comma-separated file names or "all"; off when unset
+WARMUP_WORKFLOWS = os.environ.get("COMFYUI_WARMUP", "")
 COMFYUI_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-COMFYUI_OUTPUT_DIR = os.path.join(COMFYUI_ROOT, "ComfyUI", "output")
+COMFYUI_OUTPUT_DIR = os.environ.get("COMFYUI_OUTPUT_DIR", os.path.join(COMFYUI_ROOT, "ComfyUI", "output"))
+# Optional cache of rendered images, e.g. ".mcp_cache/images"; off when unset
+IMAGE_CACHE_DIR = os.environ.get("COMFYUI_IMAGE_CACHE")
+IMAGE_CACHE_SIZE = int(os.environ.get("COMFYUI_IMAGE_CACHE_SIZE", DEFAULT_SIZE_LIMIT))
+# Threads for image_ops resizes, crops and conversions, done locally with Pillow
+IMAGE_OPS_WORKERS = int(os.environ.get("COMFYUI_IMAGE_OPS_WORKERS", os.cpu_count() or 4))
+# image_ops operations that need a model, and the workflow that runs them on ComfyUI
+MODEL_OPERATIONS = {"upscale": "upscale_workflow.json", "remove_background": "remove_background_workflow.json"}
 WORKFLOW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workflow_files")
 
 # Create workflows directory if it doesn't exist
 if not os.path.exists(WORKFLOW_DIR):
     os.makedirs(WORKFLOW_DIR)
 
-# SSH Tunnel Management
-ssh_process = None
+# Workflow files are parsed once and recompiled only when they change
+workflows = WorkflowRegistry(WORKFLOW_DIR)
 
-def start_ssh_tunnel():
-    global ssh_process, COMFYUI_SERVER_ADDRESS
-    if not SSH_TUNNEL_REMOTE:
-        return
+def local_output_dir(address):
+    """COMFYUI_OUTPUT_DIR if it is where `address` writes its images, i.e. ComfyUI runs on this machine."""
+    if address == COMFYUI_SERVER_ADDRESS and is_loopback(address) and not SSH_TUNNEL_REMOTE:
+        return COMFYUI_OUTPUT_DIR
+    return None
 
-    local_port = int(COMFYUI_SERVER_ADDRESS.split(':')[-1])
-    
-    # Check if port is already in use
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    result = sock.connect_ex(('127.0.0.1', local_port))
-    sock.close()
-    
-    if result == 0:
-        log_debug(f"Port {local_port} is already in use. Assuming tunnel is already established externally.")
-        return
+# Outputs are linked straight from ComfyUI's output directory when ComfyUI runs
+# on this machine, and streamed from /view otherwise
+transfers = {address: OutputTransfer(address, local_output_dir(address)) for address in COMFYUI_BACKENDS}
 
-    # Command: ssh -L [local_port]:[remote_dest] -N [remote_host]
-    cmd = ["ssh", "-L", f"{local_port}:{SSH_TUNNEL_DEST}", "-N", SSH_TUNNEL_REMOTE]
-    
-    log_debug(f"Starting SSH tunnel: {' '.join(cmd)}")
-    try:
-        # Redirect stderr to a log file for debugging
-        ssh_err_log = open(os.path.join(os.path.dirname(__file__), "ssh_error.log"), "w")
-        # Ensure stdin is devnull to prevent ssh from hanging if it asks for input
-        ssh_process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=ssh_err_log, stdin=subprocess.DEVNULL)
-        time.sleep(5) # Give it more time to establish connection
-        if ssh_process.poll() is not None:
-             log_debug(f"SSH tunnel failed to start. Exit code: {ssh_process.returncode}")
-        else:
-             log_debug("SSH tunnel started successfully (or at least running)")
-    except Exception as e:
-        log_debug(f"SSH launch exception: {e}")
-        pass
+def local_input_dir(address):
+    """ComfyUI's input directory, next to its output directory, if ComfyUI runs on this machine."""
+    output_dir = local_output_dir(address)
+    return os.path.join(os.path.dirname(output_dir), "input") if output_dir else None
+
+# Input images go to each backend once per content hash: linked into its input
+# directory when local, posted to /upload/image otherwise
+uploads = {address: InputUpload(transfers[address].pool, local_input_dir(address)) for address in COMFYUI_BACKENDS}
+
+# Identical requests with a fixed seed are served from here instead of the GPU
+image_cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_SIZE) if IMAGE_CACHE_DIR else None
+
+# SSH Tunnel Management: ready once ComfyUI answers through it, then health-checked
+# and reconnected in the background
+tunnel = SSHTunnel(SSH_TUNNEL_REMOTE, COMFYUI_SERVER_ADDRESS.split(':')[-1], SSH_TUNNEL_DEST, SSH_TUNNEL_CONTROL_PATH,
+                   log=lambda message: log_debug(message),
+                   stderr_path=os.path.join(os.path.dirname(__file__), "ssh_error.log")) if SSH_TUNNEL_REMOTE else None
+
+def start_ssh_tunnel():
+    if tunnel is not None:
+        tunnel.start()
 
 def stop_ssh_tunnel():
-    global ssh_process
-    if ssh_process:
-        ssh_process.terminate()
-        ssh_process.wait()
+    if tunnel is not None:
+        tunnel.stop()
 
 # Initialize MCP Server
 mcp = FastMCP("ComfyUI")
 
+def threaded_tool(fn):
+    """Registers a blocking tool that waits on the DGX Spark's ComfyUI in a worker thread."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+    return mcp.tool()(wrapper)
+
 DEBUG_LOG = os.path.join(os.path.dirname(__file__), "debug_log.txt")
 def log_debug(msg):
     with open(DEBUG_LOG, "a") as f:
@@ -79,11 +125,11 @@ def log_debug(msg):
 # Start tunnel if configured before server runs
 start_ssh_tunnel()
 
-def queue_prompt(prompt):
-    log_debug(f"Connecting to http://{COMFYUI_SERVER_ADDRESS}/prompt")
-    p = {"prompt": prompt, "client_id": CLIENT_ID}
+def queue_prompt(prompt, client_id=CLIENT_ID, address=COMFYUI_SERVER_ADDRESS, priority=0):
+    log_debug(f"Connecting to http://{address}/prompt")
+    p = {"prompt": prompt, "client_id": client_id, **queue_order(priority)}
     data = json.dumps(p).encode('utf-8')
-    req = urllib.request.Request(f"http://{COMFYUI_SERVER_ADDRESS}/prompt", data=data)
+    req = urllib.request.Request(f"http://{address}/prompt", data=data)
     try:
         with urllib.request.urlopen(req) as response:
             return json.loads(response.read())
@@ -91,189 +137,888 @@ def queue_prompt(prompt):
         error_body = e.read().decode('utf-8')
         raise Exception(f"ComfyUI API Error ({e.code}): {error_body}")
 
-def get_image(filename, subfolder, folder_type):
-    data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
-    url_values = urllib.parse.urlencode(data)
-    with urllib.request.urlopen(f"http://{COMFYUI_SERVER_ADDRESS}/view?{url_values}") as response:
-        return response.read()
+def get_history(prompt_id, address=COMFYUI_SERVER_ADDRESS):
+    with urllib.request.urlopen(f"http://{address}/history/{prompt_id}") as response:
+        return json.loads(response.read())
 
-def get_history(prompt_id):
-    with urllib.request.urlopen(f"http://{COMFYUI_SERVER_ADDRESS}/history/{prompt_id}") as response:
+def get_queue(address=COMFYUI_SERVER_ADDRESS):
+    with urllib.request.urlopen(f"http://{address}/queue") as response:
         return json.loads(response.read())
 
-def find_node_by_class(workflow, class_type):
-    """Find the first node of a specific class type."""
-    for node_id, node in workflow.items():
-        if node.get("class_type") == class_type:
-            return node_id, node
-    return None, None
-
-def find_inputs_by_open_slot(workflow, slot_name):
-    """Find nodes that have a specific input slot name."""
-    matches = []
-    for node_id, node in workflow.items():
-        if "inputs" in node and slot_name in node["inputs"]:
-            matches.append((node_id, node))
-    return matches
+def get_json(address, path, timeout=5):
+    with urllib.request.urlopen(f"http://{address}{path}", timeout=timeout) as response:
+        return json.loads(response.read())
+
+def post_json(path, payload, address=COMFYUI_SERVER_ADDRESS):
+    req = urllib.request.Request(f"http://{address}{path}", data=json.dumps(payload).encode('utf-8'),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as response:
+        response.read()
+
+# Each new prompt goes to the backend with the shortest expected wait
+backends = BackendPool(COMFYUI_BACKENDS, get_json, poll_interval=BACKEND_POLL_INTERVAL)
+
+# Identical requests in flight at the same time share one render
+inflight = InFlight()
+
+# Node types and models each backend has, to reject workflows it cannot run before queuing them
+object_info = ObjectInfoCache(functools.partial(get_json, timeout=30))
 
 @mcp.tool()
 def list_workflows() -> list[str]:
     """List available workflows in the configured workflows directory."""
-    if not os.path.exists(WORKFLOW_DIR):
-        return []
-    return [f for f in os.listdir(WORKFLOW_DIR) if f.endswith(".json")]
+    return workflows.names()
+
+@threaded_tool
+def list_backends() -> list[dict]:
+    """ComfyUI backends this server renders on, with their health, queue length, average render time and GPUs."""
+    backends.start()
+    return backends.describe()
 
 @mcp.tool()
-def generate_image(workflow_name: str, prompt: str, negative_prompt: str = "", seed: int = None, output_path: str = None) -> str:
+def tunnel_status() -> dict:
+    """The SSH tunnel to the remote ComfyUI: whether it is up, uptime in seconds, reconnect count and last error."""
+    if tunnel is None:
+        return {"connected": None, "error": "No SSH tunnel configured (SSH_TUNNEL_REMOTE is not set)."}
+    return tunnel.describe()
+
+@threaded_tool
+def check_workflows(workflow_names: list[str] = None) -> dict:
+    """
+    Check workflows (all if none are named) against each backend's installed nodes and
+    models. Returns, per workflow and backend, "ok", the problems found, or "unknown"
+    if the backend could not be asked.
+    """
+    report = {}
+    for address in COMFYUI_BACKENDS:
+        object_info.get(address, refresh=True)
+    for name in workflow_names or workflows.names():
+        try:
+            workflow = workflows.get(name).render("", seed=1)
+        except Exception as e:
+            report[name] = str(e)
+            continue
+        report[name] = {}
+        for address in COMFYUI_BACKENDS:
+            if object_info.get(address) is None:
+                report[name][address] = "unknown"
+            else:
+                report[name][address] = object_info.validate(address, workflow) or "ok"
+    return report
+
+def warmup_image():
+    """A small blank input image for warming up workflows that load one."""
+    path = os.path.join(tempfile.gettempdir(), "comfyui_mcp_warmup.png")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(blank_png())
+    return path
+
+def warm_up_workflow(workflow_name, address):
+    """Renders a minimal version of a workflow on one backend so its models get loaded."""
+    started = time.time()
+    result = {"workflow": workflow_name, "backend": address}
+    try:
+        template = workflows.get(workflow_name)
+        inputs, image = [], None
+        if template.image_slots:
+            path = warmup_image()
+            image = input_name(path)
+            inputs.append((path, image))
+        workflow = warmup_workflow(template.render("warm-up", seed=1), template.output_nodes, image, template.image_slots)
+        problems = object_info.validate(address, workflow)
+        if problems:
+            return dict(result, status="skipped", problems=problems)
+        stream = connect_events(address)
+        for path, name in inputs:
+            uploads[address].ensure(path, name)
+        tracker = submit_prompt(stream, workflow)
+        timeout = deadline(None)
+        try:
+            stream.wait(tracker, timeout)
+        except TimeoutError:
+            timeout_result(tracker, address, timeout)
+            return dict(result, status="timeout", seconds=round(time.time() - started, 2))
+        result.update(status=tracker.status, seconds=round(time.time() - started, 2))
+        if tracker.status != "success":
+            result["error"] = tracker.error_message
+        return result
+    except Exception as e:
+        return dict(result, status="error", error=str(e))
+
+@threaded_tool
+def warm_up(workflow_names: list[str] = None) -> list[dict]:
+    """
+    Load the models of workflows (all if none are named) on every backend by rendering
+    each once at minimal size and steps, so the first real request does not wait for
+    checkpoint loading. Returns status and seconds per workflow and backend.
+    """
+    return warm_up_all(workflow_names or workflows.names())
+
+def warm_up_all(workflow_names):
+    """warm_up_workflow() for each workflow, on all backends at once."""
+    def warm_backend(address):
+        return [warm_up_workflow(name, address) for name in workflow_names]
+
+    with ThreadPoolExecutor(max_workers=len(COMFYUI_BACKENDS)) as executor:
+        return [result for results in executor.map(warm_backend, COMFYUI_BACKENDS) for result in results]
+
+def start_preflight():
+    """
+    In the background: fetches each backend's /object_info, reports workflows
+    that cannot run there and, with COMFYUI_WARMUP set, warms them up.
+    """
+    def log(message):
+        log_debug(f"Pre-flight: {message}")
+
+    def run():
+        # The tunnel connects in the background too; give it its usual time to come up
+        if tunnel is not None and not tunnel.wait_ready(tunnel.ready_timeout):
+            log(f"SSH tunnel still down after {tunnel.ready_timeout:g}s: {tunnel.last_error}")
+        for address in COMFYUI_BACKENDS:
+            if object_info.get(address) is None:
+                log(f"could not fetch /object_info from {address}")
+        for name in workflows.names():
+            try:
+                workflow = workflows.get(name).render("", seed=1)
+            except Exception as e:
+                log(f"{name}: {e}")
+                continue
+            for address in COMFYUI_BACKENDS:
+                problems = object_info.validate(address, workflow)
+                if problems:
+                    log(f"{name} cannot run on {address}: {'; '.join(problems)}")
+        if WARMUP_WORKFLOWS:
+            names = workflows.names() if WARMUP_WORKFLOWS == "all" else [n.strip() for n in WARMUP_WORKFLOWS.split(",") if n.strip()]
+            for result in warm_up_all(names):
+                log(f"warm-up {result['workflow']} on {result['backend']}: {result['status']}"
+                    + (f" in {result['seconds']}s" if "seconds" in result else "")
+                    + (f" ({result.get('error') or '; '.join(result.get('problems', []))})" if result["status"] != "success" else ""))
+
+    threading.Thread(target=run, name="comfy-preflight", daemon=True).start()
+
+class GenerationSettings(BaseModel):
+    quality: Optional[str] = Field(default=None, description=(
+        "'draft': about a third of the steps at half size, 4 candidates; 'final': the workflow's "
+        "full settings, 1 image. Explicit settings below override it"))
+    steps: Optional[int] = Field(default=None, description="Sampling steps")
+    cfg: Optional[float] = Field(default=None, description="CFG scale")
+    sampler: Optional[str] = Field(default=None, description="Sampler name, e.g. 'euler' or 'dpmpp_2m'")
+    width: Optional[int] = Field(default=None, description="Image width in pixels")
+    height: Optional[int] = Field(default=None, description="Image height in pixels")
+    batch_size: Optional[int] = Field(default=None, description="Images per generation")
+
+    def settings(self):
+        return {name: getattr(self, name) for name in GenerationSettings.model_fields}
+
+def prepare_workflow(workflow_name, prompt, negative_prompt="", seed=None, settings=None, images=()):
+    """
+    The workflow to queue for one generation. `settings`: GenerationSettings
+    values by name. Raises FileNotFoundError or ValueError.
+    """
+    template = workflows.get(workflow_name)
+    if seed is None and template.seed_slots:
+        seed = random.randint(1, 1000000000000)
+    return template.render(prompt, negative_prompt, seed, images, template.settings(**(settings or {})))
+
+def connect_events(address=COMFYUI_SERVER_ADDRESS):
+    """
+    The backend's shared event stream. All calls share one websocket per
+    backend; its reader hands every prompt's events to that prompt's tracker.
+    """
+    stream = event_stream(address, functools.partial(get_history, address=address), client_id=CLIENT_ID)
+    if not stream.wait_connected(WS_CONNECT_TIMEOUT):
+        log_debug(f"WebSocket connection failed: {stream.last_error}")
+        raise ConnectionError(f"Error connecting to ComfyUI WebSocket at {address}: {stream.last_error}. Is ComfyUI running?")
+    return stream
+
+def submit_prompt(stream, workflow, priority=0):
+    """Queues a workflow and returns its PromptTracker."""
+    prompt_res = queue_prompt(workflow, stream.client_id, stream.address, priority)
+    return stream.track(prompt_res['prompt_id'])
+
+def wait_for_tunnel(address):
+    """
+    If `address` is reached through the SSH tunnel, waits for the tunnel to
+    come up (it connects in the background). False if it is still down.
+    """
+    if tunnel is None or address != COMFYUI_SERVER_ADDRESS:
+        return True
+    return tunnel.wait_ready(tunnel.ready_timeout)
+
+def submit(workflow, inputs=(), priority=0):
+    """
+    Queues a workflow on the backend with the shortest expected wait, moving
+    on to the next one if it cannot be reached, lacks a node or model the
+    workflow uses (per its /object_info) or rejects the prompt.
+    inputs: (local path, input_name()) pairs of the images its LoadImage
+    nodes read; they are sent to the chosen backend first.
+    priority: see queue_order(); above 0 the prompt jumps the pending queue.
+    Returns (tracker, stream); results must be fetched from stream.address.
+    """
+    error = None
+    for backend in backends.candidates(jump_queue=priority > 0):
+        tunnel_up = wait_for_tunnel(backend.address)
+        problems = object_info.validate(backend.address, workflow) if backend.healthy else []
+        if problems:
+            error = ValueError(f"ComfyUI at {backend.address} cannot run this workflow: {'; '.join(problems)}")
+            continue
+        try:
+            stream = connect_events(backend.address)
+            for path, name in inputs:
+                uploads[backend.address].ensure(path, name)
+            tracker = submit_prompt(stream, workflow, priority)
+        except OSError as e:
+            # Unreachable: out of rotation until its next successful poll. Not
+            # for a tunnel that is still connecting; its health thread keeps at it
+            backends.report_failure(backend, e, fatal=tunnel_up)
+            error = e
+            continue
+        except Exception as e:
+            # Rejected (e.g. a node or model it lacks); another backend may have it.
+            # An input image it was sent earlier may have been deleted since
+            uploads[backend.address].forget([name for _, name in inputs])
+            error = e
+            continue
+        backends.submitted(backend)
+        return tracker, stream
+    raise error
+
+def submit_once(workflow, inputs=(), priority=0, key=None):
+    """
+    submit(), coalescing identical requests: with a `key` (see
+    ImageCache.make_key), a request arriving while the same workflow is in
+    flight waits on that prompt instead of queuing it again.
+    Returns (tracker, stream, shared); `shared` is True for such followers.
+    """
+    if key is None:
+        return submit(workflow, inputs, priority) + (False,)
+    flight, first = inflight.join(key)
+    if not first:
+        return flight.wait() + (True,)
+    try:
+        tracker, stream = submit(workflow, inputs, priority)
+    except Exception as e:
+        inflight.failed(flight, e)
+        raise
+    inflight.started(flight, tracker, stream)
+    return tracker, stream, False
+
+def prompt_outputs(tracker, address=COMFYUI_SERVER_ADDRESS):
+    """Outputs of a finished prompt, by node id."""
+    # Outputs arrive as `executed` events; fall back to the history when
+    # events may have been missed (reconnect) or did not carry them
+    outputs = tracker.outputs
+    if not outputs or tracker.resynced:
+        outputs = get_history(tracker.prompt_id, address)[tracker.prompt_id].get('outputs', {})
+    return outputs
+
+def save_outputs(outputs, output_path=None, since=None, cache_key=None, address=COMFYUI_SERVER_ADDRESS):
+    """
+    Saves the output images to output_path (if given) and describes them.
+    since: when the prompt was queued; older local files are not this prompt's output.
+    cache_key: stores the saved images in the image cache under this key.
+    address: the backend that rendered them.
+    """
+    results = []
+    downloads = []  # (result index, image, destination)
+
+    if output_path:
+        # Treat output_path as a full file path (not directory)
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+    for node_id, node_output in outputs.items():
+        if 'images' in node_output:
+            for image in node_output['images']:
+                fname = image['filename']
+                ftype = image['type']
+                subfolder = image['subfolder']
+
+                if output_path:
+                    # If multiple images are generated, append index to avoid overwrite
+                    # First image gets the exact output_path name
+                    if len(results) > 0:
+                        base, ext = os.path.splitext(output_path)
+                        dest_path = f"{base}_{len(results)}{ext}"
+                    else:
+                        dest_path = output_path
+                    downloads.append((len(results), image, dest_path))
+                    results.append(None)
+                else:
+                    results.append(f"Generated: {fname} (available at {address}/view?filename={fname}&subfolder={subfolder}&type={ftype})")
+
+    # Transfers run in parallel; results stay in output order
+    saved = transfers[address].save_all([(image, dest_path) for _, image, dest_path in downloads], since)
+    for (index, image, dest_path), (how, error) in zip(downloads, saved):
+        if error is None:
+            results[index] = f"Generated and saved to: {dest_path}"
+        else:
+            results[index] = f"Generated: {image['filename']} but FAILED to save to {dest_path}: {str(error)}"
+
+    if cache_key and downloads and all(error is None for _, error in saved):
+        try:
+            image_cache.put(cache_key, [(dest_path, image['filename']) for _, image, dest_path in downloads])
+        except Exception:
+            pass  # the images are saved; caching them is best effort
+
+    return "\n".join(results) if results else "Workflow executed but no images found in output."
+
+def cache_key_for(workflow, seed, output_path):
+    """
+    The image cache key of a generation, or None if it must not be cached:
+    a random seed (None) asks for a new image, and hits are served to output_path.
+    """
+    if image_cache is None or seed is None or not output_path:
+        return None
+    return ImageCache.make_key(workflow)
+
+def cached_generation(cache_key, output_path):
+    """Saves a cached generation to output_path. Returns the tool result text, or None on a miss."""
+    if cache_key is None:
+        return None
+    try:
+        images = image_cache.get(cache_key)
+    except Exception as e:
+        log_debug(f"Image cache lookup failed, rendering instead: {e}")
+        return None
+    if images is None:
+        return None
+    # Cached images carry their local `path`, so no backend is asked for them;
+    # any backend's transfer links them into place
+    return save_outputs({"cache": {"images": images}}, output_path, address=COMFYUI_BACKENDS[0])
+
+def cancel_prompt(tracker, address):
+    """
+    Stops a prompt in ComfyUI: deletes it from the queue, or interrupts it if
+    it is running. Returns what was done, None if the prompt was not queued.
+    """
+    position = queue_position(get_queue(address), tracker.prompt_id)
+    if position == 0:
+        # Newer ComfyUI only interrupts the given prompt; older ones interrupt
+        # whatever runs, which we just checked is this one
+        post_json("/interrupt", {"prompt_id": tracker.prompt_id}, address)
+        return "interrupted"
+    if position is not None:
+        post_json("/queue", {"delete": [tracker.prompt_id]}, address)
+        tracker.cancel()
+        return "deleted"
+    return None  # not queued at all: it just finished and the result is on its way
+
+def timeout_result(tracker, address, timeout):
+    """Cancels a prompt that missed its deadline and describes where it was stuck."""
+    state = prompt_state(tracker, queue_snapshot(address))
+    others = inflight.waiters(tracker.prompt_id) - 1
+    if others > 0:
+        action = f"left queued for {others} other request(s) waiting for the same image"
+    else:
+        tracker.timed_out = True
+        try:
+            action = cancel_prompt(tracker, address)
+        except Exception as e:
+            action = f"cancel failed: {str(e)}"
+    details = dict(state, status="timeout", prompt_id=tracker.prompt_id, backend=address, timeout=timeout,
+                   stuck_in=state["status"], action=action)
+    return f"Error executing workflow: timed out after {timeout:g}s\n{json.dumps(details)}"
+
+def deadline(timeout):
+    """Seconds to wait for a generation: the caller's timeout, else the server default. None for no limit."""
+    if timeout is None:
+        timeout = GENERATION_TIMEOUT
+    return timeout if timeout and timeout > 0 else None
+
+def run_generation(tracker, stream, output_path=None, cache_key=None, timeout=None):
+    """
+    Waits for a submitted prompt and saves its images. Returns the tool result
+    text. A prompt still unfinished after `timeout` seconds is cancelled.
+    """
+    timeout = deadline(timeout)
+    try:
+        try:
+            tracker = stream.wait(tracker, timeout)
+        except TimeoutError:
+            return timeout_result(tracker, stream.address, timeout)
+        if tracker.status != "success":
+            return f"Error executing workflow: {tracker.error_message}"
+        if tracker.started_at and tracker.finished_at and inflight.waiters(tracker.prompt_id) <= 1:
+            backends.finished(stream.address, tracker.finished_at - tracker.started_at)
+        # Outputs only exist on the backend that rendered them
+        return save_outputs(prompt_outputs(tracker, stream.address), output_path, tracker.queued_at, cache_key,
+                            stream.address)
+    except Exception as e:
+        return f"Error executing workflow: {str(e)}"
+    finally:
+        inflight.leave(tracker.prompt_id)
+
+def start_generation(workflow_name, prompt, negative_prompt="", seed=None, output_path=None, settings=None,
+                     priority=0):
+    """
+    Prepares and queues one generation. Returns (result, tracker, stream, cache_key);
+    `result` is the final text when nothing had to be queued: an error or an image cache hit.
+    """
+    try:
+        workflow = prepare_workflow(workflow_name, prompt, negative_prompt, seed, settings)
+    except FileNotFoundError as e:
+        return f"Error: {e}", None, None, None
+    except Exception as e:
+        return f"Error loading workflow: {str(e)}", None, None, None
+    return queue_workflow(workflow, seed, output_path, priority=priority)
+
+def queue_workflow(workflow, seed=None, output_path=None, inputs=(), priority=0):
+    """
+    Serves a prepared workflow from the image cache or queues it; the second
+    half of start_generation(), with the same return value. With a fixed
+    seed, a request identical to one in flight shares its render.
+    """
+    cache_key = cache_key_for(workflow, seed, output_path)
+    cached = cached_generation(cache_key, output_path)
+    if cached is not None:
+        return cached, None, None, None
+
+    try:
+        key = ImageCache.make_key(workflow) if seed is not None else None
+        tracker, stream, shared = submit_once(workflow, inputs, priority, key)
+        if shared:
+            cache_key = None  # the first request stores it
+    except ConnectionError as e:
+        return str(e), None, None, None
+    except Exception as e:
+        return f"Error executing workflow: {str(e)}", None, None, None
+    return None, tracker, stream, cache_key
+
+async def wait_for_generation(ctx, tracker, stream, output_path=None, cache_key=None, timeout=None):
+    """run_generation() on a worker thread, logging the prompt's progress to `ctx` meanwhile."""
+    async with anyio.create_task_group() as tg:
+        if ctx is not None:
+            tg.start_soon(report_waiting, ctx, [("", tracker, stream.address)])
+        result = await anyio.to_thread.run_sync(run_generation, tracker, stream, output_path, cache_key, timeout)
+        tg.cancel_scope.cancel()
+    return result
+
+async def report_waiting(ctx, waiting):
+    """
+    Every PROGRESS_INTERVAL seconds, logs where the unfinished prompts are:
+    queue position, or running node and percent, plus per-node timings.
+    `waiting`: (label, tracker, backend address) triples. Runs until cancelled.
+    """
+    def snapshot():
+        pending = [(label, tracker, address) for label, tracker, address in waiting if not tracker.finished]
+        queues = {address: queue_snapshot(address) for address in {address for _, _, address in pending}}
+        return [f"{label}{format_state(prompt_state(tracker, queues[address]))}" for label, tracker, address in pending]
+
+    while True:
+        await anyio.sleep(PROGRESS_INTERVAL)
+        lines = await anyio.to_thread.run_sync(snapshot)
+        if lines:
+            await ctx.info("\n".join(lines))
+
+@mcp.tool()
+async def generate_image(workflow_name: str, prompt: str, negative_prompt: str = "", seed: int = None,
+                         output_path: str = None, timeout: float = None, quality: str = None,
+                         steps: int = None, cfg: float = None, sampler: str = None, width: int = None,
+                         height: int = None, batch_size: int = None, priority: int = 0,
+                         ctx: Context = None) -> str:
     """
     Generate an image using a specific ComfyUI workflow (saved in API format).
     Refers to the workflow file by name (e.g., 'flux.json').
-    Automatically attempts to inject the prompt into CLIPTextEncode nodes.
+    The prompt and negative prompt go into the CLIPTextEncode nodes wired to the
+    sampler's positive/negative inputs, the seed into every seed/noise_seed input.
+    steps, cfg and sampler go into the sampler nodes, width, height and batch_size into
+    the empty latent (or ImageScale) node; unset ones keep the workflow's values.
+    quality='draft' renders 4 cheap half-size candidates to choose from, quality='final'
+    the workflow's full settings; explicit settings override the tier.
+    'priority' orders it in the ComfyUI queue: higher runs sooner (e.g. 1 for a portrait
+    someone is waiting on), 0 is first come first served, negative for background work.
+    An identical request (same settings and explicit seed) already in flight is not
+    rendered twice: this call waits for that one's image.
     
     If 'output_path' is provided, the generated image(s) will be copied to that directory.
+    With the image cache enabled, a repeat of an earlier request with the same seed and
+    output_path returns the stored image without rendering.
+    If the image is not done within 'timeout' seconds (server default if omitted, queue
+    wait included) the prompt is cancelled in ComfyUI and a timeout error is returned,
+    with details of where it was stuck as JSON on the second line.
     """
-    workflow_path = os.path.join(WORKFLOW_DIR, workflow_name)
-    if not os.path.exists(workflow_path):
-        return f"Error: Workflow file '{workflow_name}' not found in {WORKFLOW_DIR}"
+    settings = GenerationSettings(quality=quality, steps=steps, cfg=cfg, sampler=sampler, width=width,
+                                  height=height, batch_size=batch_size).settings()
+    result, tracker, stream, cache_key = await anyio.to_thread.run_sync(
+        start_generation, workflow_name, prompt, negative_prompt, seed, output_path, settings, priority)
+    if tracker is None:
+        return result
+    return await wait_for_generation(ctx, tracker, stream, output_path, cache_key, timeout)
+
+class PipelineStep(GenerationSettings):
+    workflow_name: str = Field(description="Workflow file, e.g. 'default_workflow.json' or 'upscale_workflow.json'")
+    prompt: str = Field(default="", description="Positive prompt, for workflows that take one")
+    negative_prompt: str = Field(default="", description="Negative prompt")
+    seed: Optional[int] = Field(default=None, description="Seed; random if omitted")
+    input_images: list[str] = Field(default_factory=list, description=(
+        "Local image files for the step's LoadImage nodes. The first step fills them in order; "
+        "later steps get the previous step's image in their first LoadImage, these fill the rest"))
 
+def start_pipeline(steps, output_path=None, priority=0):
+    """Chains the steps into one prompt and queues it. Returns what start_generation() does."""
     try:
-        with open(workflow_path, "r", encoding="utf-8") as f:
-            workflow = json.load(f)
+        rendered, inputs, seeds = [], [], []
+        for index, step in enumerate(steps):
+            template = workflows.get(step.workflow_name)
+            names = []
+            for path in step.input_images:
+                names.append(input_name(path))
+                inputs.append((path, names[-1]))
+            if step.seed is None and template.seed_slots:
+                seeds = None  # random: never served from the image cache
+            elif seeds is not None:
+                seeds.append(step.seed)
+            # After the first step, the first LoadImage takes the previous step's image
+            images = [None] + names if index and template.image_slots else names
+            workflow = prepare_workflow(step.workflow_name, step.prompt, step.negative_prompt, step.seed,
+                                        step.settings(), images)
+            rendered.append((template, workflow))
+        workflow = chain(rendered)
+    except FileNotFoundError as e:
+        return f"Error: {e}", None, None, None
     except Exception as e:
-        return f"Error loading workflow: {str(e)}"
-
-    # Heuristic for prompt injection
-    # 1. Find all CLIPTextEncode nodes
-    clip_nodes = []
-    for node_id, node in workflow.items():
-        if node.get("class_type") == "CLIPTextEncode" or node.get("class_type") == "CLIPTextEncodeFlux":
-             clip_nodes.append((node_id, node))
-    
-    # Needs to be smarter: usually one is connected to positive, one to negative.
-    # We can try to guess based on existing text or just assign first to positive, second to negative if available.
-    
-    # Simple heuristic: If "text" input contains "positive" or "prompt" vs "negative"
-    # Or just simple order: First found is positive, second is negative
-    
-    positive_node = None
-    negative_node = None
+        return f"Error loading workflow: {str(e)}", None, None, None
+    return queue_workflow(workflow, seeds, output_path, inputs, priority)
 
-    for nid, node in clip_nodes:
-        current_text = node.get("inputs", {}).get("text", "").lower()
-        if "negative" in current_text:
-            negative_node = (nid, node)
+@mcp.tool()
+async def run_pipeline(steps: list[PipelineStep], output_path: str = None, timeout: float = None,
+                       priority: int = 0, ctx: Context = None) -> str:
+    """
+    Run several workflows back to back as one ComfyUI prompt, e.g. generate, then
+    'upscale_workflow.json', then 'remove_background_workflow.json'. Each step's image is
+    wired into the next step's LoadImage inside ComfyUI, so intermediate images are never
+    downloaded or uploaded again; only the final image is saved to 'output_path'.
+    Local input images are uploaded once and reused by content hash.
+    'timeout' and 'priority' work as for generate_image; the timeout covers the whole pipeline.
+    """
+    if not steps:
+        return "Error: no pipeline steps given."
+    result, tracker, stream, cache_key = await anyio.to_thread.run_sync(start_pipeline, steps, output_path, priority)
+    if tracker is None:
+        return result
+    return await wait_for_generation(ctx, tracker, stream, output_path, cache_key, timeout)
+
+class ImageOperation(BaseModel):
+    input_path: str = Field(description="Local image file")
+    operation: str = Field(description=(
+        "'resize', 'crop', 'convert' or 'thumbnail' (done locally), or 'upscale' or "
+        "'remove_background' (model-based, run on ComfyUI; they take no size, format or quality options)"))
+    output_path: Optional[str] = Field(default=None, description=(
+        "File or directory to save to; next to the input, named after the operation, if omitted"))
+    width: Optional[int] = Field(default=None, description="resize/thumbnail: width in pixels")
+    height: Optional[int] = Field(default=None, description="resize/thumbnail: height in pixels")
+    scale: Optional[float] = Field(default=None, description="resize: factor instead of width/height, e.g. 2")
+    box: Optional[list[int]] = Field(default=None, description="crop: [left, top, right, bottom] in pixels")
+    format: Optional[str] = Field(default=None, description="Output format, e.g. 'png', 'jpg', 'webp'")
+    quality: Optional[int] = Field(default=None, description="JPEG/WebP quality, 1-95")
+    resample: str = Field(default="lanczos", description="nearest-exact, bilinear, area, bicubic or lanczos")
+
+# Local image operations run here, never on the ComfyUI queue
+image_workers = ThreadPoolExecutor(max_workers=IMAGE_OPS_WORKERS, thread_name_prefix="image_ops")
+
+def run_image_op(item):
+    """Runs one local ImageOperation with Pillow and describes the result."""
+    started = time.time()
+    try:
+        dest, (width, height) = process_image(item.input_path, item.operation, item.output_path, item.format,
+                                              item.quality, width=item.width, height=item.height, scale=item.scale,
+                                              box=item.box, resample=item.resample)
+    except FileNotFoundError:
+        return f"Error: input image not found: {item.input_path}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+    return f"Saved {width}x{height} image to: {dest} ({(time.time() - started) * 1000:.0f} ms)"
+
+def model_op_error(item):
+    """Why a model-based ImageOperation cannot run as given, or None if it can."""
+    # The workflow decides the size and writes PNG; run resize/convert on its result for anything else
+    options = [name for name in ("width", "height", "scale", "box", "quality") if getattr(item, name) is not None]
+    if item.format is not None and item.format.lower() != "png":
+        options.append("format")
+    if item.resample != ImageOperation.model_fields["resample"].default:
+        options.append("resample")
+    if options:
+        return f"Error: {item.operation} does not take {', '.join(options)}; resize or convert its result instead"
+    if not os.path.isfile(item.input_path):
+        return f"Error: input image not found: {item.input_path}"
+    try:
+        destination(item.input_path, item.output_path, item.operation, "png")
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    return None
+
+@mcp.tool()
+async def image_ops(operations: list[ImageOperation], priority: int = 0, timeout: float = None,
+                    ctx: Context = None) -> str:
+    """
+    Resize, crop, convert or thumbnail local images, or upscale them or remove their
+    background with a model. resize/crop/convert/thumbnail run here with Pillow, several
+    files at a time, and take milliseconds instead of a trip through the ComfyUI queue;
+    use resize with 'scale' for a plain (non-AI) upscale. Only 'upscale' (RealESRGAN) and
+    'remove_background' are queued on ComfyUI, with 'priority' and 'timeout' as for
+    generate_image. Returns one result per operation, in the order given.
+    """
+    if not operations:
+        return "Error: no image operations given."
+    for item in operations:
+        if item.operation not in LOCAL_OPERATIONS and item.operation not in MODEL_OPERATIONS:
+            return (f"Error: unknown operation '{item.operation}', expected one of "
+                    f"{', '.join(LOCAL_OPERATIONS + tuple(MODEL_OPERATIONS))}")
+
+    def output_path(item):
+        # Named like the local operations' results: ComfyUI's own names mean nothing to the caller
+        return destination(item.input_path, item.output_path, item.operation, "png")
+
+    def queue_model_ops():
+        started = {}
+        for index, item in enumerate(operations):
+            if item.operation not in MODEL_OPERATIONS:
+                continue
+            error = model_op_error(item)
+            if error is not None:
+                started[index] = (error, None, None, None)
+                continue
+            step = PipelineStep(workflow_name=MODEL_OPERATIONS[item.operation], input_images=[item.input_path])
+            started[index] = start_pipeline([step], output_path(item), priority)
+        return started
+
+    results = [None] * len(operations)
+
+    async def run_local():
+        local = [index for index, item in enumerate(operations) if item.operation in LOCAL_OPERATIONS]
+        done = await anyio.to_thread.run_sync(
+            lambda: list(image_workers.map(run_image_op, [operations[index] for index in local])))
+        for index, result in zip(local, done):
+            results[index] = result
+
+    async def finish(index, result, tracker, stream, cache_key):
+        if tracker is None:
+            results[index] = result
         else:
-            if positive_node is None:
-                positive_node = (nid, node)
-            elif negative_node is None:
-                # If we already have a positive and this doesn't look explicitly negative, 
-                # but we need a negative, assign it. 
-                # BUT, ComfyUI default workflows often put positive at bottom or top.
-                pass
-    
-    # Fallback: if we didn't find specific negative, but have 2 nodes, assume 2nd is negative
-    if positive_node and not negative_node and len(clip_nodes) >= 2:
-        if clip_nodes[0] == positive_node:
-            negative_node = clip_nodes[1]
+            results[index] = await anyio.to_thread.run_sync(run_generation, tracker, stream,
+                                                            output_path(operations[index]), cache_key, timeout)
+
+    async def run_models():
+        started = await anyio.to_thread.run_sync(queue_model_ops)
+        waiting = [(f"[{index + 1}/{len(operations)}] ", tracker, stream.address)
+                   for index, (_, tracker, stream, _) in started.items() if tracker is not None]
+        async with anyio.create_task_group() as tg:
+            if waiting and ctx is not None:
+                tg.start_soon(report_waiting, ctx, waiting)
+            async with anyio.create_task_group() as models:
+                for index, entry in started.items():
+                    models.start_soon(finish, index, *entry)
+            tg.cancel_scope.cancel()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(run_local)
+        tg.start_soon(run_models)
+
+    return "\n".join(f"[{i + 1}/{len(operations)}] {operations[i].operation}: {result}"
+                     for i, result in enumerate(results))
+
+class ImageRequest(GenerationSettings):
+    workflow_name: str = Field(description="Workflow file name, e.g. 'default_workflow.json'")
+    prompt: str = Field(description="Positive prompt")
+    negative_prompt: str = Field(default="", description="Negative prompt")
+    seed: Optional[int] = Field(default=None, description="Seed; random if omitted")
+    output_path: Optional[str] = Field(default=None, description="Where to save the image(s)")
+    timeout: Optional[float] = Field(default=None, description="Seconds before the prompt is cancelled; server default if omitted")
+    priority: int = Field(default=0, description="Higher runs sooner, negative for background work")
+
+@mcp.tool()
+async def generate_images(images: list[ImageRequest], ctx: Context) -> str:
+    """
+    Generate several images in one call, e.g. every scene and portrait of a chapter.
+    Each item takes the same arguments as generate_image. All prompts are queued on
+    ComfyUI up front so the GPUs work through them back to back; each item's result is
+    sent as a progress notification as soon as it is done, and where the others are
+    (queue position or running node) is logged while they wait. Returns one result per
+    item, in the order given.
+    """
+    if not images:
+        return "Error: no images requested."
+
+    def submit_all():
+        return [start_generation(item.workflow_name, item.prompt, item.negative_prompt, item.seed, item.output_path,
+                                 item.settings(), item.priority)
+                for item in images]
+
+    submitted = await anyio.to_thread.run_sync(submit_all)
+    results = [None] * len(images)
+    done = 0
+
+    async def finish(index, result, tracker, stream, cache_key):
+        nonlocal done
+        if tracker is None:
+            results[index] = result
         else:
-            negative_node = clip_nodes[0]
+            results[index] = await anyio.to_thread.run_sync(run_generation, tracker, stream, images[index].output_path,
+                                                             cache_key, images[index].timeout, limiter=limiter)
+        done += 1
+        message = f"[{index + 1}/{len(images)}] {results[index]}"
+        await ctx.report_progress(done, len(images), message)
+        await ctx.info(message)
 
-    if positive_node:
-        workflow[positive_node[0]]["inputs"]["text"] = prompt
-    
-    if negative_node and negative_prompt:
-        workflow[negative_node[0]]["inputs"]["text"] = negative_prompt
+    # One waiting thread per item, so results are reported in completion order
+    limiter = anyio.CapacityLimiter(len(images))
+    waiting = [(f"[{i + 1}/{len(images)}] ", tracker, stream.address)
+               for i, (_, tracker, stream, _) in enumerate(submitted) if tracker is not None]
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(report_waiting, ctx, waiting)
+        async with anyio.create_task_group() as items:
+            for index, entry in enumerate(submitted):
+                items.start_soon(finish, index, *entry)
+        tg.cancel_scope.cancel()
 
-    # Randomize Seed (find KSampler or similar)
-    if seed is None:
-        import random
-        seed = random.randint(1, 1000000000000)
-    
-    for node_id, node in workflow.items():
-        if "inputs" in node and "seed" in node["inputs"]:
-            node["inputs"]["seed"] = seed
-        if "inputs" in node and "noise_seed" in node["inputs"]:
-            node["inputs"]["noise_seed"] = seed
-
-    # Connect to WebSocket
-    ws = websocket.WebSocket()
-    ws_url = f"ws://{COMFYUI_SERVER_ADDRESS}/ws?clientId={CLIENT_ID}"
-    log_debug(f"Connecting to WebSocket: {ws_url}")
+    return "\n\n".join(f"[{i + 1}/{len(images)}] {images[i].workflow_name}:\n{result}"
+                       for i, result in enumerate(results))
+
+# Jobs queued by submit_image, by ComfyUI prompt id
+jobs = JobTable()
+
+def queue_snapshot(address):
+    """The backend's /queue response, or None if it cannot be asked right now."""
+    if address is None:
+        return None
+    try:
+        return get_queue(address)
+    except Exception:
+        return None
+
+def start_job(tracker, stream, workflow_name, output_path=None, cache_key=None, timeout=None, shared=False):
+    """
+    Saves the job's images in the background as soon as it finishes, waited on or not.
+    `shared`: the prompt belongs to an identical earlier request, so the job gets its own id.
+    """
+    job_id = str(uuid.uuid4()) if shared else None
+    job = jobs.add(Job(tracker, workflow_name, output_path, stream.address, job_id))
+
+    def run():
+        job.future.set_result(run_generation(tracker, stream, output_path, cache_key, timeout))
+
+    threading.Thread(target=run, name=f"comfy-job-{job.job_id}", daemon=True).start()
+    return job
+
+def finished_job(workflow_name, result, output_path=None):
+    """A job that needed no rendering, e.g. an image cache hit."""
+    tracker = PromptTracker(str(uuid.uuid4()))
+    tracker.handle("execution_success", {})
+    job = jobs.add(Job(tracker, workflow_name, output_path))
+    job.future.set_result(result)
+    return job
+
+@threaded_tool
+def submit_image(workflow_name: str, prompt: str, negative_prompt: str = "", seed: int = None,
+                 output_path: str = None, timeout: float = None, quality: str = None, steps: int = None,
+                 cfg: float = None, sampler: str = None, width: int = None, height: int = None,
+                 batch_size: int = None, priority: int = 0) -> dict:
+    """
+    Queue an image generation and return its job id right away, without waiting for the render.
+    Takes the same arguments as generate_image. Follow up with get_job_status or wait_for_jobs;
+    the image is saved to output_path as soon as it is done. A job not done within 'timeout'
+    seconds is cancelled and reports status "timeout".
+    """
+    settings = GenerationSettings(quality=quality, steps=steps, cfg=cfg, sampler=sampler, width=width,
+                                  height=height, batch_size=batch_size).settings()
     try:
-        ws.connect(ws_url)
+        workflow = prepare_workflow(workflow_name, prompt, negative_prompt, seed, settings)
+    except FileNotFoundError as e:
+        return {"error": str(e)}
     except Exception as e:
-        log_debug(f"WebSocket connection failed: {e}")
-        return f"Error connecting to ComfyUI WebSocket: {str(e)}. Is ComfyUI running?"
+        return {"error": f"Error loading workflow: {str(e)}"}
+
+    cache_key = cache_key_for(workflow, seed, output_path)
+    cached = cached_generation(cache_key, output_path)
+    if cached is not None:
+        return finished_job(workflow_name, cached, output_path).describe()
 
     try:
-        # Send prompt
-        prompt_res = queue_prompt(workflow)
-        prompt_id = prompt_res['prompt_id']
-        
-        # Listen for completion
-        while True:
-            out = ws.recv()
-            if isinstance(out, str):
-                message = json.loads(out)
-                if message['type'] == 'executing':
-                    data = message['data']
-                    if data['node'] is None and data['prompt_id'] == prompt_id:
-                        # Execution finished
-                        break
-        
-        # Get history to find finding outputs
-        history = get_history(prompt_id)
-        prompt_history = history[prompt_id]
-        
-        outputs = prompt_history.get('outputs', {})
-        results = []
-        
-        import shutil
-        if output_path:
-            # Treat output_path as a full file path (not directory)
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir, exist_ok=True)
-
-        for node_id, node_output in outputs.items():
-            if 'images' in node_output:
-                for image in node_output['images']:
-                    fname = image['filename']
-                    ftype = image['type']
-                    subfolder = image['subfolder']
-                    
-                    # Original path in ComfyUI output (kept for local logging)
-                    original_file_path = os.path.join(COMFYUI_OUTPUT_DIR, subfolder, fname)
-                    
-                    if output_path:
-                        # If multiple images are generated, append index to avoid overwrite
-                        # First image gets the exact output_path name
-                        if len(results) > 0:
-                            base, ext = os.path.splitext(output_path)
-                            dest_path = f"{base}_{len(results)}{ext}"
-                        else:
-                            dest_path = output_path
-                            
-                        try:
-                            # Download via API instead of local copy for remote compatibility
-                            image_data = get_image(fname, subfolder, ftype)
-                            with open(dest_path, "wb") as f:
-                                f.write(image_data)
-                            results.append(f"Generated and saved to: {dest_path}")
-                        except Exception as e:
-                            results.append(f"Generated: {fname} but FAILED to save to {dest_path}: {str(e)}")
-                    else:
-                        results.append(f"Generated: {fname} (available at {COMFYUI_SERVER_ADDRESS}/view?filename={fname}&subfolder={subfolder}&type={ftype})")
-        
-        return "\n".join(results) if results else "Workflow executed but no images found in output."
+        key = ImageCache.make_key(workflow) if seed is not None else None
+        tracker, stream, shared = submit_once(workflow, priority=priority, key=key)
+        job = start_job(tracker, stream, workflow_name, output_path, None if shared else cache_key, timeout, shared)
+    except Exception as e:
+        return {"error": f"Error queuing workflow: {str(e)}"}
+    return job.describe(queue_snapshot(job.address))
+
+@threaded_tool
+def get_job_status(job_id: str) -> dict:
+    """
+    Status of a submitted job: queued (with its queue position), running (with the current
+    node and percent done), saving, success, error, interrupted, cancelled or timeout, plus
+    the time spent in each node so far. Finished jobs include the same result text
+    generate_image returns.
+    """
+    try:
+        job = jobs.get(job_id)
+    except KeyError as e:
+        return {"job_id": job_id, "status": "unknown", "error": e.args[0]}
+    return job.describe(None if job.tracker.finished else queue_snapshot(job.address))
+
+@threaded_tool
+def wait_for_jobs(job_ids: list[str], timeout: float = 300, return_when: str = "all") -> dict:
+    """
+    Wait until all of the given jobs are finished (return_when="all") or at least one is
+    (return_when="any"), or until timeout seconds pass. Returns every job's status and the
+    ids still pending.
+    """
+    known, unknown = [], []
+    for job_id in job_ids:
+        try:
+            known.append(jobs.get(job_id))
+        except KeyError as e:
+            unknown.append({"job_id": job_id, "status": "unknown", "error": e.args[0]})
+
+    done, pending = jobs.wait(known, timeout, return_when)
+    queues = {address: queue_snapshot(address) for address in {job.address for job in pending}}
+    return {
+        "jobs": [job.describe(queues.get(job.address)) for job in known] + unknown,
+        "pending": [job.job_id for job in pending],
+        "timed_out": bool(pending) and (return_when != "any" or not done),
+    }
+
+@threaded_tool
+def cancel_job(job_id: str) -> dict:
+    """Cancel a submitted job: removes it from the ComfyUI queue, or interrupts it if it is already running."""
+    try:
+        job = jobs.get(job_id)
+    except KeyError as e:
+        return {"job_id": job_id, "status": "unknown", "error": e.args[0]}
+    if job.tracker.finished:
+        return job.describe()
+    others = inflight.waiters(job.tracker.prompt_id) - 1
+    if others > 0:
+        return dict(job.describe(), error=f"Not cancelled: {others} other request(s) wait for the same image")
 
+    try:
+        cancel_prompt(job.tracker, job.address)
     except Exception as e:
-        return f"Error executing workflow: {str(e)}"
-    finally:
-        ws.close()
+        return dict(job.describe(), error=f"Error cancelling job: {str(e)}")
+
+    try:
+        # Interrupted prompts finish once the running node returns
+        job.future.result(WS_CONNECT_TIMEOUT)
+    except Exception:
+        pass
+    return job.describe()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ComfyUI MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                        help="stdio for one client per process, sse/streamable-http to share one server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8004)
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    start_preflight()
     try:
-        mcp.run()
+        mcp.run(transport=args.transport)
     finally:
         stop_ssh_tunnel()
@@ -1,80 +1,512 @@
+"""
+ComfyUI simulator for offline tests and benchmarks.
+
+Behaves like a single-GPU ComfyUI: prompts wait in a real queue (ordered by
+`number`, `front` honoured) and run one at a time, each node announced with
+`executing` and sampler steps with `progress` websocket messages, outputs
+land in /history and are served by /view. Render times, output image sizes
+and failures come from a JSON config, given with --config or the
+MOCK_COMFYUI_CONFIG environment variable (a file path or inline JSON):
+
+    {
+      "seed": 0,
+      "default": {"service_time": 0.5, "image_size": [64, 64]},
+      "workflows": [
+        {"match": "UpscaleModelLoader", "service_time": {"dist": "lognormal", "median": 3, "sigma": 0.4},
+         "image_size": [2048, 2048]},
+        {"match": "ComfyUI_resized", "service_time": {"dist": "uniform", "low": 0.05, "high": 0.2}}
+      ],
+      "failure_rate": 0.0, "disconnect_rate": 0.0, "reject_rate": 0.0,
+      "noise": false
+    }
+
+A workflow profile applies to prompts with a node whose class_type or
+filename_prefix is `match`; the first match wins, `default` fills in the
+rest. Every profile key may also be set per profile.
+
+- service_time: seconds, or {"dist": "fixed" | "uniform" | "normal" |
+  "lognormal" | "exponential", ...} with value / low, high / mean, stddev /
+  median, sigma / mean, and an optional "min".
+- image_size: [width, height], or "latent" for the prompt's own width and
+  height (empty latent or ImageScale node). Batches give batch_size images.
+- failure_rate: share of prompts that end in execution_error at a random node.
+- disconnect_rate: share of prompts during which the submitting client's
+  websockets are dropped (the prompt still finishes; see /history).
+- reject_rate: share of POST /prompt calls refused with a validation error.
+- noise: random pixels, so PNGs are as large as real renders instead of tiny.
+
+GET /simulator/stats reports completed, failed and interrupted prompts,
+queue waits and GPU utilisation.
+
+USAGE:
+    python mock_comfyui.py [PORT] [--config simulator.json]
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import struct
+import time
+import uuid
+import zlib
+
 import uvicorn
 from starlette.applications import Starlette
 from starlette.responses import JSONResponse, Response
 from starlette.routing import Route, WebSocketRoute
-from starlette.websockets import WebSocket
-import asyncio
-import json
-import uuid
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+DEFAULT_CONFIG = {
+    "seed": None,
+    "default": {"service_time": 0.5, "image_size": [64, 64]},
+    "workflows": [],
+    "failure_rate": 0.0,
+    "disconnect_rate": 0.0,
+    "reject_rate": 0.0,
+    "noise": False,
+}
+PROFILE_KEYS = ("service_time", "image_size", "failure_rate", "disconnect_rate", "reject_rate", "noise")
+# Share of a prompt's service time spent in sampler nodes; the other nodes split the rest
+SAMPLER_SHARE = 0.8
+FALLBACK_SIZE = (64, 64)
+VRAM_TOTAL = 24 * 1024 ** 3
+
+
+def load_config(source=None):
+    """The simulator config from a JSON file path or inline JSON, over DEFAULT_CONFIG."""
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if source:
+        if source.lstrip().startswith("{"):
+            loaded = json.loads(source)
+        else:
+            with open(source, encoding="utf-8") as f:
+                loaded = json.load(f)
+        default = dict(config["default"], **loaded.pop("default", {}))
+        config.update(loaded, default=default)
+    return config
+
+
+def sample_time(spec, rng):
+    """Draws one service time in seconds from a distribution spec (see the module docstring)."""
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    kind = spec.get("dist", "fixed")
+    if kind == "fixed":
+        value = spec["value"]
+    elif kind == "uniform":
+        value = rng.uniform(spec["low"], spec["high"])
+    elif kind == "normal":
+        value = rng.gauss(spec["mean"], spec["stddev"])
+    elif kind == "lognormal":
+        value = spec["median"] * math.exp(rng.gauss(0, spec["sigma"]))
+    elif kind == "exponential":
+        value = rng.expovariate(1 / spec["mean"])
+    else:
+        raise ValueError(f"unknown service time distribution '{kind}'")
+    return max(float(spec.get("min", 0.0)), value)
+
+
+def make_png(width, height, noise=False, rng=None):
+    """An RGB PNG; with `noise`, random pixels that do not compress."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row_bytes = 3 * width
+    if noise:
+        rng = rng or random.Random()
+        rows = b"".join(b"\x00" + rng.randbytes(row_bytes) for _ in range(height))
+    else:
+        rows = (b"\x00" + b"\x80" * row_bytes) * height
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b""))
+
+
+def execution_order(prompt):
+    """Node ids in an order that runs every node after the nodes it takes inputs from."""
+    order, seen = [], set()
+
+    def visit(node_id):
+        if node_id in seen or node_id not in prompt:
+            return
+        seen.add(node_id)
+        for value in prompt[node_id].get("inputs", {}).values():
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str):
+                visit(value[0])
+        order.append(node_id)
+
+    for node_id in prompt:
+        visit(node_id)
+    return order
+
+
+def is_sampler(node):
+    steps = node.get("inputs", {}).get("steps")
+    return isinstance(steps, int) and not isinstance(steps, bool)
+
+
+class Prompt:
+
+    def __init__(self, number, prompt_id, prompt, client_id, profile):
+        self.number = number
+        self.prompt_id = prompt_id
+        self.prompt = prompt
+        self.client_id = client_id
+        self.profile = profile
+        self.queued_at = time.time()
+        self.interrupted = asyncio.Event()
+
+    def queue_entry(self):
+        outputs = [node_id for node_id, node in self.prompt.items()
+                   if node.get("class_type") in ("SaveImage", "PreviewImage")]
+        return [self.number, self.prompt_id, self.prompt, {"client_id": self.client_id}, outputs]
+
+
+class Simulator:
+    """The state behind the routes: queue, running prompt, history, images and websocket clients."""
+
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(config.get("seed"))
+        self.pending = []  # heap of (number, sequence, Prompt)
+        self.sequence = itertools.count()
+        self.number = 0
+        self.running = None
+        self.history = {}
+        self.images = {}  # (type, subfolder, filename) -> (width, height, noise) or uploaded bytes
+        self.png_cache = {}
+        self.image_counter = itertools.count(1)
+        self.clients = {}  # client id -> set of websockets
+        self.wakeup = None
+        self.worker = None
+        self.started_at = time.time()
+        self.stats = {"queued": 0, "completed": 0, "failed": 0, "interrupted": 0, "deleted": 0, "rejected": 0,
+                      "disconnects": 0, "busy_seconds": 0.0, "queue_wait_seconds": 0.0}
+
+    def profile(self, prompt):
+        """The config profile for a prompt: the first matching workflow over `default` over the globals."""
+        profile = {key: self.config[key] for key in PROFILE_KEYS if key in self.config}
+        profile.update(self.config["default"])
+        names = set()
+        for node in prompt.values():
+            names.add(node.get("class_type"))
+            names.add(node.get("inputs", {}).get("filename_prefix"))
+        for workflow in self.config.get("workflows", []):
+            if workflow.get("match") in names:
+                profile.update({key: workflow[key] for key in PROFILE_KEYS if key in workflow})
+                break
+        return profile
+
+    def queue_remaining(self):
+        return len(self.pending) + (self.running is not None)
+
+    def ensure_worker(self):
+        if self.worker is None or self.worker.done():
+            self.wakeup = asyncio.Event()
+            self.worker = asyncio.create_task(self.run())
 
-# Store history
-history = {}
-clients = set()
-
-async def notify_clients(prompt_id):
-    await asyncio.sleep(0.5) # Simulate processing time
-    msg = {
-        "type": "executing",
-        "data": {
-            "node": None,
-            "prompt_id": prompt_id
+    # --- websocket messages
+
+    async def send(self, kind, data, client_id=None):
+        """Sends to `client_id`'s websockets, or to everyone when it is None."""
+        message = json.dumps({"type": kind, "data": data})
+        sockets = self.clients.get(client_id, set()) if client_id else set().union(*self.clients.values())
+        for websocket in list(sockets):
+            try:
+                await websocket.send_text(message)
+            except Exception:
+                self.forget(client_id, websocket)
+
+    async def send_status(self):
+        await self.send("status", {"status": {"exec_info": {"queue_remaining": self.queue_remaining()}}})
+
+    def forget(self, client_id, websocket):
+        for key in ([client_id] if client_id else list(self.clients)):
+            self.clients.get(key, set()).discard(websocket)
+
+    async def disconnect(self, client_id):
+        self.stats["disconnects"] += 1
+        for websocket in list(self.clients.pop(client_id, set())):
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+
+    # --- the queue
+
+    async def submit(self, body):
+        prompt = body.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            return {"error": {"type": "invalid_prompt", "message": "Cannot execute because no prompt was given",
+                              "details": "", "extra_info": {}}, "node_errors": {}}, 400
+        profile = self.profile(prompt)
+        if self.rng.random() < profile.get("reject_rate", 0):
+            self.stats["rejected"] += 1
+            return {"error": {"type": "prompt_outputs_failed_validation", "message": "Prompt outputs failed validation",
+                              "details": "simulated rejection", "extra_info": {}}, "node_errors": {}}, 400
+        # Same rule as ComfyUI: an explicit number wins, `front` only negates the counter
+        if "number" in body:
+            number = float(body["number"])
+        else:
+            number = -self.number if body.get("front") else self.number
+            self.number += 1
+        entry = Prompt(number, body.get("prompt_id") or str(uuid.uuid4()), prompt, body.get("client_id"), profile)
+        heapq.heappush(self.pending, (number, next(self.sequence), entry))
+        self.stats["queued"] += 1
+        self.ensure_worker()
+        self.wakeup.set()
+        await self.send_status()
+        return {"prompt_id": entry.prompt_id, "number": number, "node_errors": {}}, 200
+
+    def delete(self, prompt_ids):
+        kept = [item for item in self.pending if item[2].prompt_id not in prompt_ids]
+        self.stats["deleted"] += len(self.pending) - len(kept)
+        self.pending = kept
+        heapq.heapify(self.pending)
+
+    def interrupt(self, prompt_id=None):
+        if self.running is not None and prompt_id in (None, self.running.prompt_id):
+            self.running.interrupted.set()
+
+    async def run(self):
+        while True:
+            while not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            _, _, entry = heapq.heappop(self.pending)
+            self.running = entry
+            started = time.time()
+            self.stats["queue_wait_seconds"] += started - entry.queued_at
+            try:
+                await self.execute(entry)
+            finally:
+                self.stats["busy_seconds"] += time.time() - started
+                self.running = None
+                await self.send_status()
+
+    async def execute(self, entry):
+        prompt, profile, client = entry.prompt, entry.profile, entry.client_id
+        base = {"prompt_id": entry.prompt_id}
+        order = execution_order(prompt)
+        total = sample_time(profile["service_time"], self.rng)
+        samplers = [node_id for node_id in order if is_sampler(prompt[node_id])]
+        others = len(order) - len(samplers)
+        sampler_time = total * (SAMPLER_SHARE if others else 1.0) / len(samplers) if samplers else 0.0
+        other_time = (total - sampler_time * len(samplers)) / others if others else 0.0
+        failing = self.rng.choice(order) if self.rng.random() < profile.get("failure_rate", 0) else None
+        dropping = self.rng.random() < profile.get("disconnect_rate", 0)
+        drop_at = self.rng.randrange(len(order)) if dropping else None
+
+        await self.send("execution_start", dict(base, timestamp=int(time.time() * 1000)), client)
+        await self.send("execution_cached", dict(base, nodes=[]), client)
+        executed, outputs = [], {}
+        for index, node_id in enumerate(order):
+            node = prompt[node_id]
+            if index == drop_at:
+                await self.disconnect(client)
+            await self.send("executing", dict(base, node=node_id, display_node=node_id), client)
+            if node_id == failing:
+                return await self.finish(entry, "error", outputs, executed, "execution_error", dict(
+                    base, node_id=node_id, node_type=node.get("class_type"), executed=executed,
+                    exception_message="Simulated failure", exception_type="RuntimeError", traceback=[],
+                    current_inputs={}, current_outputs={}))
+            if node_id in samplers:
+                steps = max(1, node["inputs"]["steps"])
+                for step in range(1, steps + 1):
+                    if await self.pause(entry, sampler_time / steps):
+                        break
+                    await self.send("progress", dict(base, value=step, max=steps, node=node_id), client)
+            else:
+                await self.pause(entry, other_time)
+            if entry.interrupted.is_set():
+                return await self.finish(entry, "interrupted", outputs, executed, "execution_interrupted", dict(
+                    base, node_id=node_id, node_type=node.get("class_type"), executed=executed))
+            if node.get("class_type") in ("SaveImage", "PreviewImage"):
+                outputs[node_id] = {"images": self.render(prompt, node, profile)}
+                await self.send("executed", dict(base, node=node_id, display_node=node_id,
+                                                 output=outputs[node_id]), client)
+            executed.append(node_id)
+        await self.send("executing", dict(base, node=None), client)
+        await self.finish(entry, "success", outputs, executed, "execution_success",
+                          dict(base, timestamp=int(time.time() * 1000)))
+
+    async def pause(self, entry, seconds):
+        """Sleeps `seconds` of simulated work; True if the prompt was interrupted meanwhile."""
+        try:
+            await asyncio.wait_for(entry.interrupted.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def finish(self, entry, status, outputs, executed, kind, data):
+        self.stats[{"success": "completed", "error": "failed", "interrupted": "interrupted"}[status]] += 1
+        self.history[entry.prompt_id] = {
+            "prompt": entry.queue_entry(),
+            "outputs": outputs,
+            "status": {"status_str": "success" if status == "success" else "error",
+                       "completed": status == "success",
+                       "messages": [["execution_start", {"prompt_id": entry.prompt_id}], [kind, data]]},
         }
-    }
-    print(f"Mock: Sending completion for {prompt_id} to {len(clients)} clients")
-    for client in list(clients):
+        await self.send(kind, data, entry.client_id)
+
+    # --- images
+
+    def output_size(self, prompt, profile):
+        size = profile.get("image_size", FALLBACK_SIZE)
+        if size != "latent":
+            return tuple(size)
+        for node in prompt.values():
+            inputs = node.get("inputs", {})
+            if isinstance(inputs.get("width"), int) and isinstance(inputs.get("height"), int):
+                return inputs["width"], inputs["height"]
+        return FALLBACK_SIZE
+
+    def render(self, prompt, node, profile):
+        width, height = self.output_size(prompt, profile)
+        batch = max((n["inputs"]["batch_size"] for n in prompt.values()
+                     if isinstance(n.get("inputs", {}).get("batch_size"), int)), default=1)
+        saved = node.get("class_type") == "SaveImage"
+        prefix = node.get("inputs", {}).get("filename_prefix", "ComfyUI") if saved else "ComfyUI_temp"
+        subfolder, _, prefix = prefix.rpartition("/")
+        images = []
+        for _ in range(batch):
+            image = {"filename": f"{prefix}_{next(self.image_counter):05}_.png", "subfolder": subfolder,
+                     "type": "output" if saved else "temp"}
+            self.images[(image["type"], subfolder, image["filename"])] = (width, height, bool(profile.get("noise")))
+            images.append(image)
+        return images
+
+    def image_bytes(self, kind, subfolder, filename):
+        stored = self.images.get((kind, subfolder, filename))
+        if stored is None or isinstance(stored, bytes):
+            return stored
+        if stored not in self.png_cache:
+            self.png_cache[stored] = make_png(*stored, rng=random.Random(0))
+        return self.png_cache[stored]
+
+    def describe(self):
+        uptime = time.time() - self.started_at
+        finished = self.stats["completed"] + self.stats["failed"] + self.stats["interrupted"]
+        return dict(self.stats, queue_remaining=self.queue_remaining(), uptime=round(uptime, 3),
+                    utilization=round(self.stats["busy_seconds"] / uptime, 4) if uptime else 0.0,
+                    mean_queue_wait=round(self.stats["queue_wait_seconds"] / finished, 4) if finished else None)
+
+
+def create_app(config=None):
+    """A Starlette app imitating ComfyUI's HTTP and websocket API, driven by `config` (see load_config)."""
+    sim = Simulator(config or load_config())
+
+    async def post_prompt(request):
+        body, status = await sim.submit(await request.json())
+        return JSONResponse(body, status_code=status)
+
+    async def get_prompt(request):
+        return JSONResponse({"exec_info": {"queue_remaining": sim.queue_remaining()}})
+
+    async def queue(request):
+        if request.method == "POST":
+            body = await request.json()
+            if body.get("clear"):
+                sim.delete({item[2].prompt_id for item in sim.pending})
+            if "delete" in body:
+                sim.delete(set(body["delete"]))
+            await sim.send_status()
+            return Response(status_code=200)
+        return JSONResponse({
+            "queue_running": [sim.running.queue_entry()] if sim.running else [],
+            # ComfyUI returns its heap as is, not sorted
+            "queue_pending": [item[2].queue_entry() for item in sim.pending],
+        })
+
+    async def interrupt(request):
+        body = await request.json() if await request.body() else {}
+        sim.interrupt(body.get("prompt_id"))
+        return Response(status_code=200)
+
+    async def history(request):
+        if request.method == "POST":
+            body = await request.json()
+            if body.get("clear"):
+                sim.history.clear()
+            for prompt_id in body.get("delete", []):
+                sim.history.pop(prompt_id, None)
+            return Response(status_code=200)
+        prompt_id = request.path_params.get("prompt_id")
+        if prompt_id is not None:
+            return JSONResponse({prompt_id: sim.history[prompt_id]} if prompt_id in sim.history else {})
+        max_items = int(request.query_params.get("max_items", 0)) or None
+        items = list(sim.history.items())[-max_items:] if max_items else list(sim.history.items())
+        return JSONResponse(dict(items))
+
+    async def view(request):
+        params = request.query_params
+        data = sim.image_bytes(params.get("type", "output"), params.get("subfolder", ""), params.get("filename", ""))
+        if data is None:
+            return Response(status_code=404)
+        return Response(data, media_type="image/png")
+
+    async def upload_image(request):
+        form = await request.form()
+        image = form["image"]
+        subfolder = form.get("subfolder", "")
+        sim.images[("input", subfolder, image.filename)] = await image.read()
+        return JSONResponse({"name": image.filename, "subfolder": subfolder, "type": "input"})
+
+    async def system_stats(request):
+        busy = sim.running is not None
+        return JSONResponse({
+            "system": {"os": "simulator", "comfyui_version": "simulated", "python_version": "", "embedded_python": False},
+            "devices": [{"name": "cuda:0 Simulated GPU", "type": "cuda", "index": 0, "vram_total": VRAM_TOTAL,
+                         "vram_free": VRAM_TOTAL // (4 if busy else 1), "torch_vram_total": VRAM_TOTAL,
+                         "torch_vram_free": VRAM_TOTAL // (4 if busy else 1)}],
+        })
+
+    async def simulator_stats(request):
+        return JSONResponse(sim.describe())
+
+    async def websocket_endpoint(websocket: WebSocket):
+        client_id = websocket.query_params.get("clientId") or uuid.uuid4().hex
+        await websocket.accept()
+        sim.clients.setdefault(client_id, set()).add(websocket)
+        await websocket.send_text(json.dumps({"type": "status", "data": {
+            "status": {"exec_info": {"queue_remaining": sim.queue_remaining()}}, "sid": client_id}}))
         try:
-            await client.send_text(json.dumps(msg))
-        except:
+            while True:
+                await websocket.receive_text()
+        except (WebSocketDisconnect, RuntimeError):
             pass
+        finally:
+            sim.forget(client_id, websocket)
 
-async def prompt(request):
-    data = await request.json()
-    prompt_id = str(uuid.uuid4())
-    print(f"Mock: Received prompt request. Generated ID: {prompt_id}")
-    
-    # We need to find the output node to mock the history correctly.
-    # But for now, let's just assume we return some dummy outputs.
-    # The MCP server looks for 'outputs' in history[prompt_id].
-    history[prompt_id] = {
-        "outputs": {
-            "9": { 
-                "images": [{"filename": "dummy.png", "subfolder": "", "type": "output"}]
-            }
-        }
-    }
-    
-    asyncio.create_task(notify_clients(prompt_id))
-    
-    return JSONResponse({"prompt_id": prompt_id})
-
-async def get_history(request):
-    prompt_id = request.path_params['prompt_id']
-    if prompt_id in history:
-        return JSONResponse({prompt_id: history[prompt_id]})
-    return JSONResponse({}, status_code=404)
-
-async def view(request):
-    # Minimal 1x1 transparent PNG
-    dummy_png = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\nIDATx\x9cc\x00\x01\x00\x00\x05\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82'
-    return Response(dummy_png, media_type="image/png")
-
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    clients.add(websocket)
-    print("Mock: Client connected to WebSocket")
-    try:
-        while True:
-            await websocket.receive_text()
-    except:
-        clients.remove(websocket)
-        print("Mock: Client disconnected from WebSocket")
-
-app = Starlette(debug=True, routes=[
-    Route('/prompt', prompt, methods=['POST']),
-    Route('/history/{prompt_id}', get_history, methods=['GET']),
-    Route('/view', view, methods=['GET']),
-    WebSocketRoute('/ws', websocket_endpoint),
-])
+    app = Starlette(routes=[
+        Route('/prompt', post_prompt, methods=['POST']),
+        Route('/prompt', get_prompt, methods=['GET']),
+        Route('/queue', queue, methods=['GET', 'POST']),
+        Route('/interrupt', interrupt, methods=['POST']),
+        Route('/history', history, methods=['GET', 'POST']),
+        Route('/history/{prompt_id}', history, methods=['GET']),
+        Route('/view', view, methods=['GET']),
+        Route('/upload/image', upload_image, methods=['POST']),
+        Route('/system_stats', system_stats, methods=['GET']),
+        Route('/simulator/stats', simulator_stats, methods=['GET']),
+        WebSocketRoute('/ws', websocket_endpoint),
+    ])
+    app.state.simulator = sim
+    return app
+
+
+app = create_app(load_config(os.environ.get("MOCK_COMFYUI_CONFIG")))
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8188)
+    parser = argparse.ArgumentParser(description="Simulated ComfyUI for offline tests and benchmarks")
+    parser.add_argument("port", type=int, nargs="?", default=8188)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--config", help="Simulator config: JSON file or inline JSON (default: MOCK_COMFYUI_CONFIG)")
+    args = parser.parse_args()
+    if args.config:
+        app = create_app(load_config(args.config))
+    print(f"Starting Mock Server on port {args.port}")
+    uvicorn.run(app, host=args.host, port=args.port)
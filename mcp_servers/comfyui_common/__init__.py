@@ -0,0 +1 @@
+"""Helpers shared by the comfyui and comfyui-dgspark MCP servers."""
@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Seconds per prompt assumed for a backend that has not finished one for us yet
+DEFAULT_SERVICE_TIME = 30.0
+# Weight of the latest render time in a backend's moving average
+SERVICE_TIME_ALPHA = 0.3
+
+
+class Backend:
+    """One ComfyUI instance, with the load and health the pool last saw."""
+
+    def __init__(self, address):
+        self.address = address
+        self.healthy = True
+        self.queue_running = 0
+        self.queue_pending = 0
+        self.submitted = 0  # prompts we queued since the last /queue poll
+        self.service_time = None  # moving average of our prompts' render time
+        self.completed = 0
+        self.failures = 0  # consecutive failed polls/submits
+        self.last_error = None
+        self.last_poll = None
+        self.devices = []
+
+    @property
+    def queue_length(self):
+        return self.queue_running + self.queue_pending + self.submitted
+
+    def expected_wait(self, jump_queue=False):
+        """
+        Seconds until a prompt queued now would be done; with `jump_queue`,
+        one queued ahead of the pending prompts.
+        """
+        ahead = self.queue_running if jump_queue else self.queue_length
+        return (ahead + 1) * (self.service_time or DEFAULT_SERVICE_TIME)
+
+    def describe(self):
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "queue_running": self.queue_running,
+            "queue_pending": self.queue_pending + self.submitted,
+            "service_time": round(self.service_time, 2) if self.service_time else None,
+            "expected_wait": round(self.expected_wait(), 1),
+            "completed": self.completed,
+            "devices": self.devices,
+            "last_error": self.last_error,
+            "last_poll": self.last_poll,
+        }
+
+
+class BackendPool:
+    """
+    Routes prompts across several ComfyUI backends. A background thread polls
+    each one's /queue and /system_stats; a prompt goes to the healthy backend
+    with the shortest expected wait (queue length times its average render
+    time). Backends that fail `unhealthy_after` polls in a row, or refuse a
+    prompt, leave the rotation until a poll succeeds again.
+    """
+
+    def __init__(self, addresses, fetch_json, poll_interval=10.0, unhealthy_after=2):
+        """fetch_json: (address, path) -> parsed JSON response; raises on failure."""
+        if not addresses:
+            raise ValueError("at least one ComfyUI backend address is required")
+        self.backends = [Backend(address) for address in dict.fromkeys(addresses)]
+        self.fetch_json = fetch_json
+        self.poll_interval = poll_interval
+        self.unhealthy_after = unhealthy_after
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def get(self, address):
+        for backend in self.backends:
+            if backend.address == address:
+                return backend
+        raise KeyError(f"Unknown ComfyUI backend '{address}'")
+
+    def start(self):
+        """Starts polling. With several backends, the first poll finishes before this returns."""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name="comfy-backend-poll", daemon=True)
+        if len(self.backends) > 1:
+            self.poll_all()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            self.poll_all()
+
+    def poll_all(self):
+        with ThreadPoolExecutor(max_workers=len(self.backends)) as executor:
+            list(executor.map(self.poll, self.backends))
+
+    def poll(self, backend):
+        try:
+            queue = self.fetch_json(backend.address, "/queue")
+            stats = self.fetch_json(backend.address, "/system_stats")
+        except Exception as e:
+            self.report_failure(backend, e)
+            return
+        with self._lock:
+            backend.queue_running = len(queue.get("queue_running", []))
+            backend.queue_pending = len(queue.get("queue_pending", []))
+            backend.submitted = 0
+            backend.devices = [{"name": d.get("name"), "vram_total": d.get("vram_total"), "vram_free": d.get("vram_free")}
+                               for d in stats.get("devices", [])]
+            backend.failures = 0
+            backend.healthy = True
+            backend.last_error = None
+            backend.last_poll = time.time()
+
+    def report_failure(self, backend, error, fatal=False):
+        """A failed poll or request. `fatal` (e.g. a refused prompt) takes the backend out at once."""
+        with self._lock:
+            backend.failures += 1
+            backend.last_error = f"{type(error).__name__}: {error}"
+            if fatal or backend.failures >= self.unhealthy_after:
+                backend.healthy = False
+
+    def candidates(self, jump_queue=False):
+        """
+        Backends to try, best first: healthy ones by expected wait, then the
+        unhealthy ones (a request may still get through when all are down).
+        `jump_queue`: the prompt goes ahead of pending ones (high priority).
+        """
+        self.start()
+        with self._lock:
+            healthy = sorted((b for b in self.backends if b.healthy),
+                             key=lambda b: (b.expected_wait(jump_queue), b.queue_length))
+            unhealthy = sorted((b for b in self.backends if not b.healthy), key=lambda b: b.failures)
+        return healthy + unhealthy
+
+    def submitted(self, backend):
+        with self._lock:
+            backend.submitted += 1
+
+    def finished(self, address, seconds):
+        """Records how long a prompt took to render on `address`."""
+        backend = self.get(address)
+        with self._lock:
+            backend.completed += 1
+            if seconds is not None and seconds > 0:
+                if backend.service_time is None:
+                    backend.service_time = seconds
+                else:
+                    backend.service_time += SERVICE_TIME_ALPHA * (seconds - backend.service_time)
+
+    def describe(self):
+        with self._lock:
+            return [backend.describe() for backend in self.backends]
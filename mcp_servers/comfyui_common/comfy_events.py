@@ -0,0 +1,311 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import websocket
+
+# Events for prompts nobody tracks yet (queue_prompt has not returned) are
+# kept for this many prompts, so a fast prompt cannot finish unseen
+ORPHAN_PROMPTS = 256
+FINISHED = ("success", "error", "interrupted", "cancelled")
+
+
+class PromptTracker:
+    """Live state of one queued prompt, fed by the backend's event stream."""
+
+    def __init__(self, prompt_id):
+        self.prompt_id = prompt_id
+        self.status = "queued"
+        self.node = None
+        self.progress = None  # (value, max) of the running node
+        self.outputs = {}
+        self.cached_nodes = []
+        self.error = None
+        self.preview = None  # latest binary preview frame
+        self.resynced = False  # completion was recovered from /history, events may be missing
+        self.timed_out = False  # the caller's deadline passed and the prompt was cancelled
+        self.node_times = {}  # node id -> seconds spent executing it
+        self._node_started = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = Future()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def error_message(self):
+        if not self.error:
+            return self.status
+        node = self.error.get("node_type") or self.error.get("node_id")
+        message = (self.error.get("exception_message") or self.error.get("exception_type")
+                   or ("unknown error" if self.status == "error" else self.status))
+        return f"{message.strip()} (node {node})" if node else message.strip()
+
+    def _finish(self, status, error=None):
+        # The reader thread and a waiter's /history check can race here
+        with self._lock:
+            if self.finished:
+                return
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self._end_node(self.finished_at)
+        self.done.set_result(self)
+
+    def _end_node(self, now):
+        if self.node is not None and self._node_started is not None:
+            self.node_times[self.node] = round(self.node_times.get(self.node, 0) + now - self._node_started, 3)
+        self._node_started = None
+
+    def handle(self, kind, data):
+        if self.finished:
+            return  # e.g. a cancelled prompt ComfyUI started anyway
+        if kind == "execution_start":
+            self.status = "running"
+            self.started_at = time.time()
+        elif kind == "execution_cached":
+            self.cached_nodes.extend(data.get("nodes", []))
+        elif kind == "executing":
+            if data.get("node") is None:
+                self._finish("success")
+            else:
+                now = time.time()
+                if self.status == "queued":
+                    self.status = "running"
+                    self.started_at = now
+                self._end_node(now)
+                self.node = data["node"]
+                self._node_started = now
+                self.progress = None
+        elif kind == "progress":
+            self.node = data.get("node", self.node)
+            self.progress = (data.get("value"), data.get("max"))
+        elif kind == "executed":
+            self.outputs[data.get("node")] = data.get("output") or {}
+        elif kind == "execution_success":
+            self._finish("success")
+        elif kind == "execution_error":
+            self._finish("error", data)
+        elif kind == "execution_interrupted":
+            self._finish("interrupted", data)
+
+    def apply_history(self, entry):
+        """Completes the tracker from a /history entry (events were missed)."""
+        self.resynced = True
+        self.outputs = entry.get("outputs", {}) or self.outputs
+        status = entry.get("status", {})
+        if status.get("status_str") == "error":
+            error = next((m[1] for m in status.get("messages", []) if m[0] == "execution_error"), {})
+            self._finish("error", error)
+        else:
+            self._finish("success")
+
+    def cancel(self):
+        """Finishes a prompt that was deleted from the queue; ComfyUI sends no event for it."""
+        self._finish("cancelled")
+
+    def wait(self, timeout=None):
+        try:
+            return self.done.result(timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"prompt {self.prompt_id} still {self.status} after {timeout}s")
+
+
+class ComfyEventStream:
+    """
+    One long-lived websocket to a ComfyUI backend. A background reader
+    dispatches each prompt's events to its PromptTracker and reconnects
+    with backoff when the connection drops; prompts that finished while it
+    was down are completed from /history.
+
+    All prompts must be queued with this stream's client_id, since ComfyUI
+    only sends execution events to the client that queued the prompt.
+    """
+
+    def __init__(self, address, get_history=None, client_id=None, connect_timeout=10.0,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, poll_interval=15.0):
+        """
+        get_history: prompt_id -> /history/{prompt_id} response. Used to
+        recover completions missed while disconnected, and as a periodic
+        check (every `poll_interval` seconds) while waiting.
+        """
+        self.address = address
+        self.client_id = client_id or str(uuid.uuid4())
+        self.get_history = get_history
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.poll_interval = poll_interval
+        self.connects = 0
+        self.messages = 0
+        self.last_error = None
+        self.queue_remaining = None
+        self._trackers = {}
+        self._orphans = OrderedDict()
+        self._running_prompt = None
+        self._lock = threading.Lock()
+        self._connected = threading.Event()
+        self._stopped = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    @property
+    def reconnects(self):
+        return max(0, self.connects - 1)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"comfy-ws-{self.address}", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        ws = self._ws
+        if ws is not None:
+            ws.abort()
+
+    def wait_connected(self, timeout=None):
+        self.start()
+        return self._connected.wait(timeout)
+
+    def track(self, prompt_id):
+        """Tracker for a prompt queued with this stream's client_id."""
+        with self._lock:
+            tracker = self._trackers.get(prompt_id)
+            if tracker is None:
+                tracker = self._trackers[prompt_id] = PromptTracker(prompt_id)
+                for kind, data in self._orphans.pop(prompt_id, []):
+                    tracker.handle(kind, data)
+                if tracker.finished:
+                    del self._trackers[prompt_id]
+        tracker.done.add_done_callback(lambda _: self._forget(prompt_id))
+        return tracker
+
+    def wait(self, tracker, timeout=None):
+        """
+        Waits for `tracker` to finish, checking /history every poll_interval
+        in case a completion event was lost. Raises TimeoutError.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            step = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+            try:
+                return tracker.wait(step)
+            except TimeoutError:
+                if remaining is not None and remaining <= step:
+                    raise
+            self._resync(tracker)
+
+    def _forget(self, prompt_id):
+        with self._lock:
+            self._trackers.pop(prompt_id, None)
+
+    def _resync(self, tracker):
+        if self.get_history is None or tracker.finished:
+            return
+        try:
+            entry = self.get_history(tracker.prompt_id).get(tracker.prompt_id)
+        except Exception:
+            return
+        if entry:  # prompts only enter the history once they stop executing
+            tracker.apply_history(entry)
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stopped.is_set():
+            try:
+                ws = websocket.create_connection(f"ws://{self.address}/ws?clientId={self.client_id}",
+                                                 timeout=self.connect_timeout)
+                ws.settimeout(None)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._stopped.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            self._ws = ws
+            self.connects += 1
+            delay = self.reconnect_delay
+            self._connected.set()
+            if self.connects > 1:
+                # Anything may have finished while we were away
+                with self._lock:
+                    pending = list(self._trackers.values())
+                for tracker in pending:
+                    self._resync(tracker)
+            try:
+                while not self._stopped.is_set():
+                    message = ws.recv()
+                    if not message and not self._stopped.is_set():
+                        raise ConnectionError("connection closed by ComfyUI")
+                    self._dispatch(message)
+            except Exception as e:
+                if not self._stopped.is_set():
+                    self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                self._connected.clear()
+                self._ws = None
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+
+    def _dispatch(self, message):
+        self.messages += 1
+        if isinstance(message, bytes):
+            # Preview frames carry no prompt id; they belong to the running prompt
+            with self._lock:
+                tracker = self._trackers.get(self._running_prompt)
+            if tracker is not None:
+                tracker.preview = message
+            return
+        try:
+            event = json.loads(message)
+        except ValueError:
+            return
+        kind, data = event.get("type"), event.get("data") or {}
+        if kind == "status":
+            self.queue_remaining = data.get("status", {}).get("exec_info", {}).get("queue_remaining")
+            return
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return
+        with self._lock:
+            if kind in ("execution_start", "executing") and data.get("node", True) is not None:
+                self._running_prompt = prompt_id
+            tracker = self._trackers.get(prompt_id)
+            if tracker is None:
+                self._orphans.setdefault(prompt_id, []).append((kind, data))
+                self._orphans.move_to_end(prompt_id)
+                while len(self._orphans) > ORPHAN_PROMPTS:
+                    self._orphans.popitem(last=False)
+                return
+        tracker.handle(kind, data)
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def event_stream(address, get_history=None, **kwargs):
+    """The shared, started ComfyEventStream for a backend address."""
+    with _streams_lock:
+        stream = _streams.get(address)
+        if stream is None:
+            stream = _streams[address] = ComfyEventStream(address, get_history, **kwargs)
+    return stream.start()
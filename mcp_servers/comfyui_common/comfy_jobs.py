@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future
+from concurrent.futures import wait as wait_futures
+
+# Finished jobs stay queryable until this many newer ones have finished
+FINISHED_JOBS = 512
+# ComfyUI runs pending prompts lowest number first. Each priority level is
+# this far apart, more than any timestamp, so all of a level runs first
+PRIORITY_SPAN = 1e12
+
+
+def queue_position(queue, prompt_id):
+    """
+    Where `prompt_id` is in a /queue response: 0 while it runs, 1 if it runs
+    next, and so on. None if ComfyUI has no such prompt queued.
+    """
+    for item in queue.get("queue_running", []):
+        if item[1] == prompt_id:
+            return 0
+    # Pending prompts run in order of their number, not list order
+    pending = sorted(queue.get("queue_pending", []), key=lambda item: item[0])
+    for position, item in enumerate(pending, 1):
+        if item[1] == prompt_id:
+            return position
+    return None
+
+
+def queue_order(priority, sequence=None):
+    """
+    Extra /prompt fields that place a prompt by `priority`: higher runs
+    sooner, 0 is ComfyUI's own FIFO, below 0 waits for everything else.
+    Prompts of one level run in `sequence` order (default: submit time).
+    `front` covers ComfyUI versions that ignore `number`.
+    """
+    if not priority:
+        return {}
+    fields = {"number": -priority * PRIORITY_SPAN + (time.time() if sequence is None else sequence)}
+    if priority > 0:
+        fields["front"] = True
+    return fields
+
+
+def prompt_state(tracker, queue=None):
+    """
+    Where a prompt is: its status, queue position (from a /queue response)
+    or running node and percent done, elapsed seconds and per-node timings.
+    """
+    info = {"status": "timeout" if tracker.timed_out else tracker.status}
+    if tracker.status == "queued" and queue is not None:
+        position = queue_position(queue, tracker.prompt_id)
+        if position == 0:
+            info["status"] = "running"  # started, the websocket has not told us yet
+        elif position is not None:
+            info["queue_position"] = position
+    if tracker.status == "running":
+        info["node"] = tracker.node
+        if tracker.progress and tracker.progress[1]:
+            value, maximum = tracker.progress
+            info["percent"] = round(100 * value / maximum)
+    end = tracker.finished_at or time.time()
+    info["elapsed"] = round(end - tracker.queued_at, 2)
+    if tracker.node_times:
+        info["node_times"] = dict(tracker.node_times)
+    return info
+
+
+def format_state(state):
+    """prompt_state() as one line for progress messages."""
+    if "queue_position" in state:
+        text = f"queued at position {state['queue_position']}"
+    elif state.get("node") is not None:
+        text = f"running node {state['node']}"
+        if "percent" in state:
+            text += f" ({state['percent']}%)"
+    else:
+        text = state["status"]
+    text += f", {state['elapsed']:.0f}s elapsed"
+    if state.get("node_times"):
+        text += "; nodes took " + ", ".join(f"{node}: {seconds:.1f}s" for node, seconds in state["node_times"].items())
+    return text
+
+
+class Job:
+    """
+    A prompt queued by submit_image. The job id is the ComfyUI prompt id;
+    `future` resolves to the tool result text once the images are saved.
+    `address` is the backend the prompt was queued on (None if it needed no
+    rendering).
+    """
+
+    def __init__(self, tracker, workflow_name, output_path=None, address=None, job_id=None):
+        """job_id: defaults to the prompt id; jobs sharing a prompt need their own."""
+        self._job_id = job_id
+        self.tracker = tracker
+        self.workflow_name = workflow_name
+        self.output_path = output_path
+        self.address = address
+        self.future = Future()
+
+    @property
+    def job_id(self):
+        return self._job_id or self.tracker.prompt_id
+
+    @property
+    def status(self):
+        if self.tracker.timed_out:
+            return "timeout"
+        status = self.tracker.status
+        if status == "success" and not self.future.done():
+            return "saving"
+        return status
+
+    def describe(self, queue=None):
+        """Status summary for the job tools. `queue`: a /queue response, for the queue position."""
+        info = {"job_id": self.job_id, "workflow": self.workflow_name}
+        if self.address:
+            info["backend"] = self.address
+        info.update(prompt_state(self.tracker, queue))
+        if info["status"] == self.tracker.status:
+            info["status"] = self.status
+        if self.future.done():
+            info["result"] = self.future.result()
+        return info
+
+
+class JobTable:
+    """Submitted jobs by id. The oldest finished jobs are dropped past `keep`."""
+
+    def __init__(self, keep=FINISHED_JOBS):
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def add(self, job):
+        with self._lock:
+            self._jobs[job.job_id] = job
+            finished = [job_id for job_id, j in self._jobs.items() if j.future.done()]
+            for job_id in finished[:max(0, len(finished) - self.keep)]:
+                del self._jobs[job_id]
+        return job
+
+    def get(self, job_id):
+        """Raises KeyError for ids that were never submitted or have been dropped."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job id '{job_id}'")
+        return job
+
+    def wait(self, jobs, timeout=None, return_when="all"):
+        """
+        Waits until all (or, with return_when="any", at least one) of `jobs`
+        are done or `timeout` seconds pass. Returns (done, pending) lists.
+        """
+        futures = {job.future: job for job in jobs}
+        done, _ = wait_futures(futures, timeout, FIRST_COMPLETED if return_when == "any" else ALL_COMPLETED)
+        return ([job for job in jobs if job.future in done],
+                [job for job in jobs if job.future not in done])
+
+
+class Flight:
+    """One prompt in flight and the requests waiting on it."""
+
+    def __init__(self, key):
+        self.key = key
+        self.waiters = 1
+        self.tracker = None
+        self.stream = None
+        self.error = None
+        self._ready = threading.Event()
+
+    def joinable(self):
+        if self.error is not None:
+            return False
+        return self.tracker is None or not self.tracker.finished or self.tracker.status == "success"
+
+    def wait(self):
+        """(tracker, stream) once the first request has queued the prompt; raises its error if that failed."""
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self.tracker, self.stream
+
+
+class InFlight:
+    """
+    Coalesces identical requests: the first one with a key (a hash of the
+    whole workflow: prompts, seed, settings) queues the prompt, the ones
+    arriving while it is in flight wait on the same tracker instead of
+    rendering it again. Each participant calls leave() when done; the entry
+    goes away with the last one.
+    """
+
+    def __init__(self):
+        self._by_key = {}
+        self._by_prompt = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """
+        Returns (flight, first). The first caller queues the prompt and
+        reports it with started() or failed(); the others call flight.wait().
+        """
+        with self._lock:
+            flight = self._by_key.get(key)
+            if flight is not None and flight.joinable():
+                flight.waiters += 1
+                return flight, False
+            flight = self._by_key[key] = Flight(key)
+            return flight, True
+
+    def started(self, flight, tracker, stream):
+        with self._lock:
+            flight.tracker, flight.stream = tracker, stream
+            self._by_prompt[tracker.prompt_id] = flight
+        flight._ready.set()
+
+    def failed(self, flight, error):
+        with self._lock:
+            flight.error = error
+            if self._by_key.get(flight.key) is flight:
+                del self._by_key[flight.key]
+        flight._ready.set()
+
+    def waiters(self, prompt_id):
+        """How many requests wait on `prompt_id`: 0 if it was not coalesced."""
+        with self._lock:
+            flight = self._by_prompt.get(prompt_id)
+            return flight.waiters if flight is not None else 0
+
+    def leave(self, prompt_id):
+        """A request is done with `prompt_id`. Returns how many still wait on it."""
+        with self._lock:
+            flight = self._by_prompt.get(prompt_id)
+            if flight is None:
+                return 0
+            flight.waiters -= 1
+            if flight.waiters <= 0:
+                del self._by_prompt[prompt_id]
+                if self._by_key.get(flight.key) is flight:
+                    del self._by_key[flight.key]
+            return flight.waiters
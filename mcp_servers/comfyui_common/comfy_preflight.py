@@ -0,0 +1,160 @@
+import copy
+import struct
+import threading
+import time
+import zlib
+
+# /object_info answers older than this are fetched again before a workflow is rejected
+OBJECT_INFO_MAX_AGE = 60.0
+# Warm-up renders at this size with this many sampling steps
+WARMUP_SIZE = 64
+WARMUP_STEPS = 1
+SIZE_INPUTS = ("width", "height")
+STEP_INPUTS = ("steps",)
+BATCH_INPUTS = ("batch_size",)
+
+
+def _is_link(value):
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def _choices(spec):
+    """
+    The allowed values of a combo input spec from /object_info, or None if it
+    is not a combo. Old servers send [[choices], {...}], newer ones
+    ["COMBO", {"options": [choices]}]. Image upload combos (LoadImage) list
+    the input folder as it was when fetched, so they are not checked.
+    """
+    if not isinstance(spec, list) or not spec:
+        return None
+    options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+    if options.get("image_upload"):
+        return None
+    if isinstance(spec[0], list):
+        return spec[0]
+    if spec[0] == "COMBO" and isinstance(options.get("options"), list):
+        return options["options"]
+    return None
+
+
+def find_problems(object_info, workflow):
+    """
+    What stops `workflow` (API format) from running on a ComfyUI whose
+    /object_info is `object_info`: node types it does not have, and models
+    or other choices it does not offer. Returns a list of messages.
+    """
+    problems = []
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict):
+            continue
+        class_type = node.get("class_type")
+        info = object_info.get(class_type)
+        if info is None:
+            problems.append(f"node type '{class_type}' is not installed (node {node_id})")
+            continue
+        specs = {}
+        for group in ("required", "optional"):
+            specs.update(info.get("input", {}).get(group) or {})
+        for key, value in node.get("inputs", {}).items():
+            if _is_link(value) or not isinstance(value, str):
+                continue
+            choices = _choices(specs.get(key))
+            if choices is not None and value not in choices:
+                problems.append(f"'{value}' is not available for {class_type}.{key} (node {node_id})")
+    return problems
+
+
+class ObjectInfoCache:
+    """
+    /object_info of each backend, fetched once and kept. A workflow that
+    looks invalid against an answer older than `max_age` seconds is checked
+    again against a fresh one, so models installed since are picked up.
+    """
+
+    def __init__(self, fetch_json, max_age=OBJECT_INFO_MAX_AGE):
+        """fetch_json: (address, path) -> parsed JSON response; raises on failure."""
+        self.fetch_json = fetch_json
+        self.max_age = max_age
+        self._info = {}  # address -> (fetched at, object_info)
+        self._failed = {}  # address -> when fetching last failed
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+
+    def get(self, address, refresh=False):
+        """The backend's /object_info, or None if it cannot be fetched."""
+        with self._lock:
+            cached = self._info.get(address)
+            fetch_lock = self._fetch_locks.setdefault(address, threading.Lock())
+        if cached is not None and not refresh:
+            return cached[1]
+        with fetch_lock:
+            with self._lock:
+                newer = self._info.get(address)
+                failed = self._failed.get(address)
+            if newer is not None and newer is not cached:
+                return newer[1]  # another thread fetched it meanwhile
+            if not refresh and failed is not None and time.time() - failed < self.max_age:
+                return None  # do not hold every request up on a backend that just failed
+            try:
+                info = self.fetch_json(address, "/object_info")
+            except Exception:
+                with self._lock:
+                    self._failed[address] = time.time()
+                return cached[1] if cached else None
+            with self._lock:
+                self._info[address] = (time.time(), info)
+                self._failed.pop(address, None)
+            return info
+
+    def validate(self, address, workflow):
+        """
+        Problems running `workflow` on `address` (see find_problems). Empty
+        when the backend's /object_info is unavailable: we cannot tell.
+        """
+        with self._lock:
+            cached = self._info.get(address)
+        info = self.get(address)
+        if info is None:
+            return []
+        problems = find_problems(info, workflow)
+        if problems and cached is not None and time.time() - cached[0] > self.max_age:
+            info = self.get(address, refresh=True)
+            problems = find_problems(info, workflow) if info is not None else []
+        return problems
+
+
+def warmup_workflow(workflow, output_nodes=(), image=None, image_slots=()):
+    """
+    A copy of `workflow` that loads the same models but does as little work
+    as possible: WARMUP_SIZE images, WARMUP_STEPS sampling steps, batches of
+    one, and previews instead of saved outputs. `image` goes into the
+    LoadImage `image_slots`.
+    """
+    workflow = copy.deepcopy(workflow)
+    for node_id, node in workflow.items():
+        inputs = node.get("inputs", {})
+        for key, value in inputs.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if key in SIZE_INPUTS:
+                inputs[key] = min(value, WARMUP_SIZE)
+            elif key in STEP_INPUTS:
+                inputs[key] = min(value, WARMUP_STEPS)
+            elif key in BATCH_INPUTS:
+                inputs[key] = 1
+        if node_id in output_nodes:
+            node["class_type"] = "PreviewImage"
+            inputs.pop("filename_prefix", None)
+    for node_id, key in image_slots:
+        workflow[node_id]["inputs"][key] = image
+    return workflow
+
+
+def blank_png(width=WARMUP_SIZE, height=WARMUP_SIZE):
+    """A black RGB PNG, the input image for warming up image-to-image workflows."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + b"\x00" * 3 * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
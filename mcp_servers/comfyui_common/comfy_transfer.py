@@ -0,0 +1,289 @@
+import hashlib
+import http.client
+import json
+import os
+import queue
+import shutil
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1 << 20
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+# A keep-alive connection the server closed while idle fails on first use
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                           ConnectionResetError, BrokenPipeError)
+# Subfolder of ComfyUI's input directory that uploaded images go to
+UPLOAD_SUBFOLDER = "mcp"
+
+
+def is_loopback(address):
+    return address.rpartition(":")[0].strip("[]") in LOOPBACK_HOSTS
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one host, reused across requests."""
+
+    def __init__(self, address, timeout=60.0):
+        host, _, port = address.rpartition(":")
+        self.host = host.strip("[]")
+        self.port = int(port)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Sends a request and returns (connection, response). Once the body is
+        read, hand the connection back with release(); close it on errors.
+        """
+        headers = headers or {}
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+        try:
+            conn.request(method, path, body, headers)
+            return conn, conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+        # Retry once on a fresh connection
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body, headers)
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+
+    def release(self, conn, response):
+        if response.will_close:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class OutputTransfer:
+    """
+    Saves ComfyUI output images to local paths. When ComfyUI writes to a
+    directory on this machine the file is hardlinked (or copied if that
+    fails); otherwise /view is streamed to disk in chunks, several images at
+    a time over pooled keep-alive connections.
+    """
+
+    def __init__(self, address, output_dir=None, workers=4, chunk_size=CHUNK_SIZE, timeout=60.0):
+        """
+        output_dir: ComfyUI's output directory if ComfyUI runs on this machine,
+        else None. Its siblings (temp, input) serve the other image types.
+        """
+        self.address = address
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size
+        self.pool = ConnectionPool(address, timeout)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="comfy-transfer")
+        self._lock = threading.Lock()
+        self.counts = {"hardlink": 0, "copy": 0, "download": 0}
+
+    def local_file(self, image, since=None):
+        """
+        The image's file in the local ComfyUI directory, or None. With `since`
+        (a timestamp), files older than that are ignored: they are left over
+        from another run, not the image ComfyUI just returned. Images with a
+        `path` (e.g. from the image cache) are already local.
+        """
+        if image.get("path"):
+            return image["path"]
+        if not self.output_dir:
+            return None
+        folder_type = image.get("type") or "output"
+        base = self.output_dir if folder_type == "output" else os.path.join(os.path.dirname(self.output_dir), folder_type)
+        base = os.path.realpath(base)
+        path = os.path.realpath(os.path.join(base, image.get("subfolder") or "", image["filename"]))
+        if os.path.commonpath([base, path]) != base:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if since is not None and stat.st_mtime < since - 1:
+            return None
+        return path
+
+    def save(self, image, dest, since=None):
+        """Saves one image to `dest`. Returns how: 'hardlink', 'copy' or 'download'."""
+        source = self.local_file(image, since)
+        if source is not None:
+            try:
+                # Never hardlink a cache blob: it is read-only and must not change with `dest`
+                how = self._link(source, dest, hardlink=not image.get("path"))
+            except OSError:
+                how = None  # unreadable locally after all; ask ComfyUI
+            if how is not None:
+                return self._count(how)
+        self._download(image, dest)
+        return self._count("download")
+
+    def save_all(self, items, since=None):
+        """
+        Saves (image, dest) pairs in parallel. Returns one (how, error) pair
+        per item, in order; error is None on success.
+        """
+        futures = [self._executor.submit(self.save, image, dest, since) for image, dest in items]
+        results = []
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def _count(self, how):
+        with self._lock:
+            self.counts[how] += 1
+        return how
+
+    def _link(self, source, dest, hardlink=True):
+        partial = dest + ".part"
+        if os.path.lexists(partial):
+            # Left by a crash; may be a link to a read-only cache blob, never write through it
+            os.remove(partial)
+        how = "copy"
+        if hardlink:
+            try:
+                os.link(source, partial)
+                how = "hardlink"
+            except OSError:
+                pass  # Other filesystem, or links not supported
+        if how == "copy":
+            shutil.copyfile(source, partial)
+        os.replace(partial, dest)
+        return how
+
+    def _download(self, image, dest):
+        query = urllib.parse.urlencode({"filename": image["filename"], "subfolder": image.get("subfolder") or "",
+                                        "type": image.get("type") or "output"})
+        conn, response = self.pool.request("GET", f"/view?{query}")
+        partial = dest + ".part"
+        try:
+            if response.status != 200:
+                body = response.read().decode("utf-8", errors="replace").strip()
+                raise IOError(f"HTTP {response.status}: {response.reason} {body}".strip())
+            with open(partial, "wb") as f:
+                while True:
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            os.replace(partial, dest)
+        except BaseException:
+            conn.close()
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        self.pool.release(conn, response)
+
+
+def input_name(path):
+    """
+    The name an input image is uploaded under: its content hash, so the same
+    image is stored once however often (and from wherever) it is used.
+    Returns the value for a LoadImage node's `image` input.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    extension = os.path.splitext(path)[1].lower() or ".png"
+    return f"{UPLOAD_SUBFOLDER}/{digest.hexdigest()}{extension}"
+
+
+class InputUpload:
+    """
+    Puts input images into one ComfyUI's input directory under their
+    input_name(). Each name is sent once per server run: hardlinked (or
+    copied) when ComfyUI's input directory is on this machine, else posted
+    to /upload/image.
+    """
+
+    def __init__(self, pool, input_dir=None):
+        """pool: ConnectionPool to the ComfyUI. input_dir: its input directory if local, else None."""
+        self.pool = pool
+        self.input_dir = input_dir
+        self._present = set()
+        self._lock = threading.Lock()
+        self._name_locks = {}
+        self.counts = {"hardlink": 0, "copy": 0, "upload": 0, "reused": 0}
+
+    def ensure(self, path, name):
+        """Makes `path` available to LoadImage as `name` (from input_name()). Returns how."""
+        with self._lock:
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+        with name_lock:
+            if name in self._present:
+                how = "reused"
+            else:
+                how = self._link(path, name) if self.input_dir and os.path.isdir(self.input_dir) else None
+                if how is None:
+                    self._upload(path, name)
+                    how = "upload"
+                self._present.add(name)
+        with self._lock:
+            self.counts[how] += 1
+        return how
+
+    def forget(self, names):
+        """Sends `names` again next time, e.g. after ComfyUI rejected a prompt using them."""
+        with self._lock:
+            self._present.difference_update(names)
+
+    def _link(self, path, name):
+        dest = os.path.join(self.input_dir, *name.split("/"))
+        try:
+            if os.path.exists(dest):
+                return "reused"
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            partial = f"{dest}.{uuid.uuid4().hex}.part"
+            try:
+                os.link(path, partial)
+                how = "hardlink"
+            except OSError:
+                shutil.copyfile(path, partial)
+                how = "copy"
+            os.replace(partial, dest)
+            return how
+        except OSError:
+            return None  # not writable from here; upload instead
+
+    def _upload(self, path, name):
+        subfolder, _, filename = name.rpartition("/")
+        boundary = uuid.uuid4().hex
+        with open(path, "rb") as f:
+            content = f.read()
+        fields = [f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode()
+                  for key, value in (("type", "input"), ("subfolder", subfolder), ("overwrite", "true"))]
+        body = b"".join(fields) + (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + f"\r\n--{boundary}--\r\n".encode())
+        conn, response = self.pool.request("POST", "/upload/image", body,
+                                           {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        try:
+            answer = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        self.pool.release(conn, response)
+        if response.status != 200:
+            raise IOError(f"HTTP {response.status}: {response.reason} {answer.decode('utf-8', errors='replace')}".strip())
+        stored = json.loads(answer)
+        if stored.get("name") != filename:
+            # ComfyUI renames on a clash only without overwrite; should not happen
+            raise IOError(f"ComfyUI stored the upload as '{stored.get('name')}' instead of '{filename}'")
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+DEFAULT_SIZE_LIMIT = 2 * 1024 ** 3
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Images of finished generations, keyed by the rendered workflow: the
+    template with its prompts, seed and every other input filled in. Each
+    file is stored once per content hash under blobs/ (read-only, since hits
+    are hardlinked to the caller's path) and indexed in SQLite, so several
+    server processes can share the cache. Once the blobs grow past
+    `size_limit` bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory, size_limit=DEFAULT_SIZE_LIMIT):
+        self.directory = directory
+        self.size_limit = size_limit
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, images TEXT NOT NULL, last_used REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, path TEXT NOT NULL,
+                                              size INTEGER NOT NULL, refs INTEGER NOT NULL);
+        """)
+
+    @staticmethod
+    def make_key(workflow):
+        payload = json.dumps(workflow, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _blob_path(self, digest, filename):
+        return os.path.join("blobs", digest[:2], digest + os.path.splitext(filename)[1])
+
+    def get(self, key):
+        """
+        The cached images for `key` as ComfyUI image dicts whose `path` is
+        the stored file, or None on a miss.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT images FROM entries WHERE key = ?", (key,)).fetchone()
+            images = json.loads(row[0]) if row else []
+            blobs = {digest: (path, size) for digest, path, size in self._db.execute(
+                f"SELECT digest, path, size FROM blobs WHERE digest IN ({','.join('?' * len(images))})",
+                [image["digest"] for image in images])}
+            result = []
+            for image in images:
+                path, size = blobs.get(image["digest"], (None, None))
+                path = path and os.path.join(self.directory, path)
+                if path is None or not os.path.isfile(path) or os.path.getsize(path) != size:
+                    # Blob lost or changed behind our back: the entry is no good
+                    result = None
+                    break
+                result.append({"filename": image["filename"], "subfolder": "", "type": "output", "path": path})
+            if not result:
+                if row:
+                    self._remove([key])
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return result
+
+    def put(self, key, files):
+        """Stores a generation's images. `files`: (local path, ComfyUI filename) pairs."""
+        images = []
+        for source, filename in files:
+            digest = file_digest(source)
+            path = self._blob_path(digest, filename)
+            blob = os.path.join(self.directory, path)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                partial = f"{blob}.{os.getpid()}.{threading.get_ident()}.part"
+                shutil.copyfile(source, partial)
+                os.chmod(partial, 0o444)
+                os.replace(partial, blob)
+            images.append({"filename": filename, "digest": digest, "path": path, "size": os.path.getsize(blob)})
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                doomed = self._remove([key])
+                for image in images:
+                    self._db.execute("INSERT INTO blobs (digest, path, size, refs) VALUES (?, ?, ?, 1) "
+                                     "ON CONFLICT(digest) DO UPDATE SET refs = refs + 1",
+                                     (image["digest"], image["path"], image["size"]))
+                self._db.execute("INSERT INTO entries (key, images, last_used) VALUES (?, ?, ?)",
+                                 (key, json.dumps([{"filename": i["filename"], "digest": i["digest"]} for i in images]),
+                                  time.time()))
+                doomed += self._evict()
+                # A replaced entry's blob may be part of the new one too
+                live = {path for (path,) in self._db.execute("SELECT path FROM blobs")}
+                doomed = [path for path in doomed if path not in live]
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._delete_files(doomed)
+
+    def _remove(self, keys):
+        """Drops entries and the blobs only they referenced. Returns the blob files to delete."""
+        doomed = []
+        for key in keys:
+            row = self._db.execute("SELECT images FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            for image in json.loads(row[0]):
+                self._db.execute("UPDATE blobs SET refs = refs - 1 WHERE digest = ?", (image["digest"],))
+            doomed.extend(path for (path,) in self._db.execute("SELECT path FROM blobs WHERE refs <= 0"))
+            self._db.execute("DELETE FROM blobs WHERE refs <= 0")
+        if self._db.in_transaction:
+            return doomed
+        self._delete_files(doomed)
+        return []
+
+    def _evict(self):
+        doomed = []
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        while total > self.size_limit:
+            row = self._db.execute("SELECT key FROM entries ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            doomed.extend(self._remove([row[0]]))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        return doomed
+
+    def _delete_files(self, paths):
+        for path in paths:
+            try:
+                os.remove(os.path.join(self.directory, path))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,126 @@
+import os
+import tempfile
+
+from PIL import Image
+
+# Pixel operations done here with Pillow instead of queuing them on ComfyUI
+LOCAL_OPERATIONS = ("resize", "crop", "convert", "thumbnail")
+# Same names as ComfyUI's ImageScale upscale_method
+RESAMPLING = {
+    "nearest-exact": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "area": Image.Resampling.BOX,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "webp": "WEBP", "bmp": "BMP", "tiff": "TIFF", "gif": "GIF"}
+# Formats that cannot store an alpha channel; transparent images are flattened onto white
+OPAQUE_FORMATS = ("JPEG", "BMP")
+
+
+def target_size(size, width=None, height=None, scale=None):
+    """
+    The size to resize `size` (width, height) to: `scale` times it, or
+    `width` and/or `height`, the missing one following the aspect ratio.
+    """
+    old_width, old_height = size
+    for name, value in (("width", width), ("height", height), ("scale", scale)):
+        if value is not None and value <= 0:
+            raise ValueError(f"{name} must be positive, got {value}")
+    if scale is not None:
+        if width is not None or height is not None:
+            raise ValueError("give either scale or width/height, not both")
+        width, height = old_width * scale, old_height * scale
+    elif width is None and height is None:
+        raise ValueError("resize needs width, height or scale")
+    elif width is None:
+        width = old_width * height / old_height
+    elif height is None:
+        height = old_height * width / old_width
+    return max(1, round(width)), max(1, round(height))
+
+
+def apply(image, operation, width=None, height=None, scale=None, box=None, resample="lanczos"):
+    """Returns `image` after one of LOCAL_OPERATIONS; 'convert' changes only the file format."""
+    if resample not in RESAMPLING:
+        raise ValueError(f"unknown resample method '{resample}', expected one of {', '.join(RESAMPLING)}")
+    if operation == "resize":
+        return image.resize(target_size(image.size, width, height, scale), RESAMPLING[resample])
+    if operation == "thumbnail":
+        if width is None and height is None:
+            raise ValueError("thumbnail needs width and/or height")
+        if min(width or 1, height or 1) <= 0:
+            raise ValueError("thumbnail width and height must be positive")
+        # Fits inside width x height, keeping the aspect ratio; never enlarges
+        thumbnail = image.copy()
+        thumbnail.thumbnail((width or image.width, height or image.height), RESAMPLING[resample])
+        return thumbnail
+    if operation == "crop":
+        if box is None or len(box) != 4:
+            raise ValueError("crop needs box=[left, top, right, bottom]")
+        left, top, right, bottom = box
+        if not (0 <= left < right <= image.width and 0 <= top < bottom <= image.height):
+            raise ValueError(f"crop box {list(box)} is outside the {image.width}x{image.height} image")
+        return image.crop((left, top, right, bottom))
+    if operation == "convert":
+        return image
+    raise ValueError(f"unknown operation '{operation}', expected one of {', '.join(LOCAL_OPERATIONS)}")
+
+
+def output_format(path, format=None):
+    """The Pillow format name for `format` (e.g. 'jpg'), else for the extension of `path`."""
+    name = (format or os.path.splitext(path)[1].lstrip(".")).lower()
+    if name not in FORMATS:
+        raise ValueError(f"unsupported image format '{name}', expected one of {', '.join(FORMATS)}")
+    return FORMATS[name]
+
+
+def destination(input_path, output_path, operation, format=None):
+    """
+    Where to save the result: `output_path` if it is a file path, else a
+    file named after the input and operation in `output_path` (a directory,
+    as for generated images) or next to the input. A file path must have
+    the extension of `format`, if one is given.
+    """
+    if output_path and os.path.splitext(output_path)[1] and not os.path.isdir(output_path):
+        extension = os.path.splitext(output_path)[1].lstrip(".").lower()
+        if format and FORMATS.get(extension) != FORMATS.get(format.lower()):
+            raise ValueError(f"output_path '{output_path}' does not end in .{format.lower()}")
+        return output_path
+    directory = output_path or os.path.dirname(os.path.abspath(input_path))
+    base, ext = os.path.splitext(os.path.basename(input_path))
+    ext = f".{format.lower()}" if format else ext
+    return os.path.join(directory, f"{base}_{operation}{ext}")
+
+
+def save(image, path, format, quality=None):
+    """Writes `image` to `path` atomically, so readers never see half a file."""
+    if format in OPAQUE_FORMATS and image.mode not in ("RGB", "L"):
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    options = {"quality": quality} if quality is not None and format in ("JPEG", "WEBP") else {}
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, format, **options)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def process(input_path, operation, output_path=None, format=None, quality=None, **params):
+    """
+    Loads `input_path`, applies `operation` (see apply() for `params`) and
+    saves it. Returns (saved path, (width, height)).
+    """
+    dest = destination(input_path, output_path, operation, format)
+    file_format = output_format(dest, format)
+    with Image.open(input_path) as image:
+        image.load()
+        result = apply(image, operation, **params)
+        save(result, dest, file_format, quality)
+        return dest, result.size
@@ -0,0 +1,225 @@
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Seconds to wait for the forwarded port to answer before giving up on a connection attempt
+READY_TIMEOUT = 30.0
+READY_POLL = 0.1
+# Seconds between health checks of an established tunnel
+CHECK_INTERVAL = 10.0
+# %C is a hash of the local host, remote host, port and user, so each remote gets its own master
+DEFAULT_CONTROL_PATH = os.path.join(tempfile.gettempdir(), "comfyui-mcp-ssh-%C")
+SSH_OPTIONS = (
+    "-o", "BatchMode=yes",  # never wait for a password prompt nobody can answer
+    "-o", "ExitOnForwardFailure=yes",
+    "-o", "ServerAliveInterval=15",
+    "-o", "ServerAliveCountMax=3",
+)
+
+
+def comfyui_answers(address, timeout=2.0):
+    """True if ComfyUI at `address` answers /system_stats."""
+    try:
+        with urllib.request.urlopen(f"http://{address}/system_stats", timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+class SSHTunnel:
+    """
+    An `ssh -L` forward from `local_port` to `dest` on `remote`, kept up for
+    the life of the server. connect() returns as soon as ComfyUI answers
+    through the forwarded port; start() does the first connect in the
+    background, so server startup never waits on ssh. An ssh ControlMaster already running for
+    `control_path` carries the forward, so no new ssh handshake is needed;
+    otherwise the tunnel starts one of its own that later connections can
+    reuse. A background thread health-checks the port and reconnects after
+    `unhealthy_after` failed checks in a row.
+    """
+
+    def __init__(self, remote, local_port, dest, control_path=DEFAULT_CONTROL_PATH, probe=comfyui_answers,
+                 check_interval=CHECK_INTERVAL, unhealthy_after=2, ready_timeout=READY_TIMEOUT, log=None,
+                 stderr_path=None, ssh="ssh", popen=subprocess.Popen, run=subprocess.run):
+        self.remote = remote
+        self.local_port = int(local_port)
+        self.dest = dest
+        self.address = f"127.0.0.1:{self.local_port}"
+        self.control_path = control_path
+        self.probe = probe
+        self.check_interval = check_interval
+        self.unhealthy_after = unhealthy_after
+        self.ready_timeout = ready_timeout
+        self.log = log or (lambda message: None)
+        self.stderr_path = stderr_path
+        self.ssh = ssh
+        self.popen = popen
+        self.run = run
+        self.mode = None  # "external", "shared master", "own master" or None when down
+        self.connected_since = None
+        self.connects = 0
+        self.reconnects = 0
+        self.failures = 0  # consecutive failed health checks
+        self.last_error = None
+        self.last_check = None
+        self._process = None
+        self._lock = threading.RLock()  # check() reconnects while holding it
+        self._thread = None
+        self._stopped = threading.Event()
+        self._ready = threading.Event()
+
+    @property
+    def forward(self):
+        return f"{self.local_port}:{self.dest}"
+
+    def _control(self, command, *args):
+        """Runs `ssh -O command` against the ControlMaster; True if it succeeded."""
+        cmd = [self.ssh, "-o", f"ControlPath={self.control_path}", "-O", command, *args, self.remote]
+        try:
+            return self.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            timeout=self.ready_timeout).returncode == 0
+        except Exception:
+            return False
+
+    def master_command(self):
+        """The ssh command for a ControlMaster of our own that carries the forward."""
+        return [self.ssh, "-N", "-M", "-o", f"ControlPath={self.control_path}", "-o", "ControlPersist=no",
+                *SSH_OPTIONS, "-L", self.forward, self.remote]
+
+    def connect(self):
+        """
+        Brings the forward up and waits until ComfyUI answers through it.
+        Returns True once it does, False if it did not within `ready_timeout`.
+        """
+        with self._lock:
+            if self.probe(self.address):
+                # Someone else (another server, a manual ssh -L) already forwards the port
+                return self._up("external")
+            shared = self._control("check")
+            if shared:
+                # A forward left over from an attempt that never got an answer would block this one
+                self._control("cancel", "-L", self.forward)
+            if shared and self._control("forward", "-L", self.forward):
+                mode = "shared master"
+            else:
+                mode = "own master"
+                stderr = open(self.stderr_path, "a") if self.stderr_path else subprocess.DEVNULL
+                try:
+                    self.log(f"Starting SSH tunnel: {' '.join(self.master_command())}")
+                    self._process = self.popen(self.master_command(), stdin=subprocess.DEVNULL,
+                                               stdout=subprocess.DEVNULL, stderr=stderr)
+                except Exception as e:
+                    return self._down(f"could not start ssh: {e}")
+                finally:
+                    if stderr is not subprocess.DEVNULL:
+                        stderr.close()
+            deadline = time.monotonic() + self.ready_timeout
+            while time.monotonic() < deadline:
+                if self.probe(self.address):
+                    return self._up(mode)
+                if self._process is not None and self._process.poll() is not None:
+                    return self._down(f"ssh exited with status {self._process.returncode}")
+                if self._stopped.wait(READY_POLL):
+                    # stop() is waiting for the lock to close the forward
+                    return self._down("stopped")
+            return self._down(f"ComfyUI did not answer on {self.address} within {self.ready_timeout:g}s")
+
+    def _up(self, mode):
+        self.mode = mode
+        self.connected_since = time.time()
+        self.connects += 1
+        self.failures = 0
+        self.last_error = None
+        self._ready.set()
+        self.log(f"SSH tunnel {self.forward} via {self.remote} ready ({mode}) after connect #{self.connects}")
+        return True
+
+    def _down(self, error):
+        self.mode = None
+        self.connected_since = None
+        self._ready.clear()
+        self.last_error = error
+        self.log(f"SSH tunnel {self.forward} via {self.remote} is down: {error}")
+        return False
+
+    def disconnect(self):
+        """Closes the forward: stops our own ssh, or cancels it on a shared master."""
+        with self._lock:
+            process, self._process = self._process, None
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+            elif self.mode == "shared master":
+                self._control("cancel", "-L", self.forward)
+            self.mode = None
+            self.connected_since = None
+            self._ready.clear()
+
+    def wait_ready(self, timeout=None):
+        """Blocks until the tunnel is up or `timeout` seconds pass; True if it is up."""
+        return self._ready.wait(timeout)
+
+    def start(self):
+        """Connects, then keeps checking and reconnecting, all on a background thread."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ssh-tunnel-health", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.disconnect()
+
+    def _run(self):
+        if not self._stopped.is_set():
+            self.connect()
+        while not self._stopped.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """One health check; reconnects after `unhealthy_after` failures in a row."""
+        probed_at = time.time()
+        healthy = self.probe(self.address)  # the only step not under the lock: it can take seconds
+        with self._lock:
+            self.last_check = time.time()
+            if self.connected_since is not None and self.connected_since > probed_at:
+                # A connect finished while we probed; our answer is about the old forward
+                return True
+            if healthy:
+                self.failures = 0
+                if self.mode is None:
+                    # Came up late: our own ssh after connect() gave up on it, or someone else's
+                    own = self._process is not None and self._process.poll() is None
+                    self._up("own master" if own else "external")
+                return True
+            self.failures += 1
+            process_died = self._process is not None and self._process.poll() is not None
+            if self.mode is not None and not process_died and self.failures < self.unhealthy_after:
+                return False
+            self.log(f"SSH tunnel {self.forward} failed {self.failures} health check(s); reconnecting")
+            self.disconnect()
+            if self._stopped.is_set():
+                return False
+            self.reconnects += 1
+            return self.connect()
+
+    def describe(self):
+        return {
+            "remote": self.remote,
+            "forward": self.forward,
+            "connected": self.mode is not None,
+            "mode": self.mode,
+            "uptime": round(time.time() - self.connected_since, 1) if self.connected_since else None,
+            "reconnects": self.reconnects,
+            "failed_checks": self.failures,
+            "last_error": self.last_error,
+            "last_check": self.last_check,
+        }
@@ -0,0 +1,300 @@
+import copy
+import json
+import os
+import threading
+
+# Node inputs that select the conditioning a sampler/guider denoises with
+POSITIVE_INPUTS = ("positive",)
+NEGATIVE_INPUTS = ("negative",)
+# BasicGuider (Flux and friends) has a single conditioning input, which is the prompt
+CONDITIONING_INPUTS = ("conditioning",)
+SEED_INPUTS = ("seed", "noise_seed")
+# Nodes that read an input image by file name, and nodes that write the results
+IMAGE_LOADERS = ("LoadImage",)
+IMAGE_OUTPUTS = ("SaveImage",)
+# Generation settings and the node inputs they set. Sampler settings are set
+# wherever they appear (KSampler, BasicScheduler, CFGGuider, KSamplerSelect...);
+# sizes and batch only on empty latents and ImageScale, not on e.g. SDXL
+# text encoders that also have width/height inputs
+SAMPLER_SETTINGS = {"steps": "steps", "cfg": "cfg", "sampler": "sampler_name"}
+SIZE_SETTINGS = {"width": "width", "height": "height", "batch_size": "batch_size"}
+SIZE_NODES = ("ImageScale",)
+# Named presets, relative to the workflow's own settings: a fraction of its
+# steps and of its width/height (rounded to SIZE_MULTIPLE), and a batch size
+QUALITY_TIERS = {
+    "draft": {"steps": 0.35, "size": 0.5, "batch_size": 4},
+    "final": {"steps": 1.0, "size": 1.0, "batch_size": 1},
+}
+SIZE_MULTIPLE = 16
+
+
+def _is_link(value):
+    """API format links are [source_node_id, output_index]."""
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def _is_text_encoder(node):
+    return node.get("class_type", "").startswith("CLIPTextEncode")
+
+
+def _sets_size(node):
+    class_type = node.get("class_type", "")
+    return class_type in SIZE_NODES or (class_type.startswith("Empty") and "Latent" in class_type)
+
+
+class CompiledWorkflow:
+    """
+    A workflow file parsed once, with the input slots generate_image patches
+    already located. Slots are (node_id, input_name) pairs. `image_slots` are
+    the LoadImage inputs, `output_nodes` the SaveImage nodes, and
+    `setting_slots` the inputs of each generation setting it has (steps,
+    cfg, sampler, width, height, batch_size).
+    """
+
+    def __init__(self, name, workflow, version=None):
+        """version: (mtime_ns, size) of the file the workflow was read from."""
+        self.name = name
+        self.workflow = workflow
+        self.version = version
+        self.positive_slots = []
+        self.negative_slots = []
+        self.seed_slots = []
+        self.image_slots = []
+        self.output_nodes = []
+        self.setting_slots = {}
+        self._compile()
+
+    def _node(self, node_id):
+        node = self.workflow.get(node_id)
+        return node if isinstance(node, dict) else None
+
+    def _text_slots(self, start):
+        """
+        Text inputs of the encoders feeding `start` (a link). Walks upstream
+        through conditioning nodes (ConditioningCombine, ControlNetApply,
+        FluxGuidance, ...) until it reaches CLIPTextEncode* nodes.
+        """
+        slots, seen, pending = [], set(), [start]
+        while pending:
+            node_id = pending.pop(0)[0]
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            node = self._node(node_id)
+            if node is None:
+                continue
+            inputs = node.get("inputs", {})
+            if _is_text_encoder(node):
+                for key, value in inputs.items():
+                    if isinstance(value, str):
+                        slots.append((node_id, key))
+                    elif _is_link(value) and key.startswith("text"):
+                        # Text fed by a primitive/string node: patch that node's value
+                        source = self._node(value[0]) or {}
+                        slots.extend((value[0], k) for k, v in source.get("inputs", {}).items() if isinstance(v, str))
+                continue
+            pending.extend(value for key, value in inputs.items() if _is_link(value) and key != "clip")
+        return slots
+
+    def _compile(self):
+        positive, negative = [], []
+        for node_id, node in self.workflow.items():
+            if not isinstance(node, dict):
+                continue
+            inputs = node.get("inputs", {})
+            if node.get("class_type") in IMAGE_LOADERS and "image" in inputs:
+                self.image_slots.append((node_id, "image"))
+            elif node.get("class_type") in IMAGE_OUTPUTS and _is_link(inputs.get("images")):
+                self.output_nodes.append(node_id)
+            settings = dict(SAMPLER_SETTINGS, **SIZE_SETTINGS) if _sets_size(node) else SAMPLER_SETTINGS
+            for setting, key in settings.items():
+                if key in inputs and not _is_link(inputs[key]):
+                    self.setting_slots.setdefault(setting, []).append((node_id, key))
+            for key, value in inputs.items():
+                if key in SEED_INPUTS and not _is_link(value):
+                    self.seed_slots.append((node_id, key))
+                elif _is_link(value):
+                    if key in POSITIVE_INPUTS or (key in CONDITIONING_INPUTS and "Guider" in node.get("class_type", "")):
+                        positive.append(value)
+                    elif key in NEGATIVE_INPUTS:
+                        negative.append(value)
+
+        for link in positive:
+            self.positive_slots.extend(s for s in self._text_slots(link) if s not in self.positive_slots)
+        for link in negative:
+            self.negative_slots.extend(s for s in self._text_slots(link)
+                                       if s not in self.negative_slots and s not in self.positive_slots)
+
+        if not self.positive_slots and not self.negative_slots:
+            self._guess_prompt_slots()
+
+    def _guess_prompt_slots(self):
+        """
+        No sampler wired to text encoders: first encoder is the prompt, one
+        whose text mentions "negative" (else the second one) the negative prompt.
+        """
+        encoders = [(node_id, node) for node_id, node in self.workflow.items()
+                    if isinstance(node, dict) and _is_text_encoder(node)]
+        if not encoders:
+            return
+        negative = next((e for e in encoders if "negative" in str(e[1].get("inputs", {}).get("text", "")).lower()),
+                        None)
+        positive = next((e for e in encoders if e is not negative), None)
+        if negative is None and len(encoders) >= 2:
+            negative = encoders[1]
+        if positive:
+            self.positive_slots.append((positive[0], "text"))
+        if negative:
+            self.negative_slots.append((negative[0], "text"))
+
+    def defaults(self):
+        """The workflow's own value of each setting it has."""
+        return {setting: self.workflow[slots[0][0]]["inputs"][slots[0][1]] for setting, slots in self.setting_slots.items()}
+
+    def settings(self, quality=None, **overrides):
+        """
+        Settings to render with: those of the `quality` tier (see QUALITY_TIERS)
+        for the settings this workflow has, then the given overrides (None
+        means unset). Raises ValueError for an unknown tier, a setting the
+        workflow does not have, or a value out of range.
+        """
+        settings = {}
+        if quality is not None:
+            tier = QUALITY_TIERS.get(quality)
+            if tier is None:
+                raise ValueError(f"Unknown quality '{quality}', use one of: {', '.join(QUALITY_TIERS)}")
+            defaults = self.defaults()
+            if "steps" in defaults:
+                settings["steps"] = max(1, round(defaults["steps"] * tier["steps"]))
+            for setting in ("width", "height"):
+                if setting in defaults and tier["size"] == 1:
+                    settings[setting] = defaults[setting]
+                elif setting in defaults:
+                    size = round(defaults[setting] * tier["size"] / SIZE_MULTIPLE) * SIZE_MULTIPLE
+                    settings[setting] = max(SIZE_MULTIPLE, size)
+            if "batch_size" in defaults:
+                settings["batch_size"] = tier["batch_size"]
+        for setting, value in overrides.items():
+            if value is None:
+                continue
+            if setting not in self.setting_slots:
+                raise ValueError(f"Workflow '{self.name}' has no '{setting}' setting")
+            if setting != "sampler" and not value > 0:
+                raise ValueError(f"'{setting}' must be positive, got {value}")
+            settings[setting] = value
+        return settings
+
+    def render(self, prompt, negative_prompt="", seed=None, images=(), settings=None):
+        """
+        A fresh copy of the workflow with the prompt, negative prompt and seed
+        filled in. `images`: input image names for the LoadImage nodes, in order.
+        `settings`: from settings().
+        """
+        if len(images) > len(self.image_slots):
+            raise ValueError(f"Workflow '{self.name}' takes {len(self.image_slots)} input image(s), got {len(images)}")
+        workflow = copy.deepcopy(self.workflow)
+        for (node_id, key), image in zip(self.image_slots, images):
+            workflow[node_id]["inputs"][key] = image
+        for node_id, key in self.positive_slots:
+            workflow[node_id]["inputs"][key] = prompt
+        if negative_prompt:
+            for node_id, key in self.negative_slots:
+                workflow[node_id]["inputs"][key] = negative_prompt
+        if seed is not None:
+            for node_id, key in self.seed_slots:
+                workflow[node_id]["inputs"][key] = seed
+        for setting, value in (settings or {}).items():
+            for node_id, key in self.setting_slots.get(setting, ()):
+                workflow[node_id]["inputs"][key] = value
+        return workflow
+
+
+def chain(steps):
+    """
+    Joins workflows into one prompt that runs them back to back inside
+    ComfyUI. `steps`: (CompiledWorkflow, rendered workflow) pairs. The image
+    a step saves is wired into the next step's first LoadImage in place of
+    the file it would load, and only the last step's SaveImage nodes are
+    kept, so intermediate images never leave ComfyUI. Node ids get a
+    "<step>." prefix. Raises ValueError if a step cannot be chained.
+    """
+    chained, previous = {}, None
+    for index, (compiled, workflow) in enumerate(steps, 1):
+        prefix = f"{index}."
+        links = {}  # this step's node outputs that now come from the previous step
+        if previous is not None:
+            if not compiled.image_slots:
+                raise ValueError(f"Workflow '{compiled.name}' has no LoadImage node to take the previous step's image")
+            loader = compiled.image_slots[0][0]
+            links[(loader, 0)] = previous
+        last = index == len(steps)
+        if not last and not compiled.output_nodes:
+            raise ValueError(f"Workflow '{compiled.name}' has no SaveImage node to pass an image on")
+
+        for node_id, node in workflow.items():
+            if not isinstance(node, dict) or any(node_id == source for source, _ in links):
+                continue
+            if not last and node_id in compiled.output_nodes:
+                continue
+            node = dict(node, inputs=dict(node.get("inputs", {})))
+            for key, value in node["inputs"].items():
+                if not _is_link(value):
+                    continue
+                if (value[0], value[1]) in links:
+                    node["inputs"][key] = links[(value[0], value[1])]
+                elif any(value[0] == source for source, _ in links):
+                    raise ValueError(f"Workflow '{compiled.name}' uses the mask of the image it would take "
+                                     f"from the previous step (node {node_id})")
+                else:
+                    node["inputs"][key] = [prefix + value[0], value[1]]
+            chained[prefix + node_id] = node
+
+        if not last:
+            link = workflow[compiled.output_nodes[0]]["inputs"]["images"]
+            previous = links.get((link[0], link[1]), [prefix + link[0], link[1]])
+    return chained
+
+
+class WorkflowRegistry:
+    """
+    Compiled workflows of one directory, loaded on first use and recompiled
+    when the file's modification time or size changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        if not os.path.exists(self.directory):
+            return []
+        return [f for f in os.listdir(self.directory) if f.endswith(".json")]
+
+    def get(self, name):
+        """
+        Returns the CompiledWorkflow for `name`. Raises FileNotFoundError if
+        it does not exist and ValueError if it is not a valid API format workflow.
+        """
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._compiled.pop(name, None)
+            raise FileNotFoundError(f"Workflow file '{name}' not found in {self.directory}")
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            compiled = self._compiled.get(name)
+            if compiled is not None and compiled.version == version:
+                return compiled
+
+        with open(path, "r", encoding="utf-8") as f:
+            workflow = json.load(f)
+        if not isinstance(workflow, dict) or "nodes" in workflow:
+            raise ValueError(f"Workflow '{name}' is not in API format (use 'Save (API Format)' in ComfyUI)")
+        compiled = CompiledWorkflow(name, workflow, version)
+        with self._lock:
+            self._compiled[name] = compiled
+        return compiled
@@ -1,12 +1,22 @@
 from mcp.server.fastmcp import FastMCP
 import yfinance as yf
 import pandas as pd
+import anyio
+import argparse
+import functools
 import json
 
 # Initialize FastMCP server
 mcp = FastMCP("YFinance")
 
-@mcp.tool()
+def threaded_tool(fn):
+    """Registers a blocking Yahoo Finance tool that runs in a worker thread."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+    return mcp.tool()(wrapper)
+
+@threaded_tool
 def get_stock_price(ticker: str) -> str:
     """
     Get the current price of a stock.
@@ -24,7 +34,7 @@ def get_stock_price(ticker: str) -> str:
     except Exception as e:
         return json.dumps({"error": str(e)})
 
-@mcp.tool()
+@threaded_tool
 def get_stock_info(ticker: str) -> str:
     """
     Get detailed information about a company/stock.
@@ -44,7 +54,7 @@ def get_stock_info(ticker: str) -> str:
     except Exception as e:
         return json.dumps({"error": str(e)})
 
-@mcp.tool()
+@threaded_tool
 def get_stock_history(ticker: str, period: str = "1mo") -> str:
     """
     Get historical stock data.
@@ -70,7 +80,7 @@ def get_stock_history(ticker: str, period: str = "1mo") -> str:
     except Exception as e:
         return json.dumps({"error": str(e)})
 
-@mcp.tool()
+@threaded_tool
 def get_stock_news(ticker: str) -> str:
     """
     Get recent news for a stock.
@@ -86,7 +96,7 @@ def get_stock_news(ticker: str) -> str:
     except Exception as e:
         return json.dumps({"error": str(e)})
 
-@mcp.tool()
+@threaded_tool
 def get_technical_indicators(ticker: str, period: str = "3mo") -> str:
     """
     Calculate technical indicators (SMA_50, SMA_200, RSI_14) for a stock.
@@ -130,5 +140,16 @@ def get_technical_indicators(ticker: str, period: str = "3mo") -> str:
     except Exception as e:
         return json.dumps({"error": str(e)})
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="YFinance MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                        help="stdio for one client per process, sse/streamable-http to share one server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    mcp.run()
+    args = parse_args()
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    mcp.run(transport=args.transport)
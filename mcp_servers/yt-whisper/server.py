@@ -1,6 +1,9 @@
 import sys
 import os
 import time
+import argparse
+import functools
+import anyio
 
 # Explicitly add current directory to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -9,13 +12,21 @@ if current_dir not in sys.path:
 
 from mcp.server.fastmcp import FastMCP
 from pathlib import Path
+import transcribe
 from transcribe import run_transcription_workflow
 
 # Initialize MCP Server
 mcp = FastMCP("yt-whisper")
 DEFAULT_OUTPUT_DIR = os.path.join(current_dir, "output")
 
-@mcp.tool()
+def threaded_tool(fn):
+    """Registers a blocking download/transcription tool that runs in a worker thread."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+    return mcp.tool()(wrapper)
+
+@threaded_tool
 def transcribe_youtube_video(
     youtube_url: str,
     output_name: str = "transcription",
@@ -73,6 +84,19 @@ def transcribe_youtube_video(
     except Exception as e:
         return f"Error processing video: {str(e)}"
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="yt-whisper MCP server")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                        help="stdio for one client per process, sse/streamable-http to share one server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    print("Starting yt-whisper MCP Server...", file=sys.stderr)
-    mcp.run()
+    args = parse_args()
+    # A shared server lives long enough for a warm model to pay off
+    transcribe.KEEP_MODELS_LOADED = args.transport != "stdio"
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    print(f"Starting yt-whisper MCP Server ({args.transport})...", file=sys.stderr)
+    mcp.run(transport=args.transport)
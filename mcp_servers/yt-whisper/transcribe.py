@@ -6,8 +6,31 @@ import sys
 import torch
 import shutil
 import time
+import threading
 from pathlib import Path
 
+# Long-lived (HTTP/SSE) servers keep loaded models between calls instead of
+# paying the model load on every transcription. Off by default so one-shot
+# runs still free GPU memory as soon as they are done.
+KEEP_MODELS_LOADED = False
+_model_cache = {}
+_model_lock = threading.Lock()
+
+def _load_model(key, loader):
+    """Returns the model for `key`, loading it with `loader()` unless it is already cached."""
+    if not KEEP_MODELS_LOADED:
+        return loader()
+    with _model_lock:
+        if key not in _model_cache:
+            _model_cache[key] = loader()
+        else:
+            print(f"Reusing loaded model {key}", file=sys.stderr, flush=True)
+        return _model_cache[key]
+
+def _evict_model(key):
+    with _model_lock:
+        _model_cache.pop(key, None)
+
 def run_transcription_workflow(youtube_url, output_audio, output_text, start_time="00:00:00", end_time=None, model_name="small", use_cuda=True, language=None, beam_size=1):
     """
     Executes the transcription workflow using optimized yt-dlp native downloading (threaded)
@@ -206,7 +229,8 @@ def run_transcription_workflow(youtube_url, output_audio, output_text, start_tim
         compute_type = "float16" if device == "cuda" else "int8"
         
         print(f"Loading faster-whisper model '{model_name}' (compute_type={compute_type})...", file=sys.stderr, flush=True)
-        model = WhisperModel(model_name, device=device, compute_type=compute_type)
+        model = _load_model(("faster-whisper", model_name, device, compute_type),
+                            lambda: WhisperModel(model_name, device=device, compute_type=compute_type))
         
         print(f"Starting transcription (language={language if language else 'auto'}, beam_size={beam_size})...", file=sys.stderr, flush=True)
         segments, info = model.transcribe(final_audio_path, language=language, beam_size=beam_size)
@@ -240,7 +264,7 @@ def run_transcription_workflow(youtube_url, output_audio, output_text, start_tim
         print("faster-whisper not found, falling back to standard openai-whisper...", file=sys.stderr, flush=True)
         try:
             print(f"Loading Whisper model '{model_name}'...", file=sys.stderr, flush=True)
-            model = whisper.load_model(model_name, device=device)
+            model = _load_model(("whisper", model_name, device), lambda: whisper.load_model(model_name, device=device))
             
             print(f"Starting transcription (language={language if language else 'auto'})...", file=sys.stderr, flush=True)
             # If language is None, Whisper will auto-detect it
@@ -267,11 +291,12 @@ def run_transcription_workflow(youtube_url, output_audio, output_text, start_tim
         # Fallback logic duplicated or we can structure this better, but for now simple fallback
         try:
             if model: 
+                _evict_model(("faster-whisper", model_name, device, compute_type))
                 del model
                 torch.cuda.empty_cache()
             
             print(f"Loading Whisper model '{model_name}'...", file=sys.stderr, flush=True)
-            model = whisper.load_model(model_name, device=device)
+            model = _load_model(("whisper", model_name, device), lambda: whisper.load_model(model_name, device=device))
             
             print(f"Starting transcription (language={language if language else 'auto'})...", file=sys.stderr, flush=True)
             result = model.transcribe(final_audio_path, language=language, verbose=False)
@@ -292,7 +317,7 @@ def run_transcription_workflow(youtube_url, output_audio, output_text, start_tim
              raise e2
              
     finally:
-        if model is not None:
+        if model is not None and not KEEP_MODELS_LOADED:
             print(f"Cleaning up GPU memory...", file=sys.stderr, flush=True)
             del model
             if device == "cuda":
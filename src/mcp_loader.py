@@ -1,43 +1,179 @@
+import asyncio
+import hashlib
 import json
 import os
 import shutil
-from typing import List, Dict, Any
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
 from crewai_tools import MCPServerAdapter
 from mcp import StdioServerParameters
 
-class MCPLoader:
-    def __init__(self, config_path: str = "crewai_mcp.json"):
-        self.config_path = config_path
+try:
+    from .mcp_metrics import InstrumentedMCPTool, MCPMetrics, get_metrics
+    from .mcp_pool import ReplicaPoolHandle
+    from .mcp_result_cache import DEFAULT_RESULT_CACHE_SIZE, CachedMCPTool, ToolResultCache
+    from .mcp_schema_cache import ToolSchemaCache, describe_tools
+    from .mcp_sessions import (DEFAULT_MAX_RESTART_BACKOFF, DEFAULT_RESTART_BACKOFF, MCPSessionHandle,
+                               MCPSessionManager, get_session_manager)
+    from .mcp_tools import LazyServerHandle
+except ImportError:
+    # Loaded by file path (e.g. the book writer's agents.py), import siblings flat
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from mcp_metrics import InstrumentedMCPTool, MCPMetrics, get_metrics
+    from mcp_pool import ReplicaPoolHandle
+    from mcp_result_cache import DEFAULT_RESULT_CACHE_SIZE, CachedMCPTool, ToolResultCache
+    from mcp_schema_cache import ToolSchemaCache, describe_tools
+    from mcp_sessions import (DEFAULT_MAX_RESTART_BACKOFF, DEFAULT_RESTART_BACKOFF, MCPSessionHandle,
+                              MCPSessionManager, get_session_manager)
+    from mcp_tools import LazyServerHandle
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Matches MCPServerAdapter's own connect timeout
+DEFAULT_STARTUP_TIMEOUT = 30.0
+
+# Transports served over the network: one server process, many clients
+HTTP_TRANSPORTS = ("sse", "streamable-http")
+
+
+# A ping is cheap; a server that cannot answer one within this is treated as dead
+HEALTH_CHECK_TIMEOUT = 5.0
+
+
+def _ping_adapter(adapter: MCPServerAdapter, timeout: float = HEALTH_CHECK_TIMEOUT):
+    """Sends an MCP ping over each of the adapter's sessions; raises if the server does not answer."""
+    client = adapter._adapter
+    for session in client.sessions:
+        asyncio.run_coroutine_threadsafe(session.send_ping(), client.loop).result(timeout)
+
+
+def _port_open(host: str, port: int, timeout: float = 0.5) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
 
-    def load_server(self, server_name: str, tool_names: List[str] = None) -> MCPServerAdapter:
+@dataclass
+class ServerStartup:
+    """Outcome of starting one server."""
+    name: str
+    ok: bool
+    elapsed: float
+    error: Optional[str] = None
+    handle: Optional[Union[MCPSessionHandle, ReplicaPoolHandle, LazyServerHandle]] = field(default=None, repr=False)
+
+
+@dataclass
+class StartupReport:
+    """Outcome of starting a set of servers concurrently."""
+    results: Dict[str, ServerStartup] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def started(self) -> List[str]:
+        return [name for name, r in self.results.items() if r.ok]
+
+    @property
+    def failed(self) -> Dict[str, str]:
+        return {name: r.error for name, r in self.results.items() if not r.ok}
+
+    @property
+    def handles(self) -> List[Union[MCPSessionHandle, ReplicaPoolHandle, LazyServerHandle]]:
+        return [r.handle for r in self.results.values() if r.ok]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "elapsed": round(self.elapsed, 3),
+            "servers": {
+                name: {"ok": r.ok, "elapsed": round(r.elapsed, 3), "error": r.error}
+                for name, r in self.results.items()
+            },
+        }
+
+    def summary(self) -> str:
+        lines = [f"MCP startup: {len(self.started)}/{len(self.results)} servers up in {self.elapsed:.2f}s"]
+        for name, r in self.results.items():
+            status = "ok" if r.ok else f"FAILED: {r.error}"
+            lines.append(f"  {name}: {r.elapsed:.2f}s {status}")
+        return "\n".join(lines)
+
+
+class MCPLoader:
+    def __init__(self, config_path: str = "crewai_mcp.json", session_manager: Optional[MCPSessionManager] = None,
+                 lazy: bool = False, cache_dir: Optional[str] = None, cache_results: bool = True,
+                 result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE, supervise: bool = True,
+                 metrics: Optional[MCPMetrics] = None, instrument: bool = True):
         """
-        Loads a specific server by name from the config.
-        Optionally filters for specific tools on that server.
+        session_manager: Where warm server processes are kept. Defaults to the
+        process-wide manager, so every loader (and every crew) in this process
+        shares one instance per configured server.
+        lazy: Default for servers without a `lazy` config key. Lazy servers
+        whose tool schemas are cached are only started on the first tool call.
+        cache_dir: Root of the on-disk caches. Defaults to $MCP_CACHE_DIR, then
+        `.mcp_cache/` in the project root.
+        cache_results: Serve repeated tool calls from the result cache for
+        servers with a `cache` config block. Setting $MCP_CACHE_BYPASS=1 turns
+        it off without code changes.
+        result_cache_size: Size cap of the result cache in bytes (LRU eviction).
+        supervise: Default for servers without a `supervise` config key.
+        Supervised servers are health checked and restarted with exponential
+        backoff when they die; meanwhile their tools fail fast with an error
+        the agent can act on.
+        metrics: Where per-tool call metrics are recorded. Defaults to the
+        process-wide collector, written at exit to $MCP_METRICS_FILE if set.
+        instrument: Record metrics for every tool call.
         """
+        self.config_path = config_path
+        self.session_manager = session_manager or get_session_manager()
+        self.lazy = lazy
+        self.cache_dir = cache_dir or os.environ.get("MCP_CACHE_DIR") or os.path.join(PROJECT_ROOT, ".mcp_cache")
+        self.schema_cache = ToolSchemaCache(os.path.join(self.cache_dir, "schemas"))
+        bypass = os.environ.get("MCP_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+        self.cache_results = cache_results and not bypass
+        self.result_cache_size = result_cache_size
+        self.supervise = supervise
+        self.metrics = metrics or get_metrics()
+        self.instrument = instrument
+        self._result_cache = None
+
+    def _read_config(self) -> Dict[str, Any]:
         if not os.path.exists(self.config_path):
             raise FileNotFoundError(f"MCP config file not found: {self.config_path}")
 
         with open(self.config_path, 'r') as f:
-            data = json.load(f)
+            return json.load(f)
 
-        config = data.get("mcpServers", {}).get(server_name)
+    def _server_config(self, server_name: str) -> Dict[str, Any]:
+        config = self._read_config().get("mcpServers", {}).get(server_name)
         if not config:
             raise ValueError(f"Server '{server_name}' not found in configuration.")
+        return config
 
-        print(f"Loading Targeted MCP Server: {server_name}")
-        
-        server_env = config.get("env", {})
-        full_env = {**os.environ, **server_env}
+    @staticmethod
+    def _transport(config: Dict[str, Any]) -> str:
+        transport = config.get("transport") or config.get("transportType") or "stdio"
+        if transport not in ("stdio",) + HTTP_TRANSPORTS:
+            raise ValueError(f"Unsupported MCP transport '{transport}', expected stdio, sse or streamable-http.")
+        return transport
 
-        command = config["command"]
+    def _resolve_command(self, config: Dict[str, Any]) -> Tuple[Optional[str], List[str]]:
+        command = config.get("command")
         args = config.get("args", [])
+        if not command:
+            return None, list(args)
 
         # Resolve relative paths for command and args
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
         if not os.path.isabs(command) and not shutil.which(command):
              # Try resolving relative to project root
-             potential_path = os.path.join(project_root, command)
+             potential_path = os.path.join(PROJECT_ROOT, command)
              if os.path.exists(potential_path):
                  command = potential_path
         
@@ -45,49 +181,310 @@ class MCPLoader:
         resolved_args = []
         for arg in args:
             if isinstance(arg, str) and not os.path.isabs(arg) and (arg.startswith("mcp_servers") or arg.startswith("./mcp_servers")):
-                potential_arg = os.path.join(project_root, arg)
+                potential_arg = os.path.join(PROJECT_ROOT, arg)
                 if os.path.exists(potential_arg):
                     resolved_args.append(potential_arg)
                     continue
             resolved_args.append(arg)
 
-        server_params = StdioServerParameters(
+        return command, resolved_args
+
+    def _build_server_params(self, config: Dict[str, Any]) -> Union[StdioServerParameters, Dict[str, Any]]:
+        """
+        stdio servers get StdioServerParameters (one child process per session);
+        sse/streamable-http servers get the URL dict MCPServerAdapter expects.
+        """
+        transport = self._transport(config)
+        if transport in HTTP_TRANSPORTS:
+            if not config.get("url"):
+                raise ValueError(f"MCP server with transport '{transport}' needs a 'url'.")
+            params = {"url": config["url"], "transport": transport}
+            if config.get("headers"):
+                params["headers"] = config["headers"]
+            return params
+
+        server_env = config.get("env", {})
+        full_env = {**os.environ, **server_env}
+        command, resolved_args = self._resolve_command(config)
+
+        return StdioServerParameters(
             command=command,
             args=resolved_args,
             env=full_env
         )
-        
-        # MCPServerAdapter takes tool_names in *args (as per our earlier inspection)
-        return MCPServerAdapter(server_params, *(tool_names or []))
 
-    def load_servers(self) -> List[MCPServerAdapter]:
+    @staticmethod
+    def _session_key(server_name: str, config: Dict[str, Any]) -> str:
+        """Servers are shared only while their launch configuration is unchanged."""
+        launch = {k: config.get(k) for k in ("command", "args", "env", "transport", "transportType", "url")}
+        digest = hashlib.sha1(json.dumps(launch, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+        return f"{server_name}:{digest}"
+
+    def _ensure_shared_server(self, server_name: str, config: Dict[str, Any], startup_timeout: float):
         """
-        Parses the config JSON and returns a list of configured MCPServerAdapters
-        for all enabled servers.
+        Makes sure something is listening on an HTTP server's URL. If nothing is
+        and the entry has a `command`, the server is launched detached so it
+        outlives this process and keeps serving other crews; its output goes to
+        `<cache_dir>/logs/<server>.log`.
+        """
+        url = urlparse(config["url"])
+        host = url.hostname or "127.0.0.1"
+        port = url.port or (443 if url.scheme == "https" else 80)
+        if _port_open(host, port):
+            return
+        if not config.get("command"):
+            raise ConnectionError(f"MCP server '{server_name}' is not listening on {config['url']}.")
+
+        command, args = self._resolve_command(config)
+        if not os.path.exists(command) and not shutil.which(command):
+            raise FileNotFoundError(f"Command for MCP server '{server_name}' not found: {command}")
+
+        log_dir = os.path.join(self.cache_dir, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        print(f"Launching shared MCP server: {server_name} ({config['url']})")
+        kwargs = {}
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        with open(os.path.join(log_dir, f"{server_name}.log"), "ab") as log:
+            subprocess.Popen([command] + args, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                             env={**os.environ, **config.get("env", {})}, cwd=PROJECT_ROOT, **kwargs)
+
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if _port_open(host, port):
+                return
+            time.sleep(0.2)
+        raise TimeoutError(f"MCP server '{server_name}' did not start listening on {config['url']} within {startup_timeout}s")
+
+    @property
+    def result_cache(self) -> ToolResultCache:
+        if self._result_cache is None:
+            self._result_cache = ToolResultCache(os.path.join(self.cache_dir, "results"), self.result_cache_size)
+        return self._result_cache
+
+    def _tool_wrapper(self, server_name: str, config: Dict[str, Any]) -> Optional[Callable]:
+        """Decorations applied to every tool of a server, based on its config."""
+        cache_config = config.get("cache") if self.cache_results else None
+        if not cache_config and not self.instrument:
+            return None
+
+        def wrap(tool):
+            ttl = ToolResultCache.ttl_for(cache_config, tool.name) if cache_config else None
+            if ttl is not None:
+                tool = CachedMCPTool.wrap(tool, server_name, cache=self.result_cache, ttl=ttl)
+            if self.instrument:
+                # Outermost, so latency and sizes are what the agent sees (cache hits included)
+                tool = InstrumentedMCPTool.wrap(tool, server_name, metrics=self.metrics)
+            return tool
+
+        return wrap
+
+    def load_server(self, server_name: str, tool_names: List[str] = None, startup_timeout: Optional[float] = None,
+                    lazy: Optional[bool] = None) -> Union[MCPSessionHandle, ReplicaPoolHandle, LazyServerHandle]:
+        """
+        Loads a specific server by name from the config.
+        Optionally filters for specific tools on that server.
+
+        The server process is shared: repeated calls for the same server return
+        handles to one warm process instead of spawning a new one. Call
+        `.stop()` (or `.release()`) on the handle when done; the process is
+        reaped after `idle_ttl` seconds without users (per-server config key,
+        defaults to the session manager's TTL) and always stopped at exit.
+
+        startup_timeout bounds spawn plus handshake; it falls back to the
+        server's `startup_timeout` config key, then DEFAULT_STARTUP_TIMEOUT.
+
+        lazy (falls back to the server's `lazy` config key, then the loader
+        default): return proxies built from the on-disk tool-schema cache and
+        only start the server when one of them is called. On a cache miss the
+        server is started now and its schemas are recorded for next time.
+
+        Servers with `"transport": "sse"` or `"streamable-http"` are reached at
+        their `url` instead of being spawned per process, so several crews (and
+        processes) share one server. If the entry also has a `command`, the
+        server is launched on first use when nothing is listening yet.
+
+        `"replicas": N` on a stdio server starts N identical processes behind
+        one set of tools; each call goes to the replica with the fewest calls
+        in flight. Tools listed in `idempotent` additionally get a hedged
+        backup request on another replica when `hedge` is set (true, or
+        {"percentile": 95, "min_samples": 10, "min_delay": 0.05}) and the first
+        request is slower than the tool's recent p95 latency.
+
+        Servers are supervised unless `"supervise": false`: a crashed server
+        is restarted (handshake included) after `restart_backoff` seconds,
+        doubling per failed attempt up to `max_restart_backoff`, and its tools
+        return an error right away while it is down.
+        """
+        config = self._server_config(server_name)
+
+        print(f"Loading Targeted MCP Server: {server_name}")
+
+        if self._transport(config) not in HTTP_TRANSPORTS and not config.get("command"):
+            raise ValueError(f"MCP server '{server_name}' has no 'command'.")
+        server_params = self._build_server_params(config)
+        shared = not isinstance(server_params, StdioServerParameters)
+        if not shared and not os.path.exists(server_params.command) and not shutil.which(server_params.command):
+            # Fail now rather than after the full startup timeout
+            raise FileNotFoundError(f"Command for MCP server '{server_name}' not found: {server_params.command}")
+        if startup_timeout is None:
+            startup_timeout = config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+        if lazy is None:
+            lazy = config.get("lazy", self.lazy)
+        tool_wrapper = self._tool_wrapper(server_name, config)
+
+        def connect():
+            if shared:
+                self._ensure_shared_server(server_name, config, startup_timeout)
+            return MCPServerAdapter(server_params, connect_timeout=startup_timeout)
+
+        # Shared HTTP servers already serve calls concurrently, replicas only apply to stdio
+        replicas = 1 if shared else max(1, int(config.get("replicas", 1)))
+        session_key = self._session_key(server_name, config)
+
+        def acquire_replica(index: int, names: Optional[List[str]] = None, wrapper: Optional[Callable] = None) -> MCPSessionHandle:
+            # Tools are filtered per handle, so the shared adapter exposes them all
+            return self.session_manager.acquire(
+                session_key if replicas == 1 else f"{session_key}#{index}",
+                connect,
+                name=server_name if replicas == 1 else f"{server_name}[{index}]",
+                idle_ttl=config.get("idle_ttl"),
+                tool_names=names,
+                tool_wrapper=wrapper,
+                supervised=config.get("supervise", self.supervise),
+                health_check=_ping_adapter,
+                restart_backoff=config.get("restart_backoff", DEFAULT_RESTART_BACKOFF),
+                max_restart_backoff=config.get("max_restart_backoff", DEFAULT_MAX_RESTART_BACKOFF),
+            )
+
+        def acquire(names: Optional[List[str]] = None,
+                    wrapper: Optional[Callable] = None) -> Union[MCPSessionHandle, ReplicaPoolHandle]:
+            if replicas == 1:
+                return acquire_replica(0, names, wrapper)
+            return self._acquire_pool(server_name, config, replicas, acquire_replica, names, wrapper)
+
+        if not lazy:
+            return acquire(tool_names, tool_wrapper)
+
+        if shared:
+            _, launch_args = self._resolve_command(config)
+            schema_key = ToolSchemaCache.fingerprint(server_params["url"], launch_args, config.get("env"))
+        else:
+            schema_key = ToolSchemaCache.fingerprint(server_params.command, server_params.args, config.get("env"))
+
+        def acquire_and_record(names: Optional[List[str]] = None,
+                               wrapper: Optional[Callable] = None) -> Union[MCPSessionHandle, ReplicaPoolHandle]:
+            handle = acquire(names, wrapper)
+            try:
+                self.schema_cache.store(schema_key, server_name, describe_tools(handle.session.adapter))
+            except Exception as e:
+                print(f"Warning: could not cache tool schemas for {server_name}: {e}")
+            return handle
+
+        schemas = self.schema_cache.load(schema_key)
+        if schemas is None:
+            return acquire_and_record(tool_names, tool_wrapper)
+        # Wrappers sit in front of the proxies, so e.g. cache hits never start the server
+        return LazyServerHandle(server_name, schemas, acquire_and_record, tool_names, tool_wrapper)
+
+    @staticmethod
+    def _acquire_pool(server_name: str, config: Dict[str, Any], replicas: int, acquire_replica: Callable,
+                      tool_names: Optional[List[str]], tool_wrapper: Optional[Callable]) -> ReplicaPoolHandle:
+        """Starts the replicas concurrently and puts them behind one pooled handle."""
+        with ThreadPoolExecutor(max_workers=replicas, thread_name_prefix="mcp-replica") as pool:
+            futures = [pool.submit(acquire_replica, index) for index in range(replicas)]
+        handles, errors = [], []
+        for future in futures:
+            try:
+                handles.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        if not handles:
+            raise errors[0]
+        if errors:
+            print(f"Warning: {len(errors)}/{replicas} replicas of {server_name} failed to start: {errors[0]}")
+
+        hedge = config.get("hedge")
+        if hedge is True:
+            hedge = {}
+        elif not hedge:
+            hedge = None
+        return ReplicaPoolHandle(server_name, handles, tool_names, tool_wrapper, config.get("idempotent"), hedge)
+
+    def _timed_load(self, server_name: str, startup_timeout: float) -> ServerStartup:
+        start = time.perf_counter()
+        try:
+            handle = self.load_server(server_name, startup_timeout=startup_timeout)
+            return ServerStartup(server_name, True, time.perf_counter() - start, handle=handle)
+        except Exception as e:
+            return ServerStartup(server_name, False, time.perf_counter() - start, error=str(e))
+
+    def start_servers(self, server_names: Optional[List[str]] = None, startup_timeout: Optional[float] = None,
+                      max_workers: Optional[int] = None) -> StartupReport:
+        """
+        Starts servers concurrently, each bounded by its own startup deadline,
+        so total startup time is that of the slowest server rather than the sum.
+
+        server_names: Servers to start. Defaults to every enabled server in the config.
+        startup_timeout: Deadline applied to every server, overriding per-server
+                         `startup_timeout` config keys.
+        max_workers: Thread pool size. Defaults to one thread per server.
+        """
+        report = StartupReport()
+        mcp_servers = self._read_config().get("mcpServers", {})
+        if server_names is None:
+            server_names = [name for name, config in mcp_servers.items() if not config.get("disabled", False)]
+        if not server_names:
+            return report
+
+        deadlines = {}
+        for name in server_names:
+            config = mcp_servers.get(name) or {}
+            deadlines[name] = startup_timeout if startup_timeout is not None else config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+
+        start = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=max_workers or len(server_names), thread_name_prefix="mcp-startup")
+        futures = {pool.submit(self._timed_load, name, deadlines[name]): name for name in server_names}
+        # The adapter enforces each deadline itself; the small grace only covers
+        # teardown of a server that missed it.
+        wait(futures, timeout=max(deadlines.values()) + 5.0)
+        pool.shutdown(wait=False)
+
+        for future, name in futures.items():
+            if future.done():
+                report.results[name] = future.result()
+            else:
+                report.results[name] = ServerStartup(name, False, time.perf_counter() - start,
+                                                     error=f"did not start within {deadlines[name]}s")
+                # Release the handle if the server comes up after we gave up on it
+                future.add_done_callback(lambda f: f.result().handle and f.result().handle.release())
+
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def load_servers(self) -> List[Union[MCPSessionHandle, ReplicaPoolHandle, LazyServerHandle]]:
+        """
+        Parses the config JSON and returns a list of handles to warm servers
+        for all enabled servers. Servers are started concurrently, see
+        start_servers() for the per-server results.
         """
         if not os.path.exists(self.config_path):
             print(f"Warning: MCP config file not found at {self.config_path}")
             return []
 
         try:
-            with open(self.config_path, 'r') as f:
-                data = json.load(f)
+            report = self.start_servers()
         except json.JSONDecodeError as e:
             print(f"Error parsing MCP config JSON: {e}")
             return []
 
-        mcp_servers = data.get("mcpServers", {})
-        adapters = []
-
-        for name, config in mcp_servers.items():
-            if config.get("disabled", False):
-                continue
-            
-            try:
-                adapter = self.load_server(name)
-                adapters.append(adapter)
-            except Exception as e:
-                print(f"Failed to initialize adapter for {name}: {e}")
+        for name, error in report.failed.items():
+            print(f"Failed to initialize adapter for {name}: {error}")
 
-        return adapters
+        return report.handles
 
+    def shutdown(self):
+        """Stops every server held by this loader's session manager."""
+        self.session_manager.shutdown()
@@ -0,0 +1,313 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import Field
+
+try:
+    from .mcp_tools import MCPToolWrapper, is_error_reply
+except ImportError:
+    from mcp_tools import MCPToolWrapper, is_error_reply
+
+LATENCY_QUANTILES = (50, 95, 99)
+# Percentiles are computed over the most recent calls of each tool
+METRICS_WINDOW = 10000
+TOKEN_ENCODING = "cl100k_base"
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies for one tool."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100.0 * len(samples))) - 1))
+        return samples[index]
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken. tiktoken may download its encoding, with no
+    timeout, so it is loaded on a background thread; until it is ready, or
+    when it cannot be loaded (offline) or `encoding` is None, counts fall
+    back to ~4 characters per token and `exact` is False.
+    """
+
+    def __init__(self, encoding: Optional[str] = TOKEN_ENCODING):
+        self.encoding_name = encoding
+        self._encoding = None
+        self._loaded = threading.Event()
+        if encoding is None:
+            self._loaded.set()
+        else:
+            threading.Thread(target=self._load, name="tiktoken-load", daemon=True).start()
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def wait_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until loading the encoding has finished or failed; False on timeout."""
+        return self._loaded.wait(timeout)
+
+    def _load(self):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception as e:
+            print(f"Warning: tiktoken encoding '{self.encoding_name}' unavailable ({type(e).__name__}), "
+                  f"estimating token counts")
+        finally:
+            self._loaded.set()
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self._encoding
+        if encoding is None:
+            return max(1, len(text) // 4)
+        return len(encoding.encode(text, disallowed_special=()))
+
+
+class ToolStats:
+    """Counters for one tool of one server."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = LatencyTracker(METRICS_WINDOW)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.request_bytes = 0
+        self.request_tokens = 0
+        self.response_bytes = 0
+        self.response_tokens = 0
+        self.response_tokens_max = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        latency = {f"p{q}": _round(self.latency.percentile(q)) for q in LATENCY_QUANTILES}
+        latency.update({"mean": _round(self.latency_sum / calls), "max": _round(self.latency_max)})
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_seconds": latency,
+            "request": {"bytes": self.request_bytes, "tokens": self.request_tokens,
+                        "avg_tokens": round(self.request_tokens / calls, 1)},
+            "response": {"bytes": self.response_bytes, "tokens": self.response_tokens,
+                         "avg_tokens": round(self.response_tokens / calls, 1), "max_tokens": self.response_tokens_max},
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+
+
+class MCPMetrics:
+    """
+    Per server, per tool call metrics: call and error counts, latency
+    percentiles, and request/response sizes in bytes and tokens.
+    Export with to_dict()/to_json() or to_prometheus().
+
+    Recording a call only takes its sizes in bytes; tokens are counted off
+    the call's path, on a background thread, and whatever is still pending
+    is counted when the metrics are exported.
+    """
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None):
+        self.tokens = token_counter or TokenCounter()
+        self.started_at = time.time()
+        self._tools: Dict[Tuple[str, str], ToolStats] = {}
+        self._lock = threading.Lock()
+        self._pending: deque = deque()  # (stats, request, response) not counted in tokens yet
+        self._pending_ready = threading.Event()
+        self._counting = threading.Lock()
+        self._counter: Optional[threading.Thread] = None
+
+    def record(self, server: str, tool: str, arguments: Any, result: Any, elapsed: float, error: bool):
+        request = _text(arguments)
+        response = _text(result)
+        with self._lock:
+            stats = self._tools.get((server, tool))
+            if stats is None:
+                stats = self._tools[(server, tool)] = ToolStats()
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.latency_sum += elapsed
+            stats.latency_max = max(stats.latency_max, elapsed)
+            stats.request_bytes += len(request.encode("utf-8"))
+            stats.response_bytes += len(response.encode("utf-8"))
+            self._pending.append((stats, request, response))
+            if self._counter is None:
+                self._counter = threading.Thread(target=self._count_in_background, name="mcp-metrics-tokens",
+                                                 daemon=True)
+                self._counter.start()
+        stats.latency.record(elapsed)
+        self._pending_ready.set()
+
+    def _count_in_background(self):
+        while True:
+            self._pending_ready.wait()
+            self._pending_ready.clear()
+            self._count_pending()
+
+    def _count_pending(self):
+        """Adds the token counts of recorded calls not counted yet."""
+        with self._counting:
+            while True:
+                try:
+                    stats, request, response = self._pending.popleft()
+                except IndexError:
+                    return
+                request_tokens = self.tokens.count(request)
+                response_tokens = self.tokens.count(response)
+                with self._lock:
+                    stats.request_tokens += request_tokens
+                    stats.response_tokens += response_tokens
+                    stats.response_tokens_max = max(stats.response_tokens_max, response_tokens)
+
+    def reset(self):
+        with self._lock:
+            self._tools.clear()
+            self._pending.clear()
+        self.started_at = time.time()
+
+    def _snapshot(self) -> List[Tuple[str, str, ToolStats]]:
+        self._count_pending()
+        with self._lock:
+            return [(server, tool, stats) for (server, tool), stats in sorted(self._tools.items())]
+
+    def to_dict(self) -> Dict[str, Any]:
+        servers: Dict[str, Dict[str, Any]] = {}
+        for server, tool, stats in self._snapshot():
+            servers.setdefault(server, {})[tool] = stats.to_dict()
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "tokenizer": self.tokens.encoding_name if self.tokens.exact else "approx (4 chars/token)",
+            "servers": servers,
+        }
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format."""
+        snapshot = self._snapshot()
+
+        def label(server, tool):
+            server = server.replace("\\", "\\\\").replace('"', '\\"')
+            tool = tool.replace("\\", "\\\\").replace('"', '\\"')
+            return f'server="{server}",tool="{tool}"'
+
+        lines = []
+
+        def counter(name, help_text, attr):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for server, tool, stats in snapshot:
+                lines.append(f"{name}{{{label(server, tool)}}} {getattr(stats, attr)}")
+
+        counter("mcp_tool_calls_total", "MCP tool calls.", "calls")
+        counter("mcp_tool_errors_total", "MCP tool calls that raised or returned an error.", "errors")
+
+        name = "mcp_tool_latency_seconds"
+        lines.append(f"# HELP {name} MCP tool call latency.")
+        lines.append(f"# TYPE {name} summary")
+        for server, tool, stats in snapshot:
+            labels = label(server, tool)
+            for q in LATENCY_QUANTILES:
+                value = stats.latency.percentile(q)
+                lines.append(f'{name}{{{labels},quantile="{q / 100:g}"}} {value if value is not None else "NaN"}')
+            lines.append(f"{name}_sum{{{labels}}} {stats.latency_sum}")
+            lines.append(f"{name}_count{{{labels}}} {stats.calls}")
+
+        counter("mcp_tool_request_bytes_total", "Bytes of tool call arguments.", "request_bytes")
+        counter("mcp_tool_request_tokens_total", "Tokens of tool call arguments.", "request_tokens")
+        counter("mcp_tool_response_bytes_total", "Bytes of tool results.", "response_bytes")
+        counter("mcp_tool_response_tokens_total", "Tokens of tool results.", "response_tokens")
+
+        name = "mcp_tool_response_tokens_max"
+        lines.append(f"# HELP {name} Largest tool result seen, in tokens.")
+        lines.append(f"# TYPE {name} gauge")
+        for server, tool, stats in snapshot:
+            lines.append(f"{name}{{{label(server, tool)}}} {stats.response_tokens_max}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Writes Prometheus text for `.prom`/`.txt` paths, JSON otherwise."""
+        content = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+class InstrumentedMCPTool(MCPToolWrapper):
+    """Records latency, errors and payload sizes of every call."""
+
+    metrics: MCPMetrics = Field(exclude=True)
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            result = self.inner._run(*args, **kwargs)
+        except Exception as e:
+            self.metrics.record(self.server_name, self.name, kwargs or list(args), str(e),
+                                time.perf_counter() - start, error=True)
+            raise
+        self.metrics.record(self.server_name, self.name, kwargs or list(args), result,
+                            time.perf_counter() - start, error=is_error_reply(result))
+        return result
+
+
+_default_metrics: Optional[MCPMetrics] = None
+_default_lock = threading.Lock()
+
+
+def _write_at_exit(metrics: MCPMetrics, path: str):
+    try:
+        metrics.write(path)
+        print(f"MCP tool metrics written to {path}")
+    except Exception as e:
+        print(f"Error writing MCP tool metrics to {path}: {e}")
+
+
+def get_metrics() -> MCPMetrics:
+    """
+    Process-wide metrics shared by every loader. If $MCP_METRICS_FILE is set
+    they are written there at exit (`.prom` for Prometheus text, else JSON).
+    """
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = MCPMetrics()
+            path = os.environ.get("MCP_METRICS_FILE")
+            if path:
+                atexit.register(_write_at_exit, _default_metrics, path)
+        return _default_metrics
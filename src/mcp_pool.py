@@ -0,0 +1,212 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from crewai.tools import BaseTool
+from crewai_tools.adapters.tool_collection import ToolCollection
+from pydantic import Field
+
+try:
+    from .mcp_metrics import LatencyTracker
+    from .mcp_tools import MCPToolWrapper
+except ImportError:
+    from mcp_metrics import LatencyTracker
+    from mcp_tools import MCPToolWrapper
+
+# Hedging only kicks in once a tool has this many latency samples
+DEFAULT_HEDGE_MIN_SAMPLES = 10
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_DELAY = 0.05
+
+
+def _spawn(fn: Callable[[], Any]) -> Future:
+    """
+    Runs fn on a daemon thread. A hedged call that lost the race cannot be
+    cancelled, and a pool thread stuck on it must not hold up interpreter exit.
+    """
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="mcp-replica-call", daemon=True).start()
+    return future
+
+
+class ReplicaPool:
+    """
+    Dispatches tool calls over identical server replicas.
+
+    Each call goes to the replica with the fewest calls in flight (ties are
+    rotated). Hedged calls send a second request to another replica when the
+    first has not answered within the tool's recent p95 latency, and return
+    whichever answers first.
+    """
+
+    def __init__(self, name: str, handles: List[Any], hedge: Optional[Dict[str, Any]] = None):
+        """
+        handles: One session handle per replica, each exposing `.tools`.
+        hedge: {"percentile": 95, "min_samples": 10, "min_delay": 0.05}; None disables hedging.
+        """
+        self.name = name
+        self.handles = handles
+        self.hedge = hedge
+        self._in_flight = [0] * len(handles)
+        self._calls = [0] * len(handles)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._latency: Dict[str, LatencyTracker] = {}
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def _acquire_replica(self, exclude: Optional[int] = None) -> Optional[int]:
+        with self._lock:
+            candidates = [i for i in range(len(self.handles)) if i != exclude]
+            if not candidates:
+                return None
+            # Replicas that are down go last; start the scan at a rotating
+            # offset so equally loaded replicas take turns
+            offset = self._next % len(self.handles)
+            candidates.sort(key=lambda i: (not getattr(self.handles[i], "available", True), self._in_flight[i],
+                                           (i - offset) % len(self.handles)))
+            index = candidates[0]
+            self._next = index + 1
+            self._in_flight[index] += 1
+            self._calls[index] += 1
+            return index
+
+    def _release_replica(self, index: int):
+        with self._lock:
+            self._in_flight[index] -= 1
+
+    def _tracker(self, tool_name: str) -> LatencyTracker:
+        with self._lock:
+            if tool_name not in self._latency:
+                self._latency[tool_name] = LatencyTracker()
+            return self._latency[tool_name]
+
+    def _call_replica(self, index: int, tool_name: str, args, kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            result = self.handles[index].tools[tool_name]._run(*args, **kwargs)
+        finally:
+            self._release_replica(index)
+        self._tracker(tool_name).record(time.perf_counter() - start)
+        return result
+
+    def hedge_delay(self, tool_name: str) -> Optional[float]:
+        """Delay before the backup request, or None while there is too little history."""
+        if self.hedge is None or len(self.handles) < 2:
+            return None
+        tracker = self._tracker(tool_name)
+        if len(tracker) < self.hedge.get("min_samples", DEFAULT_HEDGE_MIN_SAMPLES):
+            return None
+        delay = tracker.percentile(self.hedge.get("percentile", DEFAULT_HEDGE_PERCENTILE))
+        return max(delay, self.hedge.get("min_delay", DEFAULT_HEDGE_MIN_DELAY))
+
+    def call(self, tool_name: str, args=(), kwargs=None, hedged: bool = False) -> Any:
+        kwargs = kwargs or {}
+        delay = self.hedge_delay(tool_name) if hedged else None
+        primary = self._acquire_replica()
+        if delay is None:
+            return self._call_replica(primary, tool_name, args, kwargs)
+
+        first = _spawn(lambda: self._call_replica(primary, tool_name, args, kwargs))
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        backup = self._acquire_replica(exclude=primary)
+        with self._lock:
+            self.hedges_sent += 1
+        second = _spawn(lambda: self._call_replica(backup, tool_name, args, kwargs))
+
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            replicas = [{"in_flight": f, "calls": c} for f, c in zip(self._in_flight, self._calls)]
+            hedges = {"sent": self.hedges_sent, "won": self.hedges_won}
+        latency = {name: tracker.percentile(DEFAULT_HEDGE_PERCENTILE) for name, tracker in list(self._latency.items())}
+        return {"name": self.name, "replicas": replicas, "hedges": hedges, "p95": latency}
+
+
+class PooledMCPTool(MCPToolWrapper):
+    """Single tool facade over every replica of a pooled server."""
+
+    pool: ReplicaPool = Field(exclude=True)
+    hedged: bool = False
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        return self.pool.call(self.name, args, kwargs, hedged=self.hedged)
+
+
+class ReplicaPoolHandle:
+    """
+    Handle returned by MCPLoader.load_server() for servers with `replicas` > 1.
+    Mirrors MCPSessionHandle: `.tools`, `.release()`/`.stop()` and the
+    context manager protocol; releasing it releases every replica.
+    """
+
+    def __init__(self, name: str, handles: List[Any], tool_names: Optional[List[str]] = None,
+                 tool_wrapper: Optional[Callable[[BaseTool], BaseTool]] = None,
+                 idempotent: Optional[List[str]] = None, hedge: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.pool = ReplicaPool(name, handles, hedge)
+        idempotent = set(idempotent or [])
+        tools = handles[0].tools
+        if tool_names:
+            tools = tools.filter_by_names(tool_names)
+        tools = ToolCollection([
+            PooledMCPTool.wrap(tool, name, pool=self.pool, hedged=tool.name in idempotent) for tool in tools
+        ])
+        if tool_wrapper is not None:
+            tools = ToolCollection([tool_wrapper(tool) for tool in tools])
+        self._tools = tools
+        self._released = False
+
+    @property
+    def session(self):
+        """The first replica's session, which is representative of all of them."""
+        return self.pool.handles[0].session
+
+    @property
+    def tools(self) -> ToolCollection:
+        if self._released:
+            raise ValueError(f"Handle for MCP server '{self.name}' has already been released.")
+        return self._tools
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            for handle in self.pool.handles:
+                handle.release()
+
+    # MCPServerAdapter compatibility
+    stop = release
+
+    def __enter__(self):
+        return self.tools
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
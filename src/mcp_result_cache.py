@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import diskcache
+from pydantic import Field, ValidationError
+
+try:
+    from .mcp_tools import MCPToolWrapper, is_error_reply
+except ImportError:
+    from mcp_tools import MCPToolWrapper, is_error_reply
+
+DEFAULT_RESULT_CACHE_SIZE = 256 * 1024 * 1024
+
+_MISS = object()
+
+
+def normalize_arguments(args_schema, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Canonical form of a tool call's arguments, so equivalent calls share a key:
+    defaults are filled in and values coerced through the tool's schema and
+    None values dropped. String values are kept exactly as given.
+    """
+    arguments = {k: v for k, v in arguments.items() if v is not None}
+    try:
+        arguments = args_schema(**arguments).model_dump(mode="json")
+    except (ValidationError, TypeError):
+        pass
+
+    def _clean(value):
+        if isinstance(value, dict):
+            return {k: _clean(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (list, tuple)):
+            return [_clean(v) for v in value]
+        return value
+
+    return _clean(arguments)
+
+
+def is_cacheable(result: Any) -> bool:
+    """Only keep real answers: error text from a flaky server must not stick around."""
+    return isinstance(result, str) and bool(result.strip()) and not is_error_reply(result)
+
+
+class ToolResultCache:
+    """
+    Disk-backed memo of MCP tool results, shared across runs and processes.
+    Entries expire after their TTL; when the store grows past `size_limit`
+    bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str, size_limit: int = DEFAULT_RESULT_CACHE_SIZE):
+        self.directory = directory
+        self._store = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(server_name: str, tool_name: str, arguments: Dict[str, Any]) -> str:
+        payload = json.dumps({"server": server_name, "tool": tool_name, "args": arguments},
+                             sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def ttl_for(cache_config: Dict[str, Any], tool_name: str) -> Optional[float]:
+        """
+        Reads a server's `cache` config block:
+            {"ttl": 3600, "tools": {"search": 86400, "fetch_content": 0}}
+        `tools` overrides the server-wide `ttl`. A missing or zero TTL means
+        the tool is not cached.
+        """
+        ttl = cache_config.get("tools", {}).get(tool_name, cache_config.get("ttl"))
+        return ttl if ttl and ttl > 0 else None
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        value = self._store.get(key, default=_MISS, retry=True)
+        with self._lock:
+            if value is _MISS:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._store.set(key, value, expire=ttl, retry=True)
+
+    def clear(self):
+        self._store.clear(retry=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._store), "bytes": self._store.volume()}
+
+    def close(self):
+        self._store.close()
+
+
+class CachedMCPTool(MCPToolWrapper):
+    """Returns a stored result for calls already seen within the tool's TTL."""
+
+    cache: ToolResultCache = Field(exclude=True)
+    ttl: float
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        if args:
+            # Positional arguments bypass the schema, so there is no canonical key for them
+            return self.inner._run(*args, **kwargs)
+        key = ToolResultCache.make_key(self.server_name, self.name, normalize_arguments(self.args_schema, kwargs))
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+
+        result = self.inner._run(*args, **kwargs)
+        if is_cacheable(result):
+            self.cache.set(key, result, self.ttl)
+        return result
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+# Schemas of servers without a local file (npx/uvx packages) can change on
+# upgrade without the config changing, so entries are not trusted forever.
+DEFAULT_SCHEMA_MAX_AGE = 7 * 24 * 3600
+
+
+class ToolSchemaCache:
+    """
+    On-disk cache of the tool list (name, description, input schema) each MCP
+    server advertised, so tools can be handed to agents without spawning the
+    server and running `tools/list`.
+    """
+
+    def __init__(self, cache_dir: str, max_age: Optional[float] = DEFAULT_SCHEMA_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+
+    @staticmethod
+    def fingerprint(command: str, args: List[str], env: Optional[Dict[str, str]] = None) -> str:
+        """
+        Hash of everything that can change the advertised tools: the command,
+        its arguments, the server-specific env and the mtime of any argument
+        that is a file on disk (i.e. the server script).
+        """
+        mtimes = {}
+        for arg in args:
+            if isinstance(arg, str) and os.path.isfile(arg):
+                mtimes[arg] = os.path.getmtime(arg)
+        payload = {"command": command, "args": list(args), "env": env or {}, "mtimes": mtimes}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns the cached tool schemas, or None on a miss or stale entry."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.max_age is not None and time.time() - entry.get("created", 0) > self.max_age:
+            return None
+        return entry.get("tools")
+
+    def store(self, key: str, server_name: str, tools: List[Dict[str, Any]]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"server": server_name, "created": time.time(), "tools": tools}, f, indent=2)
+        # Atomic so a concurrent reader never sees a half-written file
+        os.replace(tmp_path, path)
+
+    def invalidate(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+def describe_tools(adapter) -> List[Dict[str, Any]]:
+    """
+    Extracts cacheable schemas from a started MCPServerAdapter: the
+    agent-facing description CrewAI generated and the resolved input schema.
+    """
+    mcp_tools = {}
+    for server_tools in getattr(getattr(adapter, "_adapter", None), "mcp_tools", None) or []:
+        for tool in server_tools:
+            mcp_tools[tool.name] = tool.inputSchema
+
+    schemas = []
+    for tool in adapter.tools:
+        input_schema = mcp_tools.get(tool.name)
+        if input_schema is None:
+            input_schema = tool.args_schema.model_json_schema()
+        schemas.append({"name": tool.name, "description": tool.description, "input_schema": input_schema})
+    return schemas
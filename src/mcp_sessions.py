@@ -0,0 +1,407 @@
+import atexit
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .mcp_tools import SupervisedMCPTool
+except ImportError:
+    from mcp_tools import SupervisedMCPTool
+
+DEFAULT_RESTART_BACKOFF = 1.0
+DEFAULT_MAX_RESTART_BACKOFF = 60.0
+
+
+class ServerUnavailableError(RuntimeError):
+    """Raised instead of starting a server whose circuit breaker is open."""
+
+    def __init__(self, name: str, last_error: Optional[str], retry_in: float):
+        self.name = name
+        self.last_error = last_error
+        self.retry_in = retry_in
+        super().__init__(f"MCP server '{name}' is down ({last_error}); next restart attempt in {retry_in:.0f}s")
+
+
+class MCPServerSession:
+    """
+    One warm MCP server (and its client adapter) shared by every consumer
+    that asks for the same configuration.
+
+    Supervised sessions act as a circuit breaker around the server: once it
+    is found dead the adapter is dropped and the breaker opens. Restarts
+    (spawn plus handshake) are attempted with exponential backoff and every
+    start attempt inside the backoff window fails fast with
+    ServerUnavailableError.
+    """
+
+    def __init__(self, name: str, key: str, factory: Callable[[], Any], idle_ttl: Optional[float] = None,
+                 supervised: bool = False, health_check: Optional[Callable[[Any], None]] = None,
+                 restart_backoff: float = DEFAULT_RESTART_BACKOFF,
+                 max_restart_backoff: float = DEFAULT_MAX_RESTART_BACKOFF):
+        self.name = name
+        self.key = key
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.supervised = supervised
+        self.health_check = health_check
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.adapter = None
+        self.refcount = 0
+        self.in_flight = 0
+        self.started_at = None
+        self.last_used = time.monotonic()
+        self.lock = threading.RLock()
+        self._calls_lock = threading.Lock()
+        self.starting = False
+        self.failures = 0
+        self.restarts = 0
+        self.retry_at = 0.0
+        self.last_error = None
+
+    @property
+    def running(self) -> bool:
+        return self.adapter is not None
+
+    @property
+    def breaker_state(self) -> str:
+        if self.running or not self.failures:
+            return "closed"
+        return "half-open" if self.starting or time.monotonic() >= self.retry_at else "open"
+
+    @property
+    def available(self) -> bool:
+        """False while the breaker is open, i.e. calls would fail fast."""
+        return self.breaker_state != "open" and not (self.starting and self.failures)
+
+    def start(self):
+        """Spawns the server and runs the MCP handshake if it is not already up."""
+        with self.lock:
+            if self.adapter is None:
+                now = time.monotonic()
+                if self.failures and now < self.retry_at:
+                    raise ServerUnavailableError(self.name, self.last_error, self.retry_at - now)
+                self.starting = True
+                try:
+                    self.adapter = self.factory()
+                except Exception as e:
+                    self._record_failure(e)
+                    raise
+                finally:
+                    self.starting = False
+                self.started_at = time.monotonic()
+                if self.failures:
+                    self.restarts += 1
+                    print(f"Restarted MCP server: {self.name} (restart #{self.restarts})")
+                self.failures = 0
+                self.last_error = None
+        return self.adapter
+
+    def try_restart(self) -> bool:
+        """Background restart attempt; a failure just pushes the next attempt further out."""
+        try:
+            self.start()
+            return True
+        except Exception as e:
+            print(f"Restart of MCP server '{self.name}' failed: {e}")
+            return False
+
+    def _record_failure(self, error: BaseException):
+        # Called with self.lock held
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        delay = min(self.max_restart_backoff, self.restart_backoff * 2 ** (self.failures - 1))
+        self.retry_at = time.monotonic() + delay
+
+    def mark_down(self, error: BaseException, adapter: Any = None):
+        """
+        Records that the server died. `adapter` is the instance the failure was
+        seen on; reports about an adapter that has already been replaced are ignored.
+        """
+        with self.lock:
+            if adapter is not None and adapter is not self.adapter:
+                return
+            dead, self.adapter = self.adapter, None
+            self.started_at = None
+            self._record_failure(error)
+            retry_in = self.retry_at - time.monotonic()
+        print(f"MCP server '{self.name}' went down ({self.last_error}), restarting in {retry_in:.0f}s")
+        if dead is not None:
+            try:
+                dead.stop()
+            except Exception:
+                pass
+
+    def begin_call(self):
+        with self._calls_lock:
+            self.in_flight += 1
+
+    def end_call(self):
+        with self._calls_lock:
+            self.in_flight -= 1
+
+    def check_health(self) -> bool:
+        """Runs the health check on an idle running server, marking it down if it fails."""
+        adapter = self.adapter
+        if adapter is None or self.health_check is None or self.in_flight:
+            # A server busy with a blocking call may not answer pings in time
+            return adapter is not None
+        try:
+            self.health_check(adapter)
+            return True
+        except Exception as e:
+            self.mark_down(e, adapter)
+            return False
+
+    def stop(self):
+        """Stops the server process. Errors are swallowed, the process is gone either way."""
+        with self.lock:
+            adapter, self.adapter = self.adapter, None
+            self.started_at = None
+        if adapter is not None:
+            try:
+                adapter.stop()
+            except Exception as e:
+                print(f"Error stopping MCP server '{self.name}': {e}")
+
+    @property
+    def tools(self):
+        return self.start().tools
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "running": self.running,
+            "refcount": self.refcount,
+            "idle_seconds": round(now - self.last_used, 3) if self.refcount == 0 else 0.0,
+            "uptime_seconds": round(now - self.started_at, 3) if self.started_at else 0.0,
+            "breaker": self.breaker_state,
+            "restarts": self.restarts,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class MCPSessionHandle:
+    """
+    Reference-counted view on a shared MCPServerSession.
+
+    Drop-in replacement for MCPServerAdapter as far as the examples are concerned:
+    it exposes `.tools`, `.stop()` and the context manager protocol. Stopping a
+    handle only releases this reference; the process stays warm for other users
+    until the session manager reaps it.
+    """
+
+    def __init__(self, manager: "MCPSessionManager", session: MCPServerSession, tool_names: Optional[List[str]] = None,
+                 tool_wrapper: Optional[Callable[[Any], Any]] = None):
+        self._manager = manager
+        self._session = session
+        self._tool_names = list(tool_names) if tool_names else None
+        self._tool_wrapper = tool_wrapper
+        self._wrapped_tools = None
+        self._released = False
+
+    @property
+    def name(self) -> str:
+        return self._session.name
+
+    @property
+    def session(self) -> MCPServerSession:
+        return self._session
+
+    @property
+    def available(self) -> bool:
+        return self._session.available
+
+    @property
+    def tools(self):
+        if self._released:
+            raise ValueError(f"Handle for MCP server '{self.name}' has already been released.")
+        if self._wrapped_tools is not None:
+            return self._wrapped_tools
+        tools = self._session.tools
+        if self._tool_names:
+            tools = tools.filter_by_names(self._tool_names)
+        wrappers = []
+        if self._session.supervised:
+            # Agents keep these tool objects for the whole run, so they must
+            # outlive a restart of the server behind them
+            wrappers.append(lambda tool: SupervisedMCPTool.wrap(tool, self.name, session=self._session))
+        if self._tool_wrapper is not None:
+            wrappers.append(self._tool_wrapper)
+        if not wrappers:
+            return tools
+        for wrapper in wrappers:
+            tools = type(tools)([wrapper(tool) for tool in tools])
+        self._wrapped_tools = tools
+        return tools
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._manager.release(self._session)
+
+    # MCPServerAdapter compatibility
+    stop = release
+
+    def __enter__(self):
+        return self.tools
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class MCPSessionManager:
+    """
+    Keeps one warm process per configured MCP server and hands out
+    reference-counted handles to it.
+
+    Servers whose last handle was released are stopped once they have been idle
+    for longer than their TTL. Everything still running is stopped at
+    interpreter exit.
+    """
+
+    def __init__(self, idle_ttl: Optional[float] = 300.0, reap_interval: float = 15.0,
+                 health_interval: float = 10.0):
+        """
+        idle_ttl: Seconds an unreferenced server stays warm. None keeps it until shutdown,
+                  0 stops it as soon as the last handle is released.
+        reap_interval: How often the background reaper looks for idle servers.
+        health_interval: How often supervised servers in use are health checked,
+                         and crashed ones restarted once their backoff has passed.
+        """
+        self.idle_ttl = idle_ttl
+        self.reap_interval = reap_interval
+        self.health_interval = health_interval
+        self._sessions: Dict[str, MCPServerSession] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reaper = None
+
+    def acquire(self, key: str, factory: Callable[[], Any], name: Optional[str] = None,
+                idle_ttl: Optional[float] = None, tool_names: Optional[List[str]] = None,
+                tool_wrapper: Optional[Callable[[Any], Any]] = None, supervised: bool = False,
+                health_check: Optional[Callable[[Any], None]] = None,
+                restart_backoff: float = DEFAULT_RESTART_BACKOFF,
+                max_restart_backoff: float = DEFAULT_MAX_RESTART_BACKOFF) -> MCPSessionHandle:
+        """
+        Returns a handle to the server identified by `key`, starting it with
+        `factory()` if no warm instance exists yet. `tool_wrapper`, if given,
+        decorates each tool the handle exposes.
+
+        supervised: Restart the server when it dies (exponential backoff from
+        `restart_backoff` up to `max_restart_backoff` seconds) and have its
+        tools fail fast with a clear error while it is down. `health_check`
+        is called with the adapter periodically and should raise when the
+        server no longer responds.
+        """
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = MCPServerSession(name or key, key, factory, idle_ttl, supervised, health_check,
+                                           restart_backoff, max_restart_backoff)
+                self._sessions[key] = session
+            session.refcount += 1
+            session.last_used = time.monotonic()
+            self._ensure_reaper()
+
+        try:
+            session.start()
+        except Exception:
+            with self._lock:
+                session.refcount -= 1
+                if session.refcount <= 0 and not session.running:
+                    self._sessions.pop(key, None)
+            raise
+
+        return MCPSessionHandle(self, session, tool_names, tool_wrapper)
+
+    def release(self, session: MCPServerSession):
+        with self._lock:
+            session.refcount = max(0, session.refcount - 1)
+            session.last_used = time.monotonic()
+            stop_now = session.refcount == 0 and self._ttl_for(session) == 0
+            if stop_now:
+                self._sessions.pop(session.key, None)
+        if stop_now:
+            session.stop()
+
+    def reap_idle(self) -> List[str]:
+        """Stops unreferenced servers past their idle TTL. Returns the reaped server names."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, session in list(self._sessions.items()):
+                ttl = self._ttl_for(session)
+                if session.refcount == 0 and ttl is not None and now - session.last_used >= ttl:
+                    expired.append(self._sessions.pop(key))
+        for session in expired:
+            print(f"Stopping idle MCP server: {session.name}")
+            session.stop()
+        return [s.name for s in expired]
+
+    def shutdown(self):
+        """Stops every server, referenced or not. Safe to call more than once."""
+        self._stop_event.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.stop()
+
+    def check_health(self) -> List[str]:
+        """
+        Health checks supervised servers that are in use and restarts crashed
+        ones whose backoff has passed. Returns the names found down.
+        """
+        with self._lock:
+            sessions = [s for s in self._sessions.values() if s.supervised and s.refcount > 0]
+        down = []
+        for session in sessions:
+            if session.running:
+                if not session.check_health():
+                    down.append(session.name)
+            elif session.failures and not session.starting and time.monotonic() >= session.retry_at:
+                down.append(session.name)
+                threading.Thread(target=session.try_restart, name=f"mcp-restart-{session.name}", daemon=True).start()
+        return down
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s.stats() for s in self._sessions.values()]
+
+    def _ttl_for(self, session: MCPServerSession) -> Optional[float]:
+        return session.idle_ttl if session.idle_ttl is not None else self.idle_ttl
+
+    def _ensure_reaper(self):
+        # Called with self._lock held
+        if self._reaper is None or not self._reaper.is_alive():
+            self._stop_event.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name="mcp-session-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        last_reap = time.monotonic()
+        while not self._stop_event.wait(min(self.reap_interval, self.health_interval)):
+            try:
+                self.check_health()
+                if time.monotonic() - last_reap >= self.reap_interval:
+                    last_reap = time.monotonic()
+                    self.reap_idle()
+            except Exception as e:
+                print(f"MCP session reaper error: {e}")
+
+
+_default_manager: Optional[MCPSessionManager] = None
+_default_lock = threading.Lock()
+
+
+def get_session_manager() -> MCPSessionManager:
+    """Process-wide session manager, shut down automatically at exit."""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = MCPSessionManager()
+            atexit.register(_default_manager.shutdown)
+        return _default_manager
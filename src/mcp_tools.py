@@ -0,0 +1,180 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import anyio
+from crewai.tools import BaseTool
+from crewai_tools.adapters.tool_collection import ToolCollection
+from mcp.shared.exceptions import McpError
+from mcpadapt.utils.modeling import create_model_from_json_schema
+from pydantic import Field
+
+# What a tool call raises when the server process behind it is gone
+CONNECTION_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream,
+                     ConnectionError, EOFError)
+
+
+def is_error_reply(result: Any) -> bool:
+    """Whether a tool result is an error message rather than a real answer."""
+    if not isinstance(result, str):
+        return False
+    head = result.lstrip()[:20].lower()
+    return head.startswith("error") or head.startswith('{"error"')
+
+
+def is_connection_error(error: BaseException) -> bool:
+    if isinstance(error, CONNECTION_ERRORS):
+        return True
+    return isinstance(error, McpError) and "connection closed" in str(error).lower()
+
+
+class MCPToolWrapper(BaseTool):
+    """
+    Base for CrewAI tools that stand in front of an MCP tool.
+
+    The wrapper keeps the wrapped tool's name, agent-facing description and
+    argument schema, so from the agent's point of view nothing changes.
+    """
+
+    server_name: str = ""
+    inner: Optional[BaseTool] = Field(default=None, exclude=True)
+
+    @classmethod
+    def wrap(cls, tool: BaseTool, server_name: str = "", **kwargs) -> "MCPToolWrapper":
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            server_name=server_name,
+            inner=tool,
+            **kwargs,
+        )
+
+    def _generate_description(self) -> None:
+        # Already generated by the wrapped tool; regenerating would prefix it twice
+        pass
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        return self.inner._run(*args, **kwargs)
+
+
+class SupervisedMCPTool(MCPToolWrapper):
+    """
+    Stable front for a tool of a supervised server session.
+
+    The underlying tool is looked up on the session's current adapter at
+    call time, so the same object keeps working after the server has been
+    restarted. While the server is down calls return an error right away
+    instead of letting the agent retry against a dead process.
+    """
+
+    session: Any = Field(exclude=True)
+
+    def _unavailable(self, detail: Any) -> str:
+        return (
+            f"Error: tool '{self.name}' is unavailable because MCP server '{self.server_name}' is down ({detail}). "
+            f"It is being restarted automatically; continue without this tool or try again later."
+        )
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        session = self.session
+        if session.starting and session.failures:
+            return self._unavailable("restart in progress")
+        try:
+            adapter = session.start()
+        except Exception as e:
+            retry_in = getattr(e, "retry_in", None)
+            if retry_in is not None:
+                return self._unavailable(f"{e.last_error}; next restart attempt in {retry_in:.0f}s")
+            return self._unavailable(e)
+
+        tool = adapter.tools[self.name]
+        session.begin_call()
+        try:
+            return tool._run(*args, **kwargs)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            session.mark_down(e, adapter)
+            return self._unavailable(session.last_error)
+        finally:
+            session.end_call()
+
+
+class LazyMCPTool(MCPToolWrapper):
+    """
+    Tool built from a cached schema. The real tool (and its server process)
+    is only resolved when the agent first calls it.
+    """
+
+    resolver: Callable[[str], BaseTool] = Field(exclude=True)
+
+    @classmethod
+    def from_schema(cls, server_name: str, schema: Dict[str, Any], resolver: Callable[[str], BaseTool]) -> "LazyMCPTool":
+        return cls(
+            name=schema["name"],
+            description=schema.get("description", ""),
+            args_schema=create_model_from_json_schema(schema.get("input_schema") or {}),
+            server_name=server_name,
+            resolver=resolver,
+        )
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        return self.resolver(self.name)._run(*args, **kwargs)
+
+
+class LazyServerHandle:
+    """
+    Handle returned by MCPLoader.load_server() for lazy servers whose tool
+    schemas are cached. Mirrors MCPSessionHandle; the server is started (via
+    `acquire`) on the first tool call instead of at load time.
+    """
+
+    def __init__(self, name: str, schemas: List[Dict[str, Any]], acquire: Callable[[], Any],
+                 tool_names: Optional[List[str]] = None, tool_wrapper: Optional[Callable[[BaseTool], BaseTool]] = None):
+        self.name = name
+        self._acquire = acquire
+        self._handle = None
+        self._lock = threading.Lock()
+        tools = ToolCollection([LazyMCPTool.from_schema(name, s, self._resolve) for s in schemas])
+        if tool_names:
+            tools = tools.filter_by_names(tool_names)
+        if tool_wrapper is not None:
+            tools = ToolCollection([tool_wrapper(tool) for tool in tools])
+        self._tools = tools
+
+    @property
+    def started(self) -> bool:
+        return self._handle is not None
+
+    @property
+    def tools(self) -> ToolCollection:
+        return self._tools
+
+    def _resolve(self, tool_name: str) -> BaseTool:
+        with self._lock:
+            if self._handle is None:
+                print(f"Starting MCP server on first use: {self.name}")
+                self._handle = self._acquire()
+            handle = self._handle
+        try:
+            return handle.tools[tool_name]
+        except KeyError:
+            raise RuntimeError(
+                f"Tool '{tool_name}' is no longer provided by MCP server '{self.name}'. "
+                f"Its cached schema has been refreshed, reload the server's tools."
+            )
+
+    def release(self):
+        with self._lock:
+            handle, self._handle = self._handle, None
+        if handle is not None:
+            handle.release()
+
+    # MCPServerAdapter compatibility
+    stop = release
+
+    def __enter__(self):
+        return self.tools
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()